@@ -0,0 +1,284 @@
+"""
+Risk and performance analytics over columnar backtest results.
+
+Everything here works on arrays, not on lists of trades: an equity curve
+or daily-return array for the account metrics, and trade columns (a
+TRADE_DTYPE structured array, an export DataFrame from load_trades, or a
+simulate_backtest trade list, converted once) for the breakdowns. The
+loop, vector, stream and chunked engines all produce the same shapes, and
+a sweep's multi-million-trade export can be analysed straight from disk:
+
+    trades = backtest_export.load_trades('results/')
+    breakdown(trades, ['run', 'regime'])
+    exit_reason_distribution(trades, by='tier')
+
+Account metrics:
+
+  * drawdowns — running peak, drawdown in dollars and percent, and bars
+    since the last peak (drawdown duration)
+  * Sharpe, Sortino and Calmar ratios, annualised over TRADING_DAYS
+  * rolling_metrics — the same over a sliding window
+
+Group keys for breakdowns are any trade column (symbol, regime, signal,
+strategy, run, ...) plus the derived 'month' and 'tier' (rank 1 vs the
+rest). Groups are summed with bincount over factorized keys, so the cost
+is a couple of passes over the columns however many groups there are.
+"""
+
+import numpy as np
+import pandas as pd
+
+import backtest_export as export
+
+TRADING_DAYS = 252
+
+# Default rolling window: about three months of trading days
+ROLLING_WINDOW = 63
+
+
+# ============================================================
+# TRADE COLUMNS
+# ============================================================
+
+def trade_columns(trades):
+    """
+    {column: array} for trades given as a trade list, a TRADE_DTYPE
+    structured array or a DataFrame (e.g. from backtest_export.load_trades).
+    A dict of columns is returned as is, so callers can convert once.
+    """
+    if isinstance(trades, dict):
+        return trades
+    if isinstance(trades, pd.DataFrame):
+        return {col: trades[col].to_numpy() for col in trades.columns}
+    if not isinstance(trades, np.ndarray):
+        trades = export.trades_to_array(trades)
+    return {name: trades[name] for name in trades.dtype.names}
+
+
+def _key_values(cols, key):
+    """A group key's value per trade: a column, or the derived 'month' / 'tier'."""
+    if key == 'month':
+        return np.asarray(cols['date'], dtype='datetime64[M]').astype(str)
+    if key == 'tier':
+        rank = cols['rank']
+        return np.where(rank == 1, 'tier1', np.where(rank > 1, 'tier2', 'unranked'))
+    if key not in cols:
+        raise KeyError(f"Unknown group key: {key}")
+    return np.asarray(cols[key])
+
+
+def _group_codes(cols, by):
+    """(group code per trade, index of group labels) for one key or a list of keys."""
+    keys = [by] if isinstance(by, str) else list(by)
+    codes, levels = [], []
+    for key in keys:
+        code, uniques = pd.factorize(_key_values(cols, key), sort=True)
+        codes.append(code)
+        levels.append(uniques)
+    if not codes[0].size:
+        if len(keys) == 1:
+            return codes[0], pd.Index([], name=keys[0])
+        return codes[0], pd.MultiIndex.from_arrays([[]] * len(keys), names=keys)
+    flat = np.ravel_multi_index(codes, [len(level) for level in levels])
+    group, combos = pd.factorize(flat, sort=True)
+    if len(keys) == 1:
+        return group, pd.Index(levels[0], name=keys[0])
+    parts = np.unravel_index(combos, [len(level) for level in levels])
+    index = pd.MultiIndex.from_arrays(
+        [np.asarray(level)[part] for level, part in zip(levels, parts)], names=keys)
+    return group, index
+
+
+# ============================================================
+# ACCOUNT METRICS
+# ============================================================
+
+def drawdowns(equity, starting_equity=None):
+    """
+    Running peak, drawdown ($ and %) and duration (bars since the last
+    peak) for every point of an equity curve. `starting_equity` is an
+    initial high-water mark (the curve's first point by default).
+    """
+    equity = np.asarray(equity, dtype=float)
+    peak = np.maximum.accumulate(equity)
+    if starting_equity is not None:
+        peak = np.maximum(peak, starting_equity)
+    drawdown = peak - equity
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown_pct = np.where(peak > 0, drawdown / peak * 100, 0.0)
+    position = np.arange(len(equity))
+    last_peak = np.maximum.accumulate(np.where(drawdown == 0, position, 0))
+    return {
+        'peak': peak,
+        'drawdown': drawdown,
+        'drawdown_pct': drawdown_pct,
+        'duration': position - last_peak,
+    }
+
+
+def max_drawdown(equity, starting_equity=None):
+    """
+    Deepest drawdown of an equity curve: its size in percent and dollars
+    (at the deepest point) and the longest time spent below a peak, in bars.
+    """
+    if len(equity) == 0:
+        return {'pct': 0.0, 'dollar': 0.0, 'duration': 0}
+    dd = drawdowns(equity, starting_equity)
+    deepest = int(np.argmax(dd['drawdown_pct']))
+    return {
+        'pct': float(dd['drawdown_pct'][deepest]),
+        'dollar': float(dd['drawdown'][deepest]),
+        'duration': int(dd['duration'].max()),
+    }
+
+
+def sharpe_ratio(returns, periods=TRADING_DAYS):
+    """Annualised Sharpe ratio of periodic returns (0 for a flat series)."""
+    returns = np.asarray(returns, dtype=float)
+    if len(returns) == 0:
+        return 0
+    std = np.std(returns)
+    return np.mean(returns) / std * np.sqrt(periods) if std > 0 else 0
+
+
+def sortino_ratio(returns, periods=TRADING_DAYS):
+    """Annualised Sortino ratio: mean return over downside deviation (0 without losses)."""
+    returns = np.asarray(returns, dtype=float)
+    if len(returns) == 0:
+        return 0
+    downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2))
+    return np.mean(returns) / downside * np.sqrt(periods) if downside > 0 else 0
+
+
+def annualized_return(equity, periods=TRADING_DAYS):
+    """Compound annual growth of an equity curve, in percent."""
+    equity = np.asarray(equity, dtype=float)
+    if len(equity) < 2 or equity[0] <= 0 or equity[-1] <= 0:
+        return 0.0
+    return ((equity[-1] / equity[0]) ** (periods / (len(equity) - 1)) - 1) * 100
+
+
+def calmar_ratio(equity, periods=TRADING_DAYS):
+    """Annualised return over maximum drawdown (0 without a drawdown)."""
+    dd_pct = max_drawdown(equity)['pct']
+    return annualized_return(equity, periods) / dd_pct if dd_pct > 0 else 0
+
+
+def rolling_metrics(equity, window=ROLLING_WINDOW, periods=TRADING_DAYS, dates=None):
+    """
+    Trailing-window metrics for each point of an equity curve: return,
+    Sharpe, Sortino and maximum drawdown over the last `window` periods.
+    Rows are the curve's periods (its first point is the start), indexed by
+    `dates` if given; the first window - 1 rows are NaN.
+    """
+    equity = np.asarray(equity, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = pd.Series(np.diff(equity) / equity[:-1] * 100)
+    mean = returns.rolling(window).mean()
+    std = returns.rolling(window).std(ddof=0)
+    downside = (np.minimum(returns, 0) ** 2).rolling(window).mean() ** 0.5
+    scale = np.sqrt(periods)
+
+    n = len(returns)
+    window_return = np.full(n, np.nan)
+    window_dd = np.full(n, np.nan)
+    if n >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(equity, window + 1)
+        window_return[window - 1:] = (windows[:, -1] / windows[:, 0] - 1) * 100
+        peaks = np.maximum.accumulate(windows, axis=1)
+        window_dd[window - 1:] = ((peaks - windows) / peaks * 100).max(axis=1)
+
+    frame = pd.DataFrame({
+        'return_pct': window_return,
+        'sharpe_ratio': np.where(std > 0, mean / std * scale, 0.0),
+        'sortino_ratio': np.where(downside > 0, mean / downside * scale, 0.0),
+        'max_drawdown_pct': window_dd,
+    })
+    frame.loc[mean.isna(), ['sharpe_ratio', 'sortino_ratio']] = np.nan
+    if dates is not None:
+        frame.index = pd.DatetimeIndex(dates[-n:] if n else [])
+    return frame
+
+
+# ============================================================
+# TRADE METRICS
+# ============================================================
+
+def trade_stats(trades):
+    """Win/loss counts, average win and loss, profit factor and average R."""
+    cols = trade_columns(trades)
+    pnl = np.asarray(cols['pnl'], dtype=float)
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
+    gross_profit = wins.sum() if len(wins) else 0
+    gross_loss = abs(losses.sum()) if len(losses) else 1
+    return {
+        'total_trades': len(pnl),
+        'winning_trades': len(wins),
+        'losing_trades': len(losses),
+        'win_rate_pct': len(wins) / len(pnl) * 100 if len(pnl) else 0,
+        'avg_win': np.mean(wins) if len(wins) else 0,
+        'avg_loss': np.mean(losses) if len(losses) else 0,
+        'profit_factor': gross_profit / gross_loss if gross_loss > 0 else float('inf'),
+        'avg_r_multiple': np.mean(cols['r_multiple']) if len(pnl) else 0,
+    }
+
+
+def breakdown(trades, by='symbol'):
+    """
+    Trade count, P&L, wins, win rate and average P&L / R per group. `by` is
+    a key or list of keys (any trade column, 'month' or 'tier'). Groups are
+    sorted by key.
+    """
+    cols = trade_columns(trades)
+    group, index = _group_codes(cols, by)
+    n = len(index)
+    pnl = np.asarray(cols['pnl'], dtype=float)
+    count = np.bincount(group, minlength=n)
+    total = np.bincount(group, weights=pnl, minlength=n)
+    wins = np.bincount(group, weights=pnl > 0, minlength=n).astype(np.int64)
+    r_total = np.bincount(group, weights=np.asarray(cols['r_multiple'], dtype=float), minlength=n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            'trades': count,
+            'pnl': total,
+            'wins': wins,
+            'win_rate_pct': wins / count * 100,
+            'avg_pnl': total / count,
+            'avg_r_multiple': r_total / count,
+        }, index=index)
+
+
+def exit_reason_distribution(trades, by=None):
+    """
+    Trades, share of trades (within each `by` group), P&L and average R by
+    exit reason (stop, target, eod).
+    """
+    keys = [] if by is None else ([by] if isinstance(by, str) else list(by))
+    table = breakdown(trades, keys + ['exit_reason'])
+    totals = table['trades'].groupby(level=keys).transform('sum') if keys else table['trades'].sum()
+    table.insert(1, 'pct', table['trades'] / totals * 100)
+    return table[['trades', 'pct', 'pnl', 'avg_r_multiple']]
+
+
+# ============================================================
+# SUMMARY
+# ============================================================
+
+def performance(sim, periods=TRADING_DAYS):
+    """Account and trade metrics for a simulate_backtest result."""
+    starting = sim['config']['STARTING_EQUITY']
+    equity_curve = sim['equity_curve']
+    dd = max_drawdown(equity_curve, starting)
+    annual = annualized_return(equity_curve, periods)
+    return dict(
+        total_return_pct=(sim['equity'] - starting) / starting * 100,
+        annualized_return_pct=annual,
+        sharpe_ratio=sharpe_ratio(sim['daily_returns'], periods),
+        sortino_ratio=sortino_ratio(sim['daily_returns'], periods),
+        calmar_ratio=annual / dd['pct'] if dd['pct'] > 0 else 0,
+        max_drawdown_pct=dd['pct'],
+        max_drawdown_dollar=dd['dollar'],
+        max_drawdown_days=dd['duration'],
+        **trade_stats(sim['trades']),
+    )
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the ORB backtest on synthetic data (no network).
+
+For every (symbols, years) scale the harness generates a synthetic market
+(backtest_synthetic), then times:
+
+  * select_stocks_for_day, estimate_orb_range and simulate_trade — mean
+    seconds per call over a sample of days / (symbol, day) pairs
+  * run_backtest end to end — fed through a FrameProvider and a fresh
+    bar cache, so download/cache, daily bars, selection, simulation and
+    reporting are all included (its phase breakdown is kept too)
+
+Results are compared with a stored baseline file; any benchmark slower
+than --tolerance × its baseline is flagged and the exit status is 1.
+Baselines are machine-specific: save one with --save-baseline on the
+machine you compare on.
+
+A run peaks at roughly 130 bytes per hourly bar (generated frames, the
+bar cache and the store together), so a scale above --max-bars is run
+downscaled: same history length, as many symbols as fit, reported under
+that key. The default 40M bars peaks at ~5 GB; 5000 symbols ×
+10 years (~88M bars) runs as 2267 × 10 years and 5000 × 5 years as
+4535 × 5 years. The committed bench_baseline.json holds the default grid
+from a 1-CPU, 5 GB machine.
+
+    python backtest_bench.py --symbols 50,500 --years 1,5
+    python backtest_bench.py --save-baseline
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import backtest_data
+import backtest_orb as orb
+import backtest_synthetic as synthetic
+import backtest_timing as timing
+
+BASELINE_PATH = 'bench_baseline.json'
+
+
+def time_calls(func, calls):
+    """Mean wall seconds per func(*args) over the given argument tuples."""
+    started = time.perf_counter()
+    for args in calls:
+        func(*args)
+    return (time.perf_counter() - started) / max(len(calls), 1)
+
+
+def micro_benchmarks(store, samples, seed=0):
+    """Seconds per call of the selector, ORB estimate and trade simulation."""
+    rng = np.random.default_rng(seed)
+    days = store.trading_days
+    pick_days = [days[i] for i in rng.integers(30, len(days), min(samples, 50))]
+
+    pairs = []
+    for _ in range(samples):
+        sym = store.universe[rng.integers(len(store.universe))]
+        day = days[rng.integers(len(days))]
+        day_data = store.day_bars(sym, day) if sym in store else None
+        if day_data is not None and len(day_data) >= 2:
+            pairs.append(day_data)
+
+    trades = []
+    for day_data in pairs:
+        orb_range = orb.estimate_orb_range(day_data)
+        entry = orb_range['high']
+        trades.append((orb_range, day_data, 'long', entry, max(orb_range['range'], entry * 0.003)))
+
+    return {
+        'select_stocks_for_day': time_calls(orb.select_stocks_for_day,
+                                            [(store, day) for day in pick_days]),
+        'estimate_orb_range': time_calls(orb.estimate_orb_range, [(d,) for d in pairs]),
+        'simulate_trade': time_calls(orb.simulate_trade, trades),
+    }
+
+
+def end_to_end(frames, symbols, years, resolution):
+    """Wall seconds and phase times for run_backtest over synthetic frames."""
+    period = f"{int(np.ceil(years * 365)) + 7}d"
+    provider = backtest_data.FrameProvider(frames)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()), timing.collect() as timings:
+                orb.run_backtest(resolution, symbols=symbols, period=period, provider=provider,
+                                 cache_dir=os.path.join(tmp, 'cache'))
+            elapsed = time.perf_counter() - started
+        finally:
+            os.chdir(cwd)
+    return elapsed, timings.report()['phases']
+
+
+def run_scale(n_symbols, years, resolution='1h', samples=200, seed=0):
+    """All benchmarks at one scale; returns {benchmark: seconds} plus run_backtest phases."""
+    started = time.perf_counter()
+    frames = synthetic.synthetic_market(n_symbols, years, resolution, seed=seed)
+    symbols = synthetic.synthetic_symbols(n_symbols)
+    generate_s = time.perf_counter() - started
+
+    store = orb.MarketData(frames, resolution, symbols)
+    results = micro_benchmarks(store, samples, seed)
+    del store
+
+    results['run_backtest'], phases = end_to_end(frames, symbols, years, resolution)
+    return results, {'generate_s': round(generate_s, 3), 'phases': phases}
+
+
+def scale_key(n_symbols, years):
+    return f"{n_symbols}x{years:g}y"
+
+
+def compare(results, baseline, tolerance):
+    """[(scale, benchmark, seconds, baseline seconds or None, regressed), ...]"""
+    rows = []
+    for scale, benches in results.items():
+        for name, seconds in benches.items():
+            base = baseline.get(scale, {}).get(name)
+            regressed = base is not None and seconds > base * tolerance
+            rows.append((scale, name, seconds, base, regressed))
+    return rows
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return '—'
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds:.2f}s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ORB backtest benchmarks on synthetic data')
+    parser.add_argument('--symbols', default='50,500,5000',
+                        help='comma-separated universe sizes (default: 50,500,5000)')
+    parser.add_argument('--years', default='1,5,10',
+                        help='comma-separated history lengths in years (default: 1,5,10)')
+    parser.add_argument('--resolution', choices=orb.RESOLUTIONS, default='1h')
+    parser.add_argument('--samples', type=int, default=200,
+                        help='calls per micro-benchmark (default: 200)')
+    parser.add_argument('--max-bars', type=float, default=40e6,
+                        help='downscale scales with more bars than this (default: 40M)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='flag benchmarks slower than this × baseline (default: 1.25)')
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args(argv)
+
+    bars_per_day = len(synthetic.session_offsets(args.resolution))
+    results = {}
+    details = {}
+    for requested in [int(v) for v in args.symbols.split(',')]:
+        for years in [float(v) for v in args.years.split(',')]:
+            bars_per_symbol = years * synthetic.TRADING_DAYS_PER_YEAR * bars_per_day
+            n_symbols = min(requested, int(args.max_bars // bars_per_symbol))
+            if n_symbols < requested:
+                print(f"{scale_key(requested, years)}: downscaled to {n_symbols} symbols "
+                      f"({requested * bars_per_symbol / 1e6:.0f}M bars > --max-bars)")
+            key = scale_key(n_symbols, years)
+            if n_symbols < 1 or key in results:
+                continue
+            n_bars = n_symbols * bars_per_symbol
+            print(f"{key}: running ({n_bars / 1e6:.1f}M bars)...", flush=True)
+            results[key], details[key] = run_scale(n_symbols, years, args.resolution,
+                                                   args.samples, args.seed)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    rows = compare(results, baseline, args.tolerance)
+    print(f"\n{'SCALE':<12} {'BENCHMARK':<24} {'TIME':>10} {'BASELINE':>10} {'CHANGE':>8}")
+    for scale, name, seconds, base, regressed in rows:
+        change = f"{(seconds / base - 1) * 100:+.0f}%" if base else ''
+        flag = '  ⚠️ regression' if regressed else ''
+        print(f"{scale:<12} {name:<24} {format_seconds(seconds):>10} "
+              f"{format_seconds(base):>10} {change:>8}{flag}")
+
+    report = {'resolution': args.resolution, 'results': results, 'details': details}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'resolution': args.resolution, 'results': results}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    return 1 if any(row[-1] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
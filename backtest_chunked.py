@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Chunked, memory-bounded backtests over long histories.
+
+run_backtest holds every symbol's full intraday history in memory, which
+doesn't fit for years of minute bars over a wide universe. Here the
+history lives on disk as calendar partitions (months or quarters) of
+plain .npy columns:
+
+    root/
+      meta.json                 interval, timezone, symbols, partition names
+      2024Q1/part-0000/         one part per batch of symbols written
+        symbol.npy time.npy open.npy ... volume.npy   (time: UTC nanoseconds)
+
+and a run walks the partitions in order. Each partition is memory-mapped,
+turned into a MarketData store, simulated and released before the next is
+opened. The only state carried across a boundary is what the stages look
+back at:
+
+  * the last CARRY_ROWS daily bars per symbol (SPY keeps SPY_CARRY_ROWS
+    for its 200-day SMA) — enough for the selector's 30-day volume
+    average, 5-day lookback and 35-bar minimum, the previous close and
+    the VIX as-of value
+  * account equity, which seeds the next partition's STARTING_EQUITY
+
+so peak memory is one partition plus small daily tails, however long the
+history. Trades and equity match a single run over the whole history.
+
+    python backtest_chunked.py build parts/ --interval 5m --freq Q
+    python backtest_chunked.py run parts/
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import backtest_data
+import backtest_orb as orb
+import backtest_vector as vector
+from backtest_universe import load_symbol_master
+
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+FREQS = ('M', 'Q')
+
+# Daily bars carried into the next partition (selector: 30-day average
+# volume + 5 excluded days, 35-bar minimum; SPY: the 200-day SMA)
+CARRY_ROWS = 40
+SPY_CARRY_ROWS = 200
+
+META_FILE = 'meta.json'
+
+
+# ============================================================
+# WRITING PARTITIONS
+# ============================================================
+
+def write_partitions(items, root, interval='1h', freq='Q', batch_size=200):
+    """
+    Split (symbol, bars) pairs into calendar partitions under `root`.
+    Symbols are buffered batch_size at a time and each batch becomes one
+    part per partition, so writing never holds more than one batch.
+    Returns the metadata written to root/meta.json.
+    """
+    if freq not in FREQS:
+        raise ValueError(f"Unsupported partition frequency: {freq} (expected one of {FREQS})")
+    os.makedirs(root, exist_ok=True)
+    symbols, partitions = [], set()
+    tz = None
+    batch = []
+    n_parts = 0
+
+    def flush():
+        nonlocal n_parts
+        partitions.update(_write_batch(batch, root, freq, f"part-{n_parts:04d}", tz))
+        n_parts += 1
+        batch.clear()
+
+    for sym, df in items:
+        if df is None or len(df) == 0:
+            continue
+        if tz is None:
+            tz = str(df.index.tz) if df.index.tz is not None else 'UTC'
+        symbols.append(sym)
+        batch.append((len(symbols) - 1, df))
+        if len(batch) == batch_size:
+            flush()
+    if batch:
+        flush()
+
+    meta = {'interval': interval, 'freq': freq, 'timezone': tz or 'UTC',
+            'symbols': symbols, 'partitions': sorted(partitions)}
+    with open(os.path.join(root, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def _write_batch(batch, root, freq, part_name, tz):
+    """Write one batch of (symbol code, bars) into every partition it touches."""
+    pieces = {}
+    for code, df in batch:
+        index = df.index if df.index.tz is not None else df.index.tz_localize(tz or 'UTC')
+        local = index.tz_convert(tz or 'UTC').tz_localize(None)
+        periods = local.to_period(freq).astype(str)
+        for name in pd.unique(periods):
+            rows = np.flatnonzero(periods == name)
+            pieces.setdefault(name, []).append((code, index[rows], df.iloc[rows]))
+
+    for name, chunks in pieces.items():
+        out_dir = os.path.join(root, name, part_name)
+        os.makedirs(out_dir, exist_ok=True)
+        np.save(os.path.join(out_dir, 'symbol.npy'),
+                np.concatenate([np.full(len(ix), code, dtype=np.int32) for code, ix, _ in chunks]))
+        np.save(os.path.join(out_dir, 'time.npy'),
+                np.concatenate([ix.tz_convert('UTC').as_unit('ns').asi8 for _, ix, _ in chunks]))
+        for col in COLUMNS:
+            dtype = np.int64 if col == 'volume' else float
+            np.save(os.path.join(out_dir, f"{col}.npy"),
+                    np.concatenate([bars[col.capitalize()].to_numpy(dtype=dtype)
+                                    for _, _, bars in chunks]))
+    return pieces.keys()
+
+
+def cache_items(symbols, interval='1h', cache_dir=None):
+    """(symbol, bars) pairs from the local bar cache, one symbol in memory at a time."""
+    for sym in symbols:
+        yield sym, backtest_data.load_cached(sym, interval, cache_dir)
+
+
+# ============================================================
+# READING PARTITIONS
+# ============================================================
+
+def read_meta(root):
+    with open(os.path.join(root, META_FILE)) as f:
+        return json.load(f)
+
+
+def load_partition(root, name, meta=None):
+    """
+    {symbol: bars} for one partition, read from memory-mapped columns.
+    Frames look like the bar cache's (tz-aware index, OHLCV columns).
+    """
+    meta = read_meta(root) if meta is None else meta
+    symbols = meta['symbols']
+    frames = {}
+    part_root = os.path.join(root, name)
+    for part in sorted(os.listdir(part_root)):
+        cols = {col: np.load(os.path.join(part_root, part, f"{col}.npy"), mmap_mode='r')
+                for col in ('symbol', 'time') + COLUMNS}
+        codes = cols['symbol']
+        if len(codes) == 0:
+            continue
+        breaks = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        for start, end in zip(np.r_[0, breaks], np.r_[breaks, len(codes)]):
+            index = pd.DatetimeIndex(np.asarray(cols['time'][start:end]).view('datetime64[ns]')).tz_localize('UTC')
+            index = index.tz_convert(meta['timezone'])
+            index.name = 'Datetime'
+            frames[symbols[codes[start]]] = pd.DataFrame(
+                {col.capitalize(): np.asarray(cols[col][start:end]) for col in COLUMNS},
+                index=index)
+    return frames
+
+
+# ============================================================
+# CHUNKED RUN
+# ============================================================
+
+def _empty_bars(tz):
+    index = pd.DatetimeIndex([], tz=tz, name='Datetime')
+    return pd.DataFrame({col.capitalize(): np.zeros(0, dtype=np.int64 if col == 'volume' else float)
+                         for col in COLUMNS}, index=index)
+
+
+def _carry_rows(sym):
+    return SPY_CARRY_ROWS if sym == 'SPY' else CARRY_ROWS
+
+
+def partition_store(frames, carry, meta, universe=None, symbol_master=None):
+    """
+    MarketData for one partition: its intraday bars, with each symbol's
+    daily bars prefixed by the tail carried from earlier partitions.
+    Symbols with a tail but no bars this partition get an empty frame, so
+    the selector still sees their history as a full run would.
+    """
+    daily = {}
+    for sym, df in frames.items():
+        part_daily = orb.get_daily_bars(df)
+        daily[sym] = pd.concat([carry[sym], part_daily]) if sym in carry else part_daily
+    for sym in carry:
+        if sym not in frames:
+            frames[sym] = _empty_bars(meta['timezone'])
+            daily[sym] = carry[sym]
+    return orb.MarketData(frames, meta['interval'], universe, symbol_master, daily=daily)
+
+
+def concat_sims(sims, config):
+    """One result dict from consecutive partition runs (equity already chained)."""
+    out = {
+        'config': dict(config),
+        'strategies': sims[0]['strategies'] if sims else [orb.ORBStrategy.name],
+        'trading_days': [],
+        'equity': config['STARTING_EQUITY'],
+        'equity_curve': [config['STARTING_EQUITY']],
+        'daily_returns': [],
+        'trades': [],
+        'monthly_pnl': {},
+    }
+    counts = ('winning_days', 'losing_days', 'flat_days', 'no_trade_days', 'total_trading_days')
+    out.update({key: 0 for key in counts})
+    for sim in sims:
+        out['trading_days'].extend(sim['trading_days'])
+        out['equity'] = sim['equity']
+        out['equity_curve'].extend(sim['equity_curve'][1:])
+        out['daily_returns'].extend(sim['daily_returns'])
+        out['trades'].extend(sim['trades'])
+        for month, pnl in sim['monthly_pnl'].items():
+            out['monthly_pnl'][month] = out['monthly_pnl'].get(month, 0) + pnl
+        for key in counts:
+            out[key] += sim[key]
+    return out
+
+
+def run_chunked(root, config=None, universe=None, symbol_master=None, engine='vector',
+                verbose=True):
+    """
+    Backtest over every partition under `root` in order, carrying daily
+    tails and equity across boundaries. `universe` defaults to SCAN_STOCKS
+    (or the symbol master's symbols). Returns simulate_backtest's dict for
+    the whole history.
+    """
+    config = orb.CONFIG if config is None else config
+    meta = read_meta(root)
+    carry = {}
+    sims = []
+    equity = config['STARTING_EQUITY']
+
+    for name in meta['partitions']:
+        frames = load_partition(root, name, meta)
+        if 'SPY' not in frames:
+            if verbose:
+                print(f"  {name}: no SPY bars, skipped")
+            continue
+        store = partition_store(frames, carry, meta, universe, symbol_master)
+        run_config = dict(config, STARTING_EQUITY=equity)
+        if engine == 'vector':
+            sim = vector.simulate_vectorized(store, run_config)
+        else:
+            sim = orb.simulate_backtest(store, run_config, verbose=False)
+        equity = sim['equity']
+        sims.append(sim)
+        if verbose:
+            print(f"  {name}: {len(sim['trading_days'])} days, {len(sim['trades'])} trades, "
+                  f"equity ${equity:,.2f}")
+
+        carry = {sym: daily.iloc[-_carry_rows(sym):] for sym, daily in store.daily.items()}
+        del store, frames
+        gc.collect()
+
+    return concat_sims(sims, config)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Partitioned, memory-bounded ORB backtests')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='write calendar partitions from the bar cache')
+    build.add_argument('root')
+    build.add_argument('--interval', choices=orb.RESOLUTIONS, default='1h')
+    build.add_argument('--freq', choices=FREQS, default='Q',
+                       help='partition length: M (month) or Q (quarter, default)')
+    build.add_argument('--cache-dir', default=None)
+    build.add_argument('--symbols', default=None,
+                       help='comma-separated symbols (default: SCAN_STOCKS + SPY, ^VIX)')
+    build.add_argument('--batch-size', type=int, default=200,
+                       help='symbols held in memory while writing (default: 200)')
+    run = sub.add_parser('run', help='backtest over the partitions')
+    run.add_argument('root')
+    run.add_argument('--engine', choices=('loop', 'vector'), default='vector')
+    run.add_argument('--universe', default=None, metavar='PATH',
+                     help='point-in-time symbol master (CSV/Parquet) instead of SCAN_STOCKS')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        symbols = (args.symbols.split(',') if args.symbols else
+                   sorted(set(orb.SCAN_STOCKS + ['SPY', '^VIX'])))
+        meta = write_partitions(cache_items(symbols, args.interval, args.cache_dir), args.root,
+                                args.interval, args.freq, args.batch_size)
+        print(f"Wrote {len(meta['partitions'])} partitions for {len(meta['symbols'])} symbols "
+              f"to {args.root}")
+        return 0
+
+    master = load_symbol_master(args.universe) if args.universe else None
+    sim = run_chunked(args.root, symbol_master=master, engine=args.engine)
+    summary = orb.summarize_backtest(sim)
+    print(f"\nDays: {len(sim['trading_days'])} | Trades: {summary['total_trades']} | "
+          f"Return: {summary['total_return_pct']:.1f}% | Sharpe: {summary['sharpe_ratio']:.2f} | "
+          f"Max DD: {summary['max_drawdown_pct']:.1f}%")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
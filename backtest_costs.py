@@ -0,0 +1,96 @@
+"""
+Execution-cost model for backtest fills.
+
+The trade kernel fills exactly at the ORB level and at the stop/target.
+An ExecutionModel turns those ideal prices into realistic fills, for
+whole arrays of trades at once:
+
+  * slippage — a fixed number of basis points against every fill
+  * spread   — half of a quoted spread, taken as a fraction of the fill
+               bar's high-low range, paid on entry and on exit
+  * gap stops — a stop first touched by a bar that opens through it
+               fills at that bar's open, not at the stop price
+  * participation — shares capped at a percentage of the entry bar's
+               volume (the rest of the order is assumed unfilled)
+
+Its parameters are CONFIG keys (SLIPPAGE_BPS, SPREAD_RANGE_PCT,
+MAX_VOLUME_PCT, GAP_STOP_FILLS; all off by default), so sweeps and
+walk-forward runs can vary them like any other parameter. A model with
+everything off returns the kernel's prices untouched. Subclass and
+override fills() / share_cap() to plug in another cost model.
+"""
+
+import numpy as np
+
+# CONFIG keys the model reads
+COST_KEYS = ('SLIPPAGE_BPS', 'SPREAD_RANGE_PCT', 'MAX_VOLUME_PCT', 'GAP_STOP_FILLS')
+
+# Preset for --costs: a couple of bps, a tenth of the bar range as
+# spread, at most 1% of the entry bar's volume, gap-through stops
+REALISTIC_COSTS = {
+    'SLIPPAGE_BPS': 2.0,
+    'SPREAD_RANGE_PCT': 10.0,
+    'MAX_VOLUME_PCT': 1.0,
+    'GAP_STOP_FILLS': True,
+}
+
+
+class ExecutionModel:
+    """Slippage, spread, gap-through stops and a volume-participation cap."""
+
+    def __init__(self, slippage_bps=0.0, spread_range_pct=0.0, max_volume_pct=0.0,
+                 gap_stop_fills=False):
+        self.slippage_bps = slippage_bps
+        self.spread_range_pct = spread_range_pct
+        self.max_volume_pct = max_volume_pct
+        self.gap_stop_fills = gap_stop_fills
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('SLIPPAGE_BPS', 0.0), config.get('SPREAD_RANGE_PCT', 0.0),
+                   config.get('MAX_VOLUME_PCT', 0.0), config.get('GAP_STOP_FILLS', False))
+
+    @property
+    def is_free(self):
+        return not (self.slippage_bps or self.spread_range_pct or self.gap_stop_fills)
+
+    def fills(self, bars, entry_idx, exit_idx, exit_reason, is_long, entry, exit_price):
+        """
+        (entry_fill, exit_fill) arrays for trades the kernel filled at
+        `entry` and `exit_price`. `bars` maps 'Open'/'High'/'Low' to the
+        arrays entry_idx and exit_idx index into.
+        """
+        entry = np.asarray(entry, dtype=float)
+        exit_price = np.asarray(exit_price, dtype=float)
+        if self.is_free:
+            return entry, exit_price
+
+        entry_idx = np.asarray(entry_idx, dtype=np.int64)
+        exit_idx = np.maximum(np.asarray(exit_idx, dtype=np.int64), 0)
+        sign = np.where(is_long, 1.0, -1.0)
+
+        if self.gap_stop_fills:
+            # backtest_orb imports this module, so take its exit codes at call time
+            from backtest_orb import EXIT_STOP
+            bar_open = bars['Open'][exit_idx]
+            gapped = ((np.asarray(exit_reason) == EXIT_STOP) & (exit_idx > entry_idx) &
+                      np.where(is_long, bar_open < exit_price, bar_open > exit_price))
+            exit_price = np.where(gapped, bar_open, exit_price)
+
+        entry_fill = entry + sign * (self._half_spread(bars, entry_idx) + self._slippage(entry))
+        exit_fill = exit_price - sign * (self._half_spread(bars, exit_idx) + self._slippage(exit_price))
+        return entry_fill, exit_fill
+
+    def share_cap(self, volume):
+        """Most shares fillable against entry-bar `volume` (array), or None if uncapped."""
+        if not self.max_volume_pct:
+            return None
+        return np.floor(np.asarray(volume, dtype=float) * self.max_volume_pct / 100).astype(np.int64)
+
+    def _half_spread(self, bars, idx):
+        if not self.spread_range_pct:
+            return 0.0
+        return (bars['High'][idx] - bars['Low'][idx]) * self.spread_range_pct / 200
+
+    def _slippage(self, price):
+        return price * self.slippage_bps / 10_000
@@ -0,0 +1,363 @@
+"""
+Local bar cache for the ORB backtest.
+
+Bars are kept in one columnar file per (interval, symbol) under CACHE_DIR.
+The first run fetches the full period; later runs fetch only the bars after
+the cached high-water mark and merge them in. Offline mode never touches
+the network and serves whatever the cache holds, so the backtest can run
+in sandboxed CI or be re-run instantly while tuning parameters.
+
+Parquet is used when pyarrow is installed, pickle otherwise.
+
+Fetching goes through a provider object (YahooProvider by default) on a
+bounded thread pool, with per-symbol retries and exponential backoff.
+Only transient errors (network failures, rate limiting) are retried; a
+provider lists them in `transient_errors` (TRANSIENT_ERRORS by default).
+Any object with a `history(symbol, interval, period=None, start=None)`
+method can stand in for Yahoo, e.g. FrameProvider over local frames.
+"""
+
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    CACHE_FORMAT = 'parquet'
+except ImportError:
+    CACHE_FORMAT = 'pickle'
+
+# Errors worth retrying: connection resets, timeouts and other I/O failures
+# (requests' exceptions are OSErrors too)
+TRANSIENT_ERRORS = (OSError,)
+
+CACHE_DIR = os.environ.get(
+    'ORB_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.bar_cache'),
+)
+
+COVERAGE_SLACK = pd.Timedelta(days=7)
+
+_PERIOD_UNITS = {
+    'd': lambda n: pd.DateOffset(days=n),
+    'wk': lambda n: pd.DateOffset(weeks=n),
+    'mo': lambda n: pd.DateOffset(months=n),
+    'y': lambda n: pd.DateOffset(years=n),
+}
+
+
+# Longest period Yahoo serves per intraday interval. Longer minute-bar
+# histories are built up in the cache across runs.
+YAHOO_MAX_PERIOD = {'1m': '7d', '5m': '60d', '1h': '730d'}
+
+
+def clamp_period(period, interval):
+    """The shorter of `period` and what Yahoo serves for `interval`."""
+    limit = YAHOO_MAX_PERIOD.get(interval)
+    if period is None or limit is None:
+        return period
+    now = pd.Timestamp.now(tz='UTC')
+    return period if period_start(period, now) >= period_start(limit, now) else limit
+
+
+class YahooProvider:
+    """Yahoo Finance bars (yfinance is imported lazily so offline runs don't need it)."""
+
+    supports_batch = True
+
+    @property
+    def transient_errors(self):
+        """Network errors plus Yahoo's rate limiting."""
+        try:
+            from yfinance.exceptions import YFRateLimitError
+        except ImportError:
+            return TRANSIENT_ERRORS
+        return TRANSIENT_ERRORS + (YFRateLimitError,)
+
+    def history(self, symbol, interval='1h', period=None, start=None):
+        import yfinance as yf
+        period = clamp_period(period, interval)
+        ticker = yf.Ticker(symbol)
+        if start is not None:
+            return ticker.history(start=start, interval=interval)
+        return ticker.history(period=period, interval=interval)
+
+    def history_batch(self, symbols, interval='1h', period=None, start=None):
+        """
+        One multi-ticker request. Mixed exchange timezones come back on a
+        shared UTC index, so frames are converted to New York time to keep
+        daily bars on the same calendar days as single-symbol requests.
+        """
+        import yfinance as yf
+        kwargs = {'start': start} if start is not None else {'period': clamp_period(period, interval)}
+        raw = yf.download(list(symbols), interval=interval, group_by='ticker',
+                          auto_adjust=True, threads=False, progress=False, **kwargs)
+        frames = {}
+        for sym in symbols:
+            if sym not in raw.columns.get_level_values(0):
+                continue
+            df = raw[sym].dropna(how='all')
+            if df.index.tz is not None:
+                df = df.tz_convert('America/New_York')
+            frames[sym] = df
+        return frames
+
+
+class FrameProvider:
+    """Serves bars from in-memory frames ({symbol: DataFrame}); for tests and benchmarks."""
+
+    supports_batch = False
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def history(self, symbol, interval='1h', period=None, start=None):
+        df = self.frames.get(symbol)
+        if df is None:
+            raise KeyError(f"no bars for {symbol}")
+        if start is not None:
+            df = df[df.index >= _align(pd.Timestamp(start), df.index)]
+        return df
+
+
+def cache_path(symbol, interval, cache_dir=None):
+    """File holding the cached bars for one symbol and interval."""
+    safe = re.sub(r'[^A-Za-z0-9^._-]', '_', symbol)
+    ext = 'parquet' if CACHE_FORMAT == 'parquet' else 'pkl'
+    return os.path.join(cache_dir or CACHE_DIR, interval, f"{safe}.{ext}")
+
+
+def load_cached(symbol, interval, cache_dir=None):
+    """Cached bars for a symbol, or None if nothing is cached."""
+    path = cache_path(symbol, interval, cache_dir)
+    if not os.path.exists(path):
+        return None
+    if CACHE_FORMAT == 'parquet':
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+def save_cached(symbol, interval, df, cache_dir=None):
+    """Write bars to the cache atomically (write to a temp file, then rename)."""
+    path = cache_path(symbol, interval, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Unique per writer: concurrent fetches of one symbol must not share a temp file
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if CACHE_FORMAT == 'parquet':
+        df.to_parquet(tmp)
+    else:
+        df.to_pickle(tmp)
+    os.replace(tmp, path)
+
+
+def period_start(period, now=None):
+    """Earliest timestamp covered by a yfinance-style period ('1y', '6mo', '60d')."""
+    match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period)
+    if match is None:
+        raise ValueError(f"Unsupported period: {period!r}")
+    now = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now)
+    return now - _PERIOD_UNITS[match.group(2)](int(match.group(1)))
+
+
+def merge_bars(cached, fresh):
+    """Append fresh bars to cached ones; fresh rows win on overlapping timestamps."""
+    if cached is None or len(cached) == 0:
+        return fresh
+    if fresh is None or len(fresh) == 0:
+        return cached
+    merged = pd.concat([cached, fresh])
+    merged = merged[~merged.index.duplicated(keep='last')]
+    return merged.sort_index()
+
+
+def _align(ts, index):
+    """Make a timestamp comparable with an index (tz-aware or naive)."""
+    if ts.tzinfo is not None and index.tz is None:
+        return ts.tz_convert('UTC').tz_localize(None)
+    if ts.tzinfo is None and index.tz is not None:
+        return ts.tz_localize(index.tz)
+    return ts
+
+
+def _window(df, start):
+    return df[df.index >= _align(start, df.index)]
+
+
+def _plan_request(cached, period, now):
+    """
+    What to fetch for one symbol given its cached bars: the bars from the
+    high-water mark's session onward if the cache covers the period, or the
+    whole period otherwise.
+    """
+    # A cache that starts within a week of the period start covers it
+    # (the first bars of a period land after weekends and holidays)
+    start = period_start(period, now)
+    if cached is not None and len(cached) > 0 and \
+            cached.index.min() <= _align(start, cached.index) + COVERAGE_SLACK:
+        return {'start': cached.index.max().strftime('%Y-%m-%d')}
+    return {'period': period}
+
+
+def _with_retry(call, retries, backoff, transient=TRANSIENT_ERRORS, used=0):
+    """
+    Run call(), retrying `transient` errors with exponential backoff until
+    retries + 1 attempts, counting `used` earlier ones, are spent. Other
+    errors are raised at once.
+    """
+    for attempt in range(used, retries + 1):
+        try:
+            return call()
+        except transient:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def load_many(symbols, interval='1h', period='1y', cache_dir=None, offline=False,
+              provider=None, max_workers=8, retries=3, backoff=0.5, batch_size=1,
+              now=None, on_done=None):
+    """
+    Bars for many symbols over the last `period`, read through the cache.
+
+    Fetches run on a pool of at most `max_workers` threads. A symbol gets
+    retries + 1 attempts in all; transient errors are retried with
+    exponential backoff starting at `backoff` seconds, others fail at once.
+    With batch_size > 1 and a provider that supports it, symbols needing
+    the same request are fetched batch_size at a time; symbols missing
+    from a batch are fetched one by one with the attempts the batch left.
+    `on_done(symbol)` is called as each symbol finishes.
+
+    Returns (frames, report) where report maps each symbol to its latency
+    in seconds, attempts, row count and error (None on success).
+    """
+    provider = YahooProvider() if provider is None else provider
+    transient = getattr(provider, 'transient_errors', TRANSIENT_ERRORS)
+    frames = {}
+    report = {}
+
+    def finish(sym, started, attempts, df=None, error=None):
+        report[sym] = {
+            'latency': round(time.perf_counter() - started, 3),
+            'attempts': attempts,
+            'rows': 0 if df is None else len(df),
+            'error': error,
+        }
+        if df is not None and len(df) > 0:
+            frames[sym] = df
+        if on_done is not None:
+            on_done(sym)
+
+    if offline:
+        for sym in symbols:
+            started = time.perf_counter()
+            try:
+                df = load_bars(sym, interval, period, cache_dir, offline=True)
+                finish(sym, started, 0, df, None if df is not None else 'not cached')
+            except Exception as e:
+                finish(sym, started, 0, error=repr(e))
+        return frames, report
+
+    cached = {sym: load_cached(sym, interval, cache_dir) for sym in symbols}
+    requests = {sym: _plan_request(cached[sym], period, now) for sym in symbols}
+    start = period_start(period, now)
+
+    def store(sym, fresh):
+        # Full-period fetches merge too: minute-bar requests are capped
+        # well short of the period, so older cached bars must survive
+        merged = merge_bars(cached[sym], fresh)
+        if merged is None or len(merged) == 0:
+            return merged
+        save_cached(sym, interval, merged, cache_dir)
+        return _window(merged, start)
+
+    def fetch_one(sym, used=0, error=None):
+        """Fetch one symbol; `used` attempts (ending in `error`) were spent on its batch."""
+        started = time.perf_counter()
+        calls = [used]
+
+        def request():
+            calls[0] += 1
+            return provider.history(sym, interval=interval, **requests[sym])
+
+        try:
+            if used > retries:
+                # The batch spent the whole budget
+                raise error if error is not None else KeyError(sym)
+            fresh = _with_retry(request, retries, backoff, transient, used)
+        except Exception as e:
+            if 'start' in requests[sym]:
+                # Refresh failed: fall back to what's already cached
+                finish(sym, started, calls[0], _window(cached[sym], start),
+                       f"refresh failed, using cache: {e!r}")
+            else:
+                finish(sym, started, calls[0], error=repr(e))
+            return
+        finish(sym, started, calls[0], store(sym, fresh))
+
+    def fetch_batch(batch, request):
+        started = time.perf_counter()
+        calls = [0]
+
+        def request_batch():
+            calls[0] += 1
+            return provider.history_batch(batch, interval=interval, **request)
+
+        try:
+            got, error = _with_retry(request_batch, retries, backoff, transient), None
+        except Exception as e:
+            got, error = {}, e
+        missing = []
+        for sym in batch:
+            if sym in got and len(got[sym]) > 0:
+                finish(sym, started, calls[0], store(sym, got[sym]))
+            else:
+                missing.append(sym)
+        for sym in missing:
+            fetch_one(sym, calls[0], error)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = []
+        if batch_size > 1 and getattr(provider, 'supports_batch', False):
+            groups = {}
+            for sym in symbols:
+                groups.setdefault(tuple(sorted(requests[sym].items())), []).append(sym)
+            for key, group in groups.items():
+                for i in range(0, len(group), batch_size):
+                    futures.append(pool.submit(fetch_batch, group[i:i + batch_size], dict(key)))
+        else:
+            futures = [pool.submit(fetch_one, sym) for sym in symbols]
+        for future in as_completed(futures):
+            future.result()
+
+    return frames, report
+
+
+def load_bars(symbol, interval='1h', period='1y', cache_dir=None, offline=False,
+              provider=None, now=None):
+    """
+    Bars for one symbol over the last `period`, read through the cache.
+
+    With a warm cache only bars from the high-water mark's session onward
+    are fetched (that session is re-fetched in case it was cached while
+    still open). The full period is fetched when the cache is empty or
+    doesn't reach back far enough. In offline mode nothing is fetched: the
+    period ending at the last cached bar is returned, or None if the
+    symbol isn't cached.
+    """
+    if offline:
+        cached = load_cached(symbol, interval, cache_dir)
+        if cached is None or len(cached) == 0:
+            return None
+        # Anchor the window at the cache's last bar so offline runs are
+        # reproducible no matter when they happen
+        return _window(cached, period_start(period, cached.index.max()))
+
+    frames, report = load_many([symbol], interval, period, cache_dir,
+                               provider=provider, max_workers=1, now=now)
+    if report[symbol]['error'] is not None and symbol not in frames:
+        raise RuntimeError(report[symbol]['error'])
+    return frames.get(symbol)
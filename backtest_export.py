@@ -0,0 +1,183 @@
+"""
+Full backtest results on disk: every trade, the equity curve and the
+daily returns, for one run or a whole sweep.
+
+An export directory holds two tables, each tagged with a `run` id (the
+row number in a sweep's results table; 0 for a single backtest):
+
+    trades.parquet   one row per trade (TRADE_DTYPE)
+    daily.parquet    date, equity and daily_return_pct per day (DAILY_DTYPE)
+
+Rows are converted to NumPy structured arrays as soon as a run finishes
+(that is also what sweep workers send back) and streamed out in row
+groups, so nothing is held as dicts or dumped in one piece. Parquet is
+used when pyarrow is installed and read back memory-mapped; otherwise the
+tables are JSON Lines (trades.jsonl, daily.jsonl).
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    EXPORT_FORMAT = 'parquet'
+except ImportError:
+    EXPORT_FORMAT = 'jsonl'
+
+FORMATS = ('parquet', 'jsonl')
+
+TRADE_DTYPE = np.dtype([
+    ('run', 'i4'),
+    ('date', 'datetime64[D]'),
+    ('symbol', 'U10'),
+    ('signal', 'U5'),
+    ('entry', 'f8'),
+    ('shares', 'i8'),
+    ('pnl', 'f8'),
+    ('r_multiple', 'f8'),
+    ('risk_pct', 'f8'),
+    ('regime', 'U15'),
+    ('vix', 'f8'),
+    ('strategy', 'U10'),
+    ('rank', 'i1'),
+    ('exit_reason', 'U6'),
+])
+
+DAILY_DTYPE = np.dtype([
+    ('run', 'i4'),
+    ('date', 'datetime64[D]'),
+    ('equity', 'f8'),
+    ('daily_return_pct', 'f8'),
+])
+
+# Rows buffered per table before a row group is written
+ROW_GROUP_ROWS = 100_000
+
+
+def trades_to_array(trades, run=0):
+    """A list of trade records (or dicts) as a TRADE_DTYPE structured array."""
+    out = np.zeros(len(trades), dtype=TRADE_DTYPE)
+    out['run'] = run
+    for name in TRADE_DTYPE.names[1:]:
+        out[name] = [t[name] for t in trades]
+    return out
+
+
+def daily_to_array(sim, run=0):
+    """A simulate_backtest result's equity curve and daily returns as a DAILY_DTYPE array."""
+    returns = sim['daily_returns']
+    days = sim['trading_days']
+    if len(days) != len(returns):
+        raise ValueError(f"{len(days)} trading days but {len(returns)} daily returns")
+    out = np.zeros(len(returns), dtype=DAILY_DTYPE)
+    out['run'] = run
+    out['date'] = np.array(days, dtype='datetime64[D]')
+    out['equity'] = sim['equity_curve'][1:]
+    out['daily_return_pct'] = returns
+    return out
+
+
+def table_path(out_dir, name, fmt=None):
+    fmt = fmt or EXPORT_FORMAT
+    return os.path.join(out_dir, f"{name}.{fmt}")
+
+
+class ResultsWriter:
+    """
+    Streams runs into an export directory. Use as a context manager, or
+    call close() to flush the last row groups.
+
+        with ResultsWriter('results/') as writer:
+            writer.write(sim)
+    """
+
+    def __init__(self, out_dir, fmt=None):
+        fmt = fmt or EXPORT_FORMAT
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        if fmt == 'parquet' and EXPORT_FORMAT != 'parquet':
+            raise ImportError("Parquet export needs pyarrow")
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self._buffers = {'trades': [], 'daily': []}
+        self._sinks = {}
+
+    def write(self, sim, run=0):
+        """Append one simulate_backtest result under the given run id."""
+        self.write_arrays(trades_to_array(sim['trades'], run), daily_to_array(sim, run))
+
+    def write_arrays(self, trades, daily):
+        """Append already-converted TRADE_DTYPE / DAILY_DTYPE arrays."""
+        for name, rows in (('trades', trades), ('daily', daily)):
+            self._buffers[name].append(rows)
+            if sum(len(b) for b in self._buffers[name]) >= ROW_GROUP_ROWS:
+                self._flush(name)
+
+    def close(self):
+        for name in self._buffers:
+            self._flush(name)
+        for sink in self._sinks.values():
+            sink.close()
+        self._sinks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _flush(self, name):
+        buffered = self._buffers[name]
+        dtype = TRADE_DTYPE if name == 'trades' else DAILY_DTYPE
+        rows = np.concatenate(buffered) if buffered else np.zeros(0, dtype=dtype)
+        self._buffers[name] = []
+        if len(rows) == 0 and name in self._sinks:
+            return
+
+        path = table_path(self.out_dir, name, self.fmt)
+        if self.fmt == 'parquet':
+            table = pa.table({col: rows[col] for col in dtype.names})
+            if name not in self._sinks:
+                self._sinks[name] = pq.ParquetWriter(path, table.schema)
+            self._sinks[name].write_table(table)
+        else:
+            if name not in self._sinks:
+                self._sinks[name] = open(path, 'w')
+            if len(rows) > 0:
+                frame = pd.DataFrame({col: rows[col] for col in dtype.names})
+                frame['date'] = frame['date'].dt.strftime('%Y-%m-%d')
+                self._sinks[name].write(frame.to_json(orient='records', lines=True).rstrip('\n') + '\n')
+
+
+def _load(out_dir, name, columns=None, runs=None):
+    parquet = table_path(out_dir, name, 'parquet')
+    if os.path.exists(parquet):
+        filters = [('run', 'in', list(runs))] if runs is not None else None
+        table = pq.read_table(parquet, columns=columns, filters=filters, memory_map=True)
+        return table.to_pandas(date_as_object=False)
+
+    frame = pd.read_json(table_path(out_dir, name, 'jsonl'), lines=True,
+                         dtype={'symbol': str, 'date': str})
+    if len(frame) > 0:
+        frame['date'] = pd.to_datetime(frame['date'])
+    if runs is not None:
+        frame = frame[frame['run'].isin(list(runs))]
+    return frame[columns] if columns is not None else frame
+
+
+def load_trades(out_dir, columns=None, runs=None):
+    """
+    Exported trades as a DataFrame, optionally only some columns and runs.
+    Parquet exports are memory-mapped and only the requested columns are
+    decoded, so a multi-million-trade sweep loads without a full copy.
+    """
+    return _load(out_dir, 'trades', columns, runs)
+
+
+def load_daily(out_dir, columns=None, runs=None):
+    """Exported equity curves and daily returns as a DataFrame (see load_trades)."""
+    return _load(out_dir, 'daily', columns, runs)
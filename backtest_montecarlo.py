@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo / bootstrap robustness check for an ORB backtest.
+
+Two resampling modes, each IID or moving-block (block > 1 keeps runs of
+consecutive days together, preserving streaks and volatility clustering):
+
+  * trades — rebuild each path day by day from the backtest's trades.
+    `unit='day'` draws whole trading days (their trades' R-multiples and
+    tiers together); `unit='trade'` keeps the daily slots and draws
+    R-multiples from the pool of all trades. Sizing is re-applied per path:
+    each trade risks its tier's fraction of start-of-day equity (TIER1_RISK
+    / TIER1_AGGRESSIVE_RISK for #1, TIER2_RISK otherwise), trading stops
+    once the day's P&L reaches MAX_DAILY_LOSS_PCT, and equity compounds.
+  * returns — resample the backtest's daily returns directly.
+
+Paths are simulated in NumPy batches of (paths × days × trades-per-day);
+chunks can be spread over processes. Seeds come from one SeedSequence, so
+results don't depend on the number of workers.
+
+    python backtest_montecarlo.py --offline --paths 100000
+    python backtest_montecarlo.py --offline --mode returns --block 5
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import backtest_orb as orb
+
+PERCENTILES = (2.5, 5, 25, 50, 75, 95, 97.5)
+LIMIT_TOLERANCE = 1e-9
+
+
+def day_matrix(sim, config=None):
+    """
+    The backtest's trades as padded (days × max trades per day) arrays:
+    R-multiples, risk fractions re-derived from `config`'s tiers, and a mask
+    of real trades. Days without trades are all-padding rows. A trade is
+    tier 1 if it was the day's #1 pick (its record's rank is 1).
+    """
+    config = sim['config'] if config is None else config
+    by_day = {d.strftime('%Y-%m-%d'): [] for d in sim['trading_days']}
+    for t in sim['trades']:
+        by_day.setdefault(t['date'], []).append(t)
+
+    width = max([len(trades) for trades in by_day.values()] + [1])
+    r = np.zeros((len(by_day), width))
+    risk = np.zeros((len(by_day), width))
+    valid = np.zeros((len(by_day), width), dtype=bool)
+    for i, trades in enumerate(by_day.values()):
+        for k, t in enumerate(trades):
+            if t['rank'] != 1:
+                risk[i, k] = config['TIER2_RISK']
+            elif t['regime'] == 'aggressive_bull':
+                risk[i, k] = config['TIER1_AGGRESSIVE_RISK']
+            else:
+                risk[i, k] = config['TIER1_RISK']
+            r[i, k] = t['r_multiple']
+            valid[i, k] = True
+    return r, risk, valid
+
+
+def bootstrap_indices(rng, n, n_paths, length, block=1):
+    """(n_paths × length) indices into range(n): IID, or moving blocks of `block`."""
+    if block <= 1:
+        return rng.integers(0, n, size=(n_paths, length))
+    n_blocks = -(-length // block)
+    starts = rng.integers(0, max(n - block + 1, 1), size=(n_paths, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block)).reshape(n_paths, -1)[:, :length]
+    return np.minimum(idx, n - 1)
+
+
+def path_stats(equity, starting_equity):
+    """Total return % and max drawdown % for each equity path (paths × steps)."""
+    curve = np.concatenate([np.full((len(equity), 1), float(starting_equity)), equity], axis=1)
+    peak = np.maximum.accumulate(curve, axis=1)
+    max_dd = ((peak - curve) / peak).max(axis=1) * 100
+    total_return = (curve[:, -1] / starting_equity - 1) * 100
+    return total_return, max_dd
+
+
+def day_returns(slots, config):
+    """
+    Each day's return as a fraction of start-of-day equity. `slots` yields
+    (r, risk, valid) arrays for the 1st, 2nd, ... trade of each day, all of
+    the same shape. A trade is taken only while the day's loss is under
+    MAX_DAILY_LOSS_PCT, and at most MAX_TRADES_PER_DAY per day (all zeros
+    with MAX_TRADES_PER_DAY = 0).
+    """
+    limit = config['MAX_DAILY_LOSS_PCT'] + LIMIT_TOLERANCE
+    total = None
+    for k, (r, risk, valid) in enumerate(slots):
+        if total is None:
+            total = np.zeros(r.shape)
+        if k == config['MAX_TRADES_PER_DAY']:
+            break
+        # Whole-share sizing keeps each loss just under its risk budget, so
+        # losses summing to exactly the limit don't stop the day in the backtest
+        take = valid & (np.abs(total) < limit)
+        total += np.where(take, risk * r, 0.0)
+    return total
+
+
+def _trade_paths(args):
+    seed, n_paths, r, risk, valid, unit, block, config = args
+    rng = np.random.default_rng(seed)
+    n_days, width = r.shape
+    day_idx = bootstrap_indices(rng, n_days, n_paths, n_days, block)
+    if unit == 'trade' and not valid.any():
+        # No trades to draw R-multiples from: every path stays flat
+        path_returns = np.zeros((n_paths, n_days))
+    elif unit == 'trade':
+        # Keep the sampled days' trade slots, draw R-multiples from all trades
+        pool = r[valid]
+        trade_idx = bootstrap_indices(rng, len(pool), n_paths, n_days * width, block)
+        trade_idx = trade_idx.reshape(n_paths, n_days, width)
+        slots = ((pool[trade_idx[:, :, k]], risk[day_idx, k], valid[day_idx, k])
+                 for k in range(width))
+        path_returns = day_returns(slots, config)
+    else:
+        # Whole days keep their trades, so each day's return is fixed
+        slots = ((r[:, k], risk[:, k], valid[:, k]) for k in range(width))
+        path_returns = day_returns(slots, config)[day_idx]
+
+    equity = config['STARTING_EQUITY'] * np.cumprod(1 + path_returns, axis=1)
+    return path_stats(equity, config['STARTING_EQUITY'])
+
+
+def _return_paths(args):
+    seed, n_paths, daily_returns, block, starting_equity = args
+    rng = np.random.default_rng(seed)
+    idx = bootstrap_indices(rng, len(daily_returns), n_paths, len(daily_returns), block)
+    equity = starting_equity * np.cumprod(1 + daily_returns[idx] / 100, axis=1)
+    return path_stats(equity, starting_equity)
+
+
+def monte_carlo(sim, n_paths=100_000, mode='trades', unit='day', block=1, config=None,
+                seed=0, chunk=10_000, workers=1):
+    """
+    Run n_paths bootstrap paths of a simulate_backtest result. Returns
+    (total_return_pct, max_drawdown_pct) arrays with one value per path.
+    """
+    config = dict(sim['config'] if config is None else config)
+    seeds = np.random.SeedSequence(seed).spawn(-(-n_paths // chunk))
+    sizes = [min(chunk, n_paths - i * chunk) for i in range(len(seeds))]
+
+    if mode == 'returns':
+        daily_returns = np.asarray(sim['daily_returns'], dtype=float)
+        func = _return_paths
+        tasks = [(s, n, daily_returns, block, config['STARTING_EQUITY'])
+                 for s, n in zip(seeds, sizes)]
+    else:
+        r, risk, valid = day_matrix(sim, config)
+        func = _trade_paths
+        tasks = [(s, n, r, risk, valid, unit, block, config) for s, n in zip(seeds, sizes)]
+
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(func, tasks))
+    else:
+        parts = [func(task) for task in tasks]
+    returns = np.concatenate([p[0] for p in parts])
+    drawdowns = np.concatenate([p[1] for p in parts])
+    return returns, drawdowns
+
+
+def distribution(values):
+    """Mean, standard deviation and percentiles of a metric across paths."""
+    stats = {'mean': float(values.mean()), 'std': float(values.std())}
+    for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        stats[f"p{p:g}"] = float(v)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ORB Monte Carlo robustness check')
+    parser.add_argument('--paths', type=int, default=100_000)
+    parser.add_argument('--mode', choices=('trades', 'returns'), default='trades')
+    parser.add_argument('--unit', choices=('day', 'trade'), default='day',
+                        help='trades mode: resample whole days or single R-multiples')
+    parser.add_argument('--block', type=int, default=1,
+                        help='block length for the block bootstrap (default: 1, IID)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1,
+                        help=f'processes (default: 1; this machine has {os.cpu_count()})')
+    parser.add_argument('--output', default='montecarlo_results.json')
+    parser.add_argument('--resolution', choices=orb.RESOLUTIONS, default='1h')
+    parser.add_argument('--offline', action='store_true',
+                        help='run entirely from the local bar cache (no network)')
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args(argv)
+
+    store = orb.prepare_market_data(args.resolution, offline=args.offline,
+                                    cache_dir=args.cache_dir)
+    if store is None:
+        return None
+    sim = orb.simulate_backtest(store, verbose=False)
+    base = orb.summarize_backtest(sim)
+
+    started = time.perf_counter()
+    returns, drawdowns = monte_carlo(sim, args.paths, args.mode, args.unit, args.block,
+                                     seed=args.seed, workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    label = f"{args.mode}" + (f"/{args.unit}" if args.mode == 'trades' else '')
+    kind = 'IID' if args.block <= 1 else f"block={args.block}"
+    print(f"\n🎲 MONTE CARLO — {args.paths:,} paths ({label}, {kind}) in {elapsed:.1f}s")
+    print(f"  Backtest:  return {base['total_return_pct']:.1f}%, max drawdown {base['max_drawdown_pct']:.1f}%")
+    for name, values in (('Total Return %', returns), ('Max Drawdown %', drawdowns)):
+        d = distribution(values)
+        print(f"  {name:<15} median {d['p50']:>8.1f}  95% CI [{d['p2.5']:.1f}, {d['p97.5']:.1f}]"
+              f"  5–95% [{d['p5']:.1f}, {d['p95']:.1f}]")
+    print(f"  P(loss):            {np.mean(returns < 0) * 100:>6.1f}%")
+    print(f"  P(drawdown > 20%):  {np.mean(drawdowns > 20) * 100:>6.1f}%")
+
+    results = {
+        'paths': args.paths,
+        'mode': args.mode,
+        'unit': args.unit,
+        'block': args.block,
+        'seed': args.seed,
+        'total_return_pct': distribution(returns),
+        'max_drawdown_pct': distribution(drawdowns),
+        'prob_loss': float(np.mean(returns < 0)),
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -7,13 +7,21 @@ Uses Yahoo Finance hourly data as proxy for 5-min ORB.
 The 9:30-10:30 AM hourly bar approximates the opening range.
 """
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import argparse
 import json
 import sys
 
+from backtest_data import load_many
+from backtest_export import ResultsWriter
+import backtest_timing as timing
+from backtest_universe import load_symbol_master
+from backtest_costs import COST_KEYS, ExecutionModel, REALISTIC_COSTS
+import backtest_analytics as analytics
+from backtest_regime import RegimeCalendar, load_regime_calendar, rolling_sma
+
 # ============================================================
 # CONFIGURATION — matches auto-trade/index.ts exactly
 # ============================================================
@@ -31,8 +39,19 @@ CONFIG = {
     'PREMARKET_COOLOFF_PCT': 8.0,
     'VIX_SHORTS_ONLY': 25,
     'VIX_AGGRESSIVE_BULL': 18,
+    'ORB_MINUTES': 5,               # Opening range length (minute bars)
+    'ENTRY_CUTOFF_MINUTE': 11 * 60, # No new breakouts after 11:00 AM
+    # Execution costs (backtest only, see backtest_costs; 0 = off)
+    'SLIPPAGE_BPS': 0.0,            # Adverse slippage per fill
+    'SPREAD_RANGE_PCT': 0.0,        # Quoted spread as % of the fill bar's range
+    'MAX_VOLUME_PCT': 0.0,          # Cap shares at % of the entry bar's volume
+    'GAP_STOP_FILLS': False,        # Stops gapped through fill at the bar open
 }
 
+# Bar resolutions the backtest understands. With 1h bars the opening range
+# is estimated from the first hourly bar; finer bars measure it directly.
+RESOLUTIONS = ('1m', '5m', '1h')
+
 # Stock universe — same as orb-stock-selector
 SCAN_STOCKS = [
     'NVDA', 'AMD', 'SMCI', 'ARM', 'AVGO', 'MRVL', 'MU', 'INTC',
@@ -47,35 +66,61 @@ SCAN_STOCKS = [
 
 FALLBACK_STOCKS = ['NVDA', 'TSLA', 'AMD', 'SMCI']
 
+# CONFIG keys the stock selector depends on
+SELECTOR_KEYS = ('MIN_RVOL', 'MIN_CHANGE_PCT', 'MIN_PRICE')
+
 
-def download_data(symbols, period='1y'):
-    """Download hourly data for all symbols + SPY + VIX."""
-    all_symbols = list(set(symbols + ['SPY', '^VIX']))
-    print(f"Downloading hourly data for {len(all_symbols)} symbols...")
+def download_data(symbols, period='1y', interval='1h', offline=False, cache_dir=None,
+                  provider=None, max_workers=8, retries=3, batch_size=1):
+    """
+    Download intraday bars (hourly by default) for all symbols + SPY + VIX.
+    
+    Reads through the local bar cache (see backtest_data): only bars newer
+    than the cached high-water mark are fetched, and offline mode runs from
+    the cache alone. Fetches run concurrently with retries; a per-symbol
+    latency/failure report is printed at the end.
+    """
+    all_symbols = sorted(set(symbols + ['SPY', '^VIX']))
+    mode = ' (offline, from cache)' if offline else ''
+    print(f"Downloading {interval} data for {len(all_symbols)} symbols{mode}...")
+    
+    done = []
+    
+    def progress(sym):
+        done.append(sym)
+        if len(done) % 10 == 0:
+            print(f"  Downloaded {len(done)}/{len(all_symbols)}...")
+    
+    # 1h data available for ~730 days
+    frames, report = load_many(all_symbols, interval=interval, period=period,
+                               cache_dir=cache_dir, offline=offline, provider=provider,
+                               max_workers=max_workers, retries=retries,
+                               batch_size=batch_size, on_done=progress)
     
     data = {}
     failed = []
-    
-    for i, sym in enumerate(all_symbols):
-        try:
-            ticker = yf.Ticker(sym)
-            # 1h data available for ~730 days
-            df = ticker.history(period=period, interval='1h')
-            if len(df) > 50:
-                data[sym] = df
-                if (i + 1) % 10 == 0:
-                    print(f"  Downloaded {i+1}/{len(all_symbols)}...")
-            else:
-                failed.append(sym)
-        except Exception as e:
+    for sym in all_symbols:
+        df = frames.get(sym)
+        if df is not None and len(df) > 50:
+            data[sym] = df
+        else:
             failed.append(sym)
+            if report[sym]['error'] is None:
+                report[sym]['error'] = f"only {report[sym]['rows']} bars"
     
     print(f"Got data for {len(data)} symbols, {len(failed)} failed: {failed[:10]}")
+    for sym in failed:
+        print(f"  {sym}: {report[sym]['error']}")
+    slowest = sorted(report.items(), key=lambda kv: kv[1]['latency'], reverse=True)[:3]
+    if slowest and not offline:
+        print("  Slowest: " + ", ".join(f"{sym} {r['latency']:.2f}s ({r['attempts']} tries)"
+                                        for sym, r in slowest))
     return data
 
 
 def get_daily_bars(hourly_df):
     """Convert hourly bars to daily OHLCV."""
+    timing.count('resamples')
     daily = hourly_df.resample('D').agg({
         'Open': 'first',
         'High': 'max',
@@ -86,19 +131,148 @@ def get_daily_bars(hourly_df):
     return daily
 
 
-def estimate_orb_range(hourly_df, date):
+class MarketData:
     """
-    Estimate the 5-minute Opening Range from hourly data.
+    Precomputed market-data store, built once after download_data.
+
+    Holds the daily OHLCV, contiguous hourly OHLCV arrays, the per-day row
+    offsets into them and the rolling 30-day volume average for every
+    symbol, so the day loop
+    never resamples or masks a full year of bars. Date lookups are
+    positional: a dict hit for per-day slices and a binary search into the
+    sorted daily dates for as-of values (SMA, VIX, previous close).
+    """
+
+    def __init__(self, all_data, resolution='1h', universe=None, symbol_master=None, daily=None):
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unsupported resolution: {resolution}")
+        self.resolution = resolution
+        # Dated universe membership (backtest_universe.SymbolMaster); when
+        # set, the selector only picks symbols listed on each date
+        self.symbol_master = symbol_master
+        # Symbols the stock selector scans by default
+        if universe is None:
+            universe = SCAN_STOCKS if symbol_master is None else symbol_master.symbols
+        self.universe = list(universe)
+        self.hourly = all_data
+        self.daily = {}
+        self.daily_dates = {}
+        self.avg_vol_30d = {}
+        self.day_slices = {}
+        self.arrays = {}
+        self.minute_of_day = {}
+        self.panels = {}
+        self.selections = {}
+        self.smas = {}
+        # SPY/VIX regime per day (backtest_regime); built from these bars
+        # on first use unless a saved calendar is set
+        self.regime_calendar = None
+
+        # Daily bars already built for this data (backtest_stages) skip the resample
+        prebuilt = {} if daily is None else daily
+        for sym, hourly_df in all_data.items():
+            daily = prebuilt[sym] if sym in prebuilt else get_daily_bars(hourly_df)
+            self.daily[sym] = daily
+            self.daily_dates[sym] = _day_keys(daily.index)
+            # Row i holds the mean volume of rows i-29..i; the selector reads
+            # it 5 rows back so the most recent 5 days are excluded.
+            self.avg_vol_30d[sym] = daily['Volume'].rolling(30).mean().to_numpy()
+            self.day_slices[sym] = _day_offsets(hourly_df.index)
+            self.arrays[sym] = {
+                col: hourly_df[col].to_numpy(dtype=float)
+                for col in ('Open', 'High', 'Low', 'Close', 'Volume')
+            }
+            index = hourly_df.index
+            self.minute_of_day[sym] = np.asarray(index.hour * 60 + index.minute, dtype=np.int64)
+
+        # Trading calendar from SPY
+        self.trading_days = sorted(set(all_data['SPY'].index.date)) if 'SPY' in all_data else []
+
+    def __contains__(self, sym):
+        return sym in self.hourly
+
+    def prior_count(self, sym, date):
+        """Number of daily bars strictly before date."""
+        key = np.datetime64(pd.Timestamp(date).date(), 'D')
+        return int(np.searchsorted(self.daily_dates[sym], key, side='left'))
+
+    def asof_count(self, sym, date):
+        """Number of daily bars on or before date."""
+        key = np.datetime64(pd.Timestamp(date).date(), 'D')
+        return int(np.searchsorted(self.daily_dates[sym], key, side='right'))
+
+    def asof_close(self, sym, date, default=None):
+        """Last daily close on or before date."""
+        n = self.asof_count(sym, date) if sym in self else 0
+        return self.daily[sym]['Close'].iloc[n - 1] if n > 0 else default
+
+    def sma(self, sym, period):
+        """
+        Per-row simple moving average of daily closes, over the last
+        `period` rows (or all rows so far while fewer are available).
+        Every window's mean equals a sliced frame's Series.mean() bit for
+        bit (see backtest_regime.rolling_sma).
+        """
+        key = (sym, period)
+        if key not in self.smas:
+            self.smas[key] = rolling_sma(self.daily[sym]['Close'].to_numpy(dtype=float), period)
+        return self.smas[key]
+    
+    def regimes(self):
+        """The store's RegimeCalendar, built from its SPY and ^VIX bars on first use."""
+        if self.regime_calendar is None:
+            vix = self.daily.get('^VIX')
+            self.regime_calendar = RegimeCalendar.from_closes(
+                self.daily_dates['SPY'], self.daily['SPY']['Close'].to_numpy(dtype=float),
+                self.daily_dates['^VIX'] if vix is not None else [],
+                vix['Close'].to_numpy(dtype=float) if vix is not None else [],
+                CONFIG)
+        return self.regime_calendar
+
+    def day_bars(self, sym, date):
+        """The symbol's intraday bars for one date (empty frame if none)."""
+        hourly_df = self.hourly[sym]
+        start, end = self.day_slices[sym].get(pd.Timestamp(date).date(), (0, 0))
+        timing.count('frames_sliced')
+        return hourly_df.iloc[start:end]
+
+
+def _day_keys(index):
+    """Exchange-local calendar day of each row as datetime64[D]."""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.values.astype('datetime64[D]')
+
+
+def _day_offsets(index):
+    """Map each calendar date to its (start, end) row range in a sorted index."""
+    keys = _day_keys(index)
+    if len(keys) == 0:
+        return {}
+    breaks = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    starts = np.r_[0, breaks]
+    ends = np.r_[breaks, len(keys)]
+    return {
+        day: (start, end)
+        for day, start, end in zip(keys[starts].tolist(), starts.tolist(), ends.tolist())
+    }
+
+
+def estimate_orb_range(day_data):
+    """
+    Estimate the 5-minute Opening Range from one day's hourly data.
     Uses the 9:30 AM hourly bar. The ORB is typically 30-60% of the
     first hour's range for liquid stocks.
     """
-    day_data = hourly_df[hourly_df.index.date == date.date()]
     if len(day_data) == 0:
         return None
     
     # First bar of the day (9:30 AM hour)
-    first_bar = day_data.iloc[0]
-    
+    return orb_from_first_bar(day_data.iloc[0])
+
+
+def orb_from_first_bar(first_bar):
+    """The 45% heuristic applied to one first-hour bar (any mapping of OHLCV)."""
     # The 5-min ORB is typically ~40-50% of the first hour's range
     # This is a well-documented relationship in market microstructure
     first_hour_range = first_bar['High'] - first_bar['Low']
@@ -119,271 +293,547 @@ def estimate_orb_range(hourly_df, date):
     }
 
 
-def calculate_spy_sma(spy_daily, date, period=200):
+def opening_range(store, sym, date, config=None):
+    """
+    Opening range for one symbol and day at the store's bar resolution.
+    
+    With 1h bars this is estimate_orb_range's heuristic and only the second
+    bar can break out. With minute bars the range is the actual high/low of
+    the first ORB_MINUTES, and breakouts are looked for from there until
+    ENTRY_CUTOFF_MINUTE. The returned dict adds 'window', the [start, end)
+    row range (into store.arrays) to scan for the breakout; None if the day
+    has too few bars.
+    """
+    config = CONFIG if config is None else config
+    start, end = store.day_slices[sym].get(date, (0, 0))
+    if end - start < 2:
+        return None
+    
+    if store.resolution == '1h':
+        orb = estimate_orb_range(store.day_bars(sym, date))
+        orb['window'] = (start + 1, start + 2)
+        return orb
+    
+    bars = store.arrays[sym]
+    minutes = store.minute_of_day[sym][start:end]
+    orb_end = start + int(np.searchsorted(minutes, minutes[0] + config['ORB_MINUTES'], side='left'))
+    cutoff = start + int(np.searchsorted(minutes, config['ENTRY_CUTOFF_MINUTE'], side='right'))
+    if orb_end >= end:
+        return None
+    
+    orb_high = bars['High'][start:orb_end].max()
+    orb_low = bars['Low'][start:orb_end].min()
+    return {
+        'high': orb_high,
+        'low': orb_low,
+        'range': orb_high - orb_low,
+        'open': bars['Open'][start],
+        'window': (orb_end, max(orb_end, cutoff)),
+    }
+
+
+def find_breakout(store, sym, orb, longs_allowed, shorts_allowed):
+    """
+    First bar in the ORB's breakout window that trades through the range.
+    Returns (signal, entry_price, bar_index) or (None, None, None). When a
+    bar breaks both ways the long side wins, as in the live bot.
+    """
+    lo, hi = orb['window']
+    bars = store.arrays[sym]
+    long_hits = bars['High'][lo:hi] > orb['high'] if longs_allowed else np.zeros(hi - lo, bool)
+    short_hits = bars['Low'][lo:hi] < orb['low'] if shorts_allowed else np.zeros(hi - lo, bool)
+    hits = long_hits | short_hits
+    if not hits.any():
+        return None, None, None
+    
+    first = int(hits.argmax())
+    # Long breakout: enter at ORB high; short breakout: enter at ORB low
+    if long_hits[first]:
+        return 'long', orb['high'], lo + first
+    return 'short', orb['low'], lo + first
+
+
+def calculate_spy_sma(store, date, period=200):
     """Calculate SPY SMA as of a given date."""
-    prior = spy_daily[spy_daily.index.date <= date.date()]
-    if len(prior) < period:
-        return prior['Close'].mean() if len(prior) > 0 else 0
-    return prior['Close'].tail(period).mean()
+    n = store.asof_count('SPY', date)
+    return store.sma('SPY', period)[n - 1] if n > 0 else 0
 
 
-def select_stocks_for_day(all_data, date, lookback_days=5):
+def build_daily_panel(store, symbols):
     """
-    Simulate the orb-stock-selector: find stocks with RVOL >= 1.5 and
-    price change >= 2% in the past 5 trading days.
+    Build a (date × symbol) panel of daily closes and volumes.
+
+    Each column is packed so that row k is the symbol's own k-th daily bar
+    (symbols with missing days keep their own row numbering, exactly like
+    the per-symbol `prior` frames). `prior_counts[r, s]` is the number of
+    bars symbol s has up to and including calendar row r. Panels are cached
+    on the store since they don't depend on CONFIG.
     """
-    qualified = []
+    symbols = [sym for sym in symbols if sym in store]
+    key = tuple(symbols)
+    if key in store.panels:
+        return store.panels[key]
     
-    for sym in SCAN_STOCKS:
-        if sym not in all_data:
-            continue
-        
-        daily = get_daily_bars(all_data[sym])
-        prior = daily[daily.index.date < date.date()]
-        
-        if len(prior) < 35:  # Need enough for 30-day avg + recent days
-            continue
-        
-        # 30-day average volume (excluding last 5 days)
-        avg_vol_30d = prior.iloc[:-5]['Volume'].tail(30).mean() if len(prior) > 5 else prior['Volume'].tail(30).mean()
-        
-        if avg_vol_30d < 800000:
-            continue
-        
-        # Check last 5 trading days for qualifying move
-        recent = prior.tail(min(lookback_days + 1, len(prior)))
-        
-        best_rvol = 0
-        best_change = 0
-        best_price = 0
-        qualified_day = False
-        
-        for i in range(1, len(recent)):
-            day_vol = recent.iloc[i]['Volume']
-            prev_close = recent.iloc[i-1]['Close']
-            close = recent.iloc[i]['Close']
-            
-            if prev_close <= 0:
-                continue
-            
-            rvol = day_vol / avg_vol_30d if avg_vol_30d > 0 else 0
-            change = abs((close - prev_close) / prev_close * 100)
-            
-            if (rvol >= CONFIG['MIN_RVOL'] and 
-                change >= CONFIG['MIN_CHANGE_PCT'] and 
-                close >= CONFIG['MIN_PRICE']):
-                if rvol > best_rvol:
-                    best_rvol = rvol
-                    best_change = change
-                    best_price = close
-                    qualified_day = True
+    closes = pd.concat(
+        {sym: pd.Series(store.daily[sym]['Close'].to_numpy(), index=store.daily_dates[sym])
+         for sym in symbols}, axis=1) if symbols else pd.DataFrame()
+    volumes = pd.concat(
+        {sym: pd.Series(store.daily[sym]['Volume'].to_numpy(), index=store.daily_dates[sym])
+         for sym in symbols}, axis=1) if symbols else pd.DataFrame()
+    
+    valid = closes.notna().to_numpy()
+    order = np.argsort(~valid, axis=0, kind='stable')
+    close = np.take_along_axis(closes.to_numpy(dtype=float), order, axis=0)
+    volume = np.take_along_axis(volumes.to_numpy(dtype=float), order, axis=0)
+    close[~np.take_along_axis(valid, order, axis=0)] = np.nan
+    volume[np.isnan(close)] = np.nan
+    
+    panel = {
+        'symbols': symbols,
+        'calendar': closes.index.to_numpy().astype('datetime64[D]'),
+        'prior_counts': np.cumsum(valid, axis=0),
+        'close': close,
+        'volume': volume,
+        # Rolling over the packed rows matches get_daily_bars(...).rolling(30)
+        'avg_vol_30d': pd.DataFrame(volume).rolling(30).mean().to_numpy(),
+    }
+    store.panels[key] = panel
+    return panel
+
+
+def _shift_rows(arr, n):
+    """Shift a 2-D array down by n rows, filling with NaN (or False)."""
+    if n == 0:
+        return arr
+    out = np.full_like(arr, False if arr.dtype == bool else np.nan)
+    out[n:] = arr[:-n]
+    return out
+
+
+def build_selection_table(store, dates, lookback_days=5, universe=None, config=None):
+    """
+    Vectorized orb-stock-selector for many trading days at once.
+
+    Computes the 30-day average volume (excluding the last 5 days), per-day
+    RVOL, absolute change and qualification mask for every (date, symbol)
+    pair in one pass over the daily panel, then ranks by RVOL. Returns one
+    row per selected stock with columns date, rank, symbol, rvol, change,
+    price and is_fallback (top 8 per day, or the fallbacks if none qualify).
+    With a symbol master on the store, symbols that weren't listed on a
+    date are never picked for it.
+    """
+    config = CONFIG if config is None else config
+    universe = store.universe if universe is None else universe
+    panel = build_daily_panel(store, universe)
+    close, volume = panel['close'], panel['volume']
+    symbols = np.array(panel['symbols'], dtype=object)
+    
+    # Row-space features: row k is the last prior bar when n_prior = k + 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_vol = _shift_rows(panel['avg_vol_30d'], 5)
+        prev_close = _shift_rows(close, 1)
+        change_all = np.abs((close - prev_close) / prev_close * 100)
+        prev_ok_all = prev_close > 0
         
-        if qualified_day:
-            qualified.append({
-                'symbol': sym,
-                'rvol': best_rvol,
-                'change': best_change,
-                'price': best_price,
-            })
+        best_rvol = np.zeros_like(close)
+        best_change = np.zeros_like(close)
+        best_price = np.zeros_like(close)
+        # Oldest day first so ties keep the earliest day, like the scalar loop
+        for lag in range(lookback_days - 1, -1, -1):
+            day_vol = _shift_rows(volume, lag)
+            day_close = _shift_rows(close, lag)
+            change = _shift_rows(change_all, lag)
+            rvol = day_vol / avg_vol
+            better = (_shift_rows(prev_ok_all, lag) &
+                      (rvol >= config['MIN_RVOL']) &
+                      (change >= config['MIN_CHANGE_PCT']) &
+                      (day_close >= config['MIN_PRICE']) &
+                      (rvol > best_rvol))
+            best_rvol = np.where(better, rvol, best_rvol)
+            best_change = np.where(better, change, best_change)
+            best_price = np.where(better, day_close, best_price)
+    
+    # Map each trading day to every symbol's prior bar count
+    days = np.array([np.datetime64(pd.Timestamp(d).date(), 'D') for d in dates],
+                    dtype='datetime64[D]')
+    cal_row = np.searchsorted(panel['calendar'], days, side='left') - 1
+    n_prior = np.where(cal_row[:, None] >= 0,
+                       panel['prior_counts'][np.maximum(cal_row, 0)], 0)
+    k = np.maximum(n_prior - 1, 0)
+    
+    def at_prior(arr):
+        return np.take_along_axis(arr, k, axis=0) if len(arr) else np.zeros(k.shape)
+    
+    rvol = at_prior(best_rvol)
+    with np.errstate(invalid='ignore'):
+        qualified = ((n_prior >= 35) & (n_prior > lookback_days) &
+                     (at_prior(avg_vol) >= 800000) & (rvol > 0))
+    if store.symbol_master is not None:
+        qualified &= store.symbol_master.membership(days, panel['symbols'])
     
-    # Sort by RVOL descending, take top 8
-    qualified.sort(key=lambda x: x['rvol'], reverse=True)
-    result = qualified[:8]
+    day_idx, sym_idx = np.nonzero(qualified)
+    rvol = rvol[day_idx, sym_idx]
+    # Sort by RVOL descending; ties keep universe order (stable sort)
+    order = np.lexsort((sym_idx, -rvol, day_idx))
+    day_idx, sym_idx, rvol = day_idx[order], sym_idx[order], rvol[order]
+    starts = np.searchsorted(day_idx, day_idx, side='left')
+    rank = np.arange(len(day_idx)) - starts + 1
+    keep = rank <= 8
+    day_idx, sym_idx, rank = day_idx[keep], sym_idx[keep], rank[keep]
+    
+    table = pd.DataFrame({
+        'date': days[day_idx],
+        'rank': rank,
+        'symbol': symbols[sym_idx],
+        'rvol': rvol[keep],
+        'change': at_prior(best_change)[day_idx, sym_idx],
+        'price': at_prior(best_price)[day_idx, sym_idx],
+        'is_fallback': False,
+    })
     
     # If none qualified, use fallbacks
-    if len(result) == 0:
+    empty_days = np.setdiff1d(np.arange(len(days)), day_idx)
+    fallback_rows = []
+    for i in empty_days:
+        rank = 0
         for fb in FALLBACK_STOCKS:
-            if fb in all_data:
-                daily = get_daily_bars(all_data[fb])
-                prior = daily[daily.index.date < date.date()]
-                if len(prior) > 0:
-                    result.append({
+            if store.symbol_master is not None and not store.symbol_master.is_member(fb, days[i]):
+                continue
+            if fb in store:
+                n = store.prior_count(fb, days[i])
+                if n > 0:
+                    rank += 1
+                    fallback_rows.append({
+                        'date': days[i],
+                        'rank': rank,
                         'symbol': fb,
                         'rvol': 1.0,
                         'change': 0,
-                        'price': prior.iloc[-1]['Close'],
+                        'price': store.daily[fb]['Close'].iloc[n - 1],
                         'is_fallback': True,
                     })
+    if fallback_rows:
+        table = pd.concat([table, pd.DataFrame(fallback_rows)], ignore_index=True)
+        table = table.sort_values(['date', 'rank'], kind='stable', ignore_index=True)
+    
+    return table
+
+
+def selections_by_day(table):
+    """Split a selection table into {date: [stock_info, ...]} in rank order."""
+    picks = {}
+    for row in table.itertuples(index=False):
+        info = {
+            'symbol': row.symbol,
+            'rvol': row.rvol,
+            'change': row.change,
+            'price': row.price,
+        }
+        if row.is_fallback:
+            info['is_fallback'] = True
+        picks.setdefault(pd.Timestamp(row.date).date(), []).append(info)
+    return picks
+
+
+def select_stocks_for_day(store, date, lookback_days=5, config=None):
+    """
+    Simulate the orb-stock-selector: find stocks with RVOL >= 1.5 and
+    price change >= 2% in the past 5 trading days.
+    """
+    table = build_selection_table(store, [date], lookback_days, config=config)
+    return selections_by_day(table).get(pd.Timestamp(date).date(), [])
+
+
+# Exit reasons returned by simulate_trades
+EXIT_NONE, EXIT_STOP, EXIT_TARGET, EXIT_EOD = 0, 1, 2, 3
+EXIT_REASONS = np.array(['none', 'stop', 'target', 'eod'])
+
+
+def trade_levels(is_long, entry, stop_distance, config=None):
+    """Stop-loss and take-profit prices for trades (scalars or arrays)."""
+    config = CONFIG if config is None else config
+    target_distance = stop_distance * config['TARGET_R_MULTIPLE']
+    stop = np.where(is_long, entry - stop_distance, entry + stop_distance)
+    target = np.where(is_long, entry + target_distance, entry - target_distance)
+    return stop, target
+
+
+def simulate_trades(high, low, close, starts, ends, is_long, entry, stop, target):
+    """
+    Simulate many trades at once over contiguous bar arrays.
+    
+    Trade i walks bars starts[i]..ends[i]-1 of high/low/close. The exit is
+    the first bar that touches the stop or the target; when one bar touches
+    both, the stop wins (conservative, as in the scalar walk). Trades that
+    touch neither are flattened at the last bar's close.
+    
+    Returns (exit_idx, exit_price, exit_reason) arrays; exit_idx is -1 and
+    exit_reason EXIT_NONE for trades with no bars.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    is_long = np.asarray(is_long, dtype=bool)
+    entry = np.asarray(entry, dtype=float)
+    stop = np.asarray(stop, dtype=float)
+    target = np.asarray(target, dtype=float)
+    n = len(starts)
+    timing.count('trades_simulated', n)
+    
+    lengths = np.maximum(ends - starts, 0)
+    width = max(int(lengths.max()) if n else 0, 1)
     
-    return result
+    # (trades × bars) window of each trade's bars, padded past its end
+    offsets = np.arange(width)
+    idx = starts[:, None] + offsets
+    in_window = offsets < lengths[:, None]
+    idx = np.where(in_window, idx, 0)
+    bar_high = high[idx] if len(high) else np.zeros(idx.shape)
+    bar_low = low[idx] if len(low) else np.zeros(idx.shape)
+    
+    long_col = is_long[:, None]
+    stop_hit = in_window & np.where(long_col, bar_low <= stop[:, None], bar_high >= stop[:, None])
+    target_hit = in_window & np.where(long_col, bar_high >= target[:, None], bar_low <= target[:, None])
+    
+    # First-hit bar offsets (width if never hit)
+    first_stop = np.where(stop_hit.any(axis=1), stop_hit.argmax(axis=1), width)
+    first_target = np.where(target_hit.any(axis=1), target_hit.argmax(axis=1), width)
+    
+    exit_reason = np.full(n, EXIT_EOD, dtype=np.int8)
+    exit_reason[first_target < width] = EXIT_TARGET
+    exit_reason[(first_stop < width) & (first_stop <= first_target)] = EXIT_STOP
+    exit_reason[lengths == 0] = EXIT_NONE
+    
+    exit_offset = np.select(
+        [exit_reason == EXIT_STOP, exit_reason == EXIT_TARGET],
+        [first_stop, first_target], lengths - 1)
+    exit_idx = np.where(exit_reason == EXIT_NONE, -1, starts + exit_offset)
+    
+    eod_close = close[np.maximum(exit_idx, 0)] if len(close) else np.zeros(n)
+    exit_price = np.select(
+        [exit_reason == EXIT_STOP, exit_reason == EXIT_TARGET, exit_reason == EXIT_EOD],
+        [stop, target, eod_close], entry)
+    
+    return exit_idx, exit_price, exit_reason
+
+
+def trade_pnl_per_share(is_long, entry, exit_price):
+    """P&L per share for trades exiting at exit_price."""
+    return np.where(is_long, exit_price - entry, entry - exit_price)
 
 
-def simulate_trade(orb, hourly_day_data, side, entry_price, stop_distance):
+def simulate_trade(orb, hourly_day_data, side, entry_price, stop_distance, config=None):
     """
     Simulate a single trade through the day's hourly bars.
     Returns P&L per share.
     """
-    target_distance = stop_distance * CONFIG['TARGET_R_MULTIPLE']
+    is_long = side == 'long'
+    stop_loss, take_profit = trade_levels(is_long, entry_price, stop_distance, config)
+    _, exit_price, _ = simulate_trades(
+        hourly_day_data['High'].to_numpy(dtype=float),
+        hourly_day_data['Low'].to_numpy(dtype=float),
+        hourly_day_data['Close'].to_numpy(dtype=float),
+        [0], [len(hourly_day_data)], [is_long], [entry_price], [stop_loss], [take_profit])
+    return float(trade_pnl_per_share(is_long, entry_price, exit_price)[0])
+
+
+# Fields of a closed trade, in output order
+TRADE_FIELDS = ('date', 'symbol', 'signal', 'entry', 'shares', 'pnl', 'r_multiple',
+                'risk_pct', 'regime', 'vix', 'strategy', 'rank', 'exit_reason')
+
+
+class TradeRecord:
+    """
+    One closed trade. Slots keep a long trade list several times smaller
+    than per-trade dicts; trade['pnl'] style access still works, and
+    to_dict() gives the plain dict for JSON output.
+    """
     
-    if side == 'long':
-        stop_loss = entry_price - stop_distance
-        take_profit = entry_price + target_distance
-    else:
-        stop_loss = entry_price + stop_distance
-        take_profit = entry_price - target_distance
-    
-    # Walk through remaining hourly bars
-    for _, bar in hourly_day_data.iterrows():
-        if side == 'long':
-            # Check stop loss first (conservative)
-            if bar['Low'] <= stop_loss:
-                return stop_loss - entry_price  # Loss
-            # Check take profit
-            if bar['High'] >= take_profit:
-                return take_profit - entry_price  # Win
-        else:  # short
-            if bar['High'] >= stop_loss:
-                return entry_price - stop_loss  # Loss (negative)
-            if bar['Low'] <= take_profit:
-                return entry_price - take_profit  # Win
-    
-    # EOD flatten — use last bar's close
-    if len(hourly_day_data) > 0:
-        last_close = hourly_day_data.iloc[-1]['Close']
-        if side == 'long':
-            return last_close - entry_price
-        else:
-            return entry_price - last_close
+    __slots__ = TRADE_FIELDS
+    
+    def __init__(self, date, symbol, signal, entry, shares, pnl, r_multiple,
+                 risk_pct, regime, vix, strategy='orb', rank=0, exit_reason=''):
+        self.date = date
+        self.symbol = symbol
+        self.signal = signal
+        self.entry = entry
+        self.shares = shares
+        self.pnl = pnl
+        self.r_multiple = r_multiple
+        self.risk_pct = risk_pct
+        self.regime = regime
+        self.vix = vix
+        self.strategy = strategy
+        self.rank = rank
+        self.exit_reason = exit_reason
+    
+    def __getitem__(self, key):
+        if key not in TRADE_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def to_dict(self):
+        return {field: getattr(self, field) for field in TRADE_FIELDS}
     
-    return 0
+    def __repr__(self):
+        return f"TradeRecord({self.to_dict()!r})"
 
 
-def run_backtest():
-    """Main backtest loop."""
-    print("=" * 70)
-    print("ORB STRATEGY BACKTEST — 12-Month Simulation")
-    print(f"Starting Equity: ${CONFIG['STARTING_EQUITY']:,.2f}")
-    print(f"Risk per trade: {CONFIG['TIER1_RISK']*100}% (#1) / {CONFIG['TIER2_RISK']*100}% (#2-4)")
-    print(f"Target: {CONFIG['TARGET_R_MULTIPLE']}R | Max trades/day: {CONFIG['MAX_TRADES_PER_DAY']}")
-    print("=" * 70)
-    
-    # Download data
-    all_data = download_data(SCAN_STOCKS, period='1y')
+def prepare_market_data(resolution='1h', symbols=None, period='1y', symbol_master=None,
+                        stages=None, **download_options):
+    """
+    Download bars at the given resolution and build the MarketData store once.
+    `symbols` defaults to SCAN_STOCKS and becomes the store's universe; pass
+    the union of several strategies' universes to serve them all from one
+    load. With a `symbol_master` the default is every symbol it has ever
+    listed, and selection is point-in-time (see backtest_universe). With a
+    backtest_stages.StageCache as `stages`, daily bars are reused from an
+    earlier run over the same data. Returns None if SPY (needed for the
+    trading calendar) is missing.
+    """
+    if symbols is None:
+        symbols = SCAN_STOCKS if symbol_master is None else symbol_master.symbols
+    symbols = list(symbols)
+    with timing.phase('download'):
+        all_data = download_data(symbols, period=period, interval=resolution, **download_options)
     
     if 'SPY' not in all_data:
         print("ERROR: Could not download SPY data")
-        return
+        return None
     
-    spy_hourly = all_data['SPY']
-    spy_daily = get_daily_bars(spy_hourly)
+    # Build daily bars, per-day offsets and volume averages once
+    with timing.phase('daily_bars'):
+        if stages is not None:
+            return stages.market_data(all_data, resolution, symbols, symbol_master)
+        return MarketData(all_data, resolution, symbols, symbol_master)
+
+
+def attach_regime_calendar(store, path):
+    """
+    Read the store's regimes from the saved calendar at `path` (see
+    backtest_regime), appending any days the store has past its last row
+    and saving it back. A missing file is created from the store's bars.
+    """
+    try:
+        calendar = load_regime_calendar(path)
+    except FileNotFoundError:
+        calendar = store.regimes()
+    else:
+        calendar.append_daily(store.daily['SPY'], store.daily.get('^VIX'))
+    calendar.save(path)
+    store.regime_calendar = calendar
+    return calendar
+
+
+def store_selections(store, config, universe=None):
+    """
+    Stock picks for every trading day in the store under `config`'s
+    selector thresholds, scanning `universe` (default: the store's).
+    Computed in one pass and cached on the store, so reruns, sweeps and
+    overlapping windows share it.
+    """
+    universe = store.universe if universe is None else universe
+    selector_key = tuple(config[k] for k in SELECTOR_KEYS) + (tuple(universe),)
+    if selector_key not in store.selections:
+        with timing.phase('selection'):
+            store.selections[selector_key] = selections_by_day(
+                build_selection_table(store, store.trading_days, universe=universe, config=config))
+    return store.selections[selector_key]
+
+
+def warm_caches(store, configs):
+    """
+    Precompute the selections and SPY SMAs every config will need, e.g.
+    before forking workers so they all inherit the same features.
+    """
+    for config in configs:
+        store_selections(store, config)
+    if 'SPY' in store:
+        store.sma('SPY', 50)
+        store.sma('SPY', 200)
+
+
+def day_regime(store, date):
+    """
+    SPY trend and VIX inputs for a trading day, shared by every strategy,
+    read from the store's regime calendar. None if SPY has no close up to
+    that day.
+    """
+    calendar = store.regimes()
+    row = calendar.row(date)
+    if row < 0:
+        return None
+    return {
+        'spy_price': calendar.spy_close[row],
+        'spy_sma200': calendar.sma200[row],
+        'spy_sma50': calendar.sma50[row],
+        'vix': calendar.vix[row],
+    }
+
+
+class ORBStrategy:
+    """
+    The Lovable ORB strategy as a pluggable strategy object.
     
-    # Get VIX data
-    vix_data = None
-    if '^VIX' in all_data:
-        vix_data = get_daily_bars(all_data['^VIX'])
+    A strategy turns a trading day into candidate trades; the account in
+    simulate_portfolio does the sizing, limits and exits. Any object with
+    the same `name`, `universe`, `config`, `prepare`, `watchlist` and
+    `signals` can be run alongside it.
+    """
     
-    # Get trading days from SPY
-    trading_days = sorted(set(spy_hourly.index.date))
+    name = 'orb'
     
-    # Skip weekends already filtered by market data
-    print(f"\nTrading days in period: {len(trading_days)}")
+    def __init__(self, config=None, universe=None):
+        self.config = CONFIG if config is None else config
+        self.universe = SCAN_STOCKS if universe is None else list(universe)
+        self.selections = {}
     
-    # Track results
-    equity = CONFIG['STARTING_EQUITY']
-    equity_curve = [equity]
-    daily_returns = []
-    all_trades = []
-    monthly_pnl = {}
-    winning_days = 0
-    losing_days = 0
-    flat_days = 0
-    no_trade_days = 0
-    total_trading_days = 0
+    def prepare(self, store):
+        """Precompute per-store features (here: every day's stock picks)."""
+        self.selections = store_selections(store, self.config, self.universe)
     
-    for day_idx, date in enumerate(trading_days):
-        date_dt = pd.Timestamp(date)
-        day_str = date_dt.strftime('%Y-%m-%d')
-        
-        # Get SPY regime
-        spy_sma200 = calculate_spy_sma(spy_daily, date_dt, 200)
-        spy_sma50 = calculate_spy_sma(spy_daily, date_dt, 50)
-        spy_price_row = spy_daily[spy_daily.index.date <= date]
-        if len(spy_price_row) == 0:
-            continue
-        spy_price = spy_price_row.iloc[-1]['Close']
-        
-        is_bullish = spy_price > spy_sma200
-        strong_uptrend = spy_price > spy_sma200 and spy_price > spy_sma50
-        
-        # Get VIX
-        vix_level = 20
-        if vix_data is not None:
-            vix_row = vix_data[vix_data.index.date <= date]
-            if len(vix_row) > 0:
-                vix_level = vix_row.iloc[-1]['Close']
-        
-        # Determine regime
-        longs_allowed = is_bullish and vix_level <= CONFIG['VIX_SHORTS_ONLY']
-        aggressive_bull = is_bullish and vix_level <= CONFIG['VIX_AGGRESSIVE_BULL']
-        
-        # Select stocks for today
-        stocks = select_stocks_for_day(all_data, date_dt)
-        
-        if len(stocks) == 0:
-            no_trade_days += 1
-            equity_curve.append(equity)
-            daily_returns.append(0)
-            continue
-        
-        total_trading_days += 1
-        day_pnl = 0
-        day_trades = 0
-        day_trade_details = []
-        
-        # Check daily loss limit
-        daily_loss_limit = equity * CONFIG['MAX_DAILY_LOSS_PCT']
+    def watchlist(self, store, date):
+        """The day's ranked picks; a day with none counts as a no-trade day."""
+        return self.selections.get(date, [])
+    
+    def signals(self, store, date, regime, watchlist):
+        """
+        Candidate trades for the day in priority order. Each is a dict with
+        symbol, signal, entry, entry_idx (bar index in store.arrays), stop,
+        target, stop_distance, risk_pct, regime and rank (1-based watchlist
+        position).
+        """
+        config = self.config
+        is_bullish = regime['spy_price'] > regime['spy_sma200']
+        strong_uptrend = is_bullish and regime['spy_price'] > regime['spy_sma50']
+        vix_level = regime['vix']
+        longs_allowed = is_bullish and vix_level <= config['VIX_SHORTS_ONLY']
+        aggressive_bull = is_bullish and vix_level <= config['VIX_AGGRESSIVE_BULL']
+        regime_label = 'aggressive_bull' if aggressive_bull else ('bull' if is_bullish else 'bear')
         
-        for rank, stock_info in enumerate(stocks[:5], 1):
-            if day_trades >= CONFIG['MAX_TRADES_PER_DAY']:
-                break
-            
-            if abs(day_pnl) >= daily_loss_limit:
-                break
-            
+        candidates = []
+        for rank, stock_info in enumerate(watchlist[:5], 1):
             sym = stock_info['symbol']
-            if sym not in all_data:
+            if sym not in store:
                 continue
             
             # Get ORB range
-            orb = estimate_orb_range(all_data[sym], date_dt)
+            orb = opening_range(store, sym, date, config)
             if orb is None or orb['range'] <= 0:
                 continue
             
-            # Get the day's hourly data (after first bar)
-            day_hourly = all_data[sym][all_data[sym].index.date == date]
-            if len(day_hourly) < 2:
-                continue
-            
-            # Determine signal from first hour's price action
-            first_bar = day_hourly.iloc[0]
-            
             # Check pre-market cool-off (use gap from previous close)
-            daily = get_daily_bars(all_data[sym])
-            prior = daily[daily.index.date < date]
-            if len(prior) == 0:
+            n_prior = store.prior_count(sym, date)
+            if n_prior == 0:
                 continue
-            prev_close = prior.iloc[-1]['Close']
-            gap_pct = abs((first_bar['Open'] - prev_close) / prev_close * 100) if prev_close > 0 else 0
+            prev_close = store.daily[sym]['Close'].iloc[n_prior - 1]
+            gap_pct = abs((orb['open'] - prev_close) / prev_close * 100) if prev_close > 0 else 0
             
-            if gap_pct > CONFIG['PREMARKET_COOLOFF_PCT']:
+            if gap_pct > config['PREMARKET_COOLOFF_PCT']:
                 continue
             
-            # Determine breakout direction from second bar
-            if len(day_hourly) < 2:
-                continue
-            second_bar = day_hourly.iloc[1]
-            
-            signal = None
-            entry_price = None
-            
-            # Long breakout: price goes above ORB high
-            if second_bar['High'] > orb['high'] and longs_allowed:
-                signal = 'long'
-                entry_price = orb['high']  # Enter at breakout level
-            # Short breakout: price goes below ORB low
-            elif second_bar['Low'] < orb['low'] and not strong_uptrend:
-                signal = 'short'
-                entry_price = orb['low']
+            # Determine breakout direction (second bar with hourly data)
+            signal, entry_price, entry_idx = find_breakout(
+                store, sym, orb, longs_allowed, not strong_uptrend)
             
             if signal is None:
                 continue
@@ -398,44 +848,157 @@ def run_backtest():
                 stop_distance = entry_price * 0.015
             
             if rank == 1:
-                risk_pct = CONFIG['TIER1_AGGRESSIVE_RISK'] if aggressive_bull else CONFIG['TIER1_RISK']
+                risk_pct = config['TIER1_AGGRESSIVE_RISK'] if aggressive_bull else config['TIER1_RISK']
             else:
-                risk_pct = CONFIG['TIER2_RISK']
-            
-            max_risk = equity * risk_pct
-            risk_per_share = stop_distance
+                risk_pct = config['TIER2_RISK']
             
-            if risk_per_share <= 0:
-                continue
-            
-            shares = int(max_risk / risk_per_share)
-            if shares <= 0:
-                continue
-            
-            # Simulate trade through remaining bars
-            remaining_bars = day_hourly.iloc[1:]  # After first bar
-            pnl_per_share = simulate_trade(orb, remaining_bars, signal, entry_price, stop_distance)
-            
-            trade_pnl = pnl_per_share * shares
-            day_pnl += trade_pnl
-            day_trades += 1
-            
-            r_multiple = pnl_per_share / stop_distance if stop_distance > 0 else 0
-            
-            trade_record = {
-                'date': day_str,
+            stop_loss, take_profit = trade_levels(signal == 'long', entry_price, stop_distance, config)
+            candidates.append({
                 'symbol': sym,
                 'signal': signal,
-                'entry': round(entry_price, 2),
-                'shares': shares,
-                'pnl': round(trade_pnl, 2),
-                'r_multiple': round(r_multiple, 2),
+                'entry': entry_price,
+                'entry_idx': entry_idx,
+                'stop': stop_loss,
+                'target': take_profit,
+                'stop_distance': stop_distance,
                 'risk_pct': risk_pct,
-                'regime': 'aggressive_bull' if aggressive_bull else ('bull' if is_bullish else 'bear'),
-                'vix': round(vix_level, 1),
-            }
-            all_trades.append(trade_record)
-            day_trade_details.append(trade_record)
+                'regime': regime_label,
+                'rank': rank,
+            })
+        return candidates
+
+
+@timing.timed('simulation')
+def simulate_portfolio(store, strategies, config=None, verbose=True, days=None, execution=None):
+    """
+    Run several strategies over one MarketData store with a single account.
+    
+    Every strategy sees the same precomputed bars and regime. Trades share
+    the account's equity, MAX_TRADES_PER_DAY and MAX_DAILY_LOSS_PCT (taken
+    from `config`, default CONFIG): strategies listed first get first claim
+    on the day's trade slots, each in its own priority order. The account
+    trades a symbol at most once a day, so a later strategy's candidate in
+    a symbol already traded that day is skipped. Fills go
+    through `execution` (default: the ExecutionModel for `config`'s cost
+    keys). Results are shaped like simulate_backtest's, with a 'strategy'
+    name on each trade.
+    """
+    config = CONFIG if config is None else config
+    execution = ExecutionModel.from_config(config) if execution is None else execution
+    
+    # Get trading days from SPY
+    trading_days = store.trading_days if days is None else list(days)
+    
+    # Skip weekends already filtered by market data
+    if verbose:
+        print(f"\nTrading days in period: {len(trading_days)}")
+    
+    # Run each strategy's stock selection for every trading day in one pass
+    for strategy in strategies:
+        strategy.prepare(store)
+    
+    # Track results
+    equity = config['STARTING_EQUITY']
+    equity_curve = [equity]
+    daily_returns = []
+    all_trades = []
+    monthly_pnl = {}
+    winning_days = 0
+    losing_days = 0
+    flat_days = 0
+    no_trade_days = 0
+    total_trading_days = 0
+    
+    for day_idx, date in enumerate(trading_days):
+        date_dt = pd.Timestamp(date)
+        day_str = date_dt.strftime('%Y-%m-%d')
+        
+        # Get SPY regime and VIX
+        with timing.phase('regime'):
+            regime = day_regime(store, date)
+        if regime is None:
+            continue
+        
+        # Select stocks for today
+        watchlists = [strategy.watchlist(store, date) for strategy in strategies]
+        
+        if not any(watchlists):
+            no_trade_days += 1
+            equity_curve.append(equity)
+            daily_returns.append(0)
+            continue
+        
+        total_trading_days += 1
+        day_pnl = 0
+        day_trades = 0
+        traded = set()
+        
+        # Check daily loss limit
+        daily_loss_limit = equity * config['MAX_DAILY_LOSS_PCT']
+        
+        for strategy, watchlist in zip(strategies, watchlists):
+            if not watchlist:
+                continue
+            for candidate in strategy.signals(store, date, regime, watchlist):
+                if day_trades >= config['MAX_TRADES_PER_DAY']:
+                    break
+                
+                if abs(day_pnl) >= daily_loss_limit:
+                    break
+                
+                sym = candidate['symbol']
+                if sym in traded:
+                    continue
+                entry_price = candidate['entry']
+                stop_distance = candidate['stop_distance']
+                
+                max_risk = equity * candidate['risk_pct']
+                risk_per_share = stop_distance
+                
+                if risk_per_share <= 0:
+                    continue
+                
+                shares = int(max_risk / risk_per_share)
+                bars = store.arrays[sym]
+                entry_idx = candidate['entry_idx']
+                cap = execution.share_cap(bars['Volume'][entry_idx])
+                if cap is not None:
+                    shares = min(shares, int(cap))
+                if shares <= 0:
+                    continue
+                
+                # Simulate trade through the remaining bars, from the breakout bar
+                _, end = store.day_slices[sym][date]
+                is_long = candidate['signal'] == 'long'
+                exit_idx, exit_price, exit_reason = simulate_trades(
+                    bars['High'], bars['Low'], bars['Close'], [entry_idx], [end],
+                    [is_long], [entry_price], [candidate['stop']], [candidate['target']])
+                entry_fill, exit_fill = execution.fills(
+                    bars, [entry_idx], exit_idx, exit_reason, [is_long], [entry_price], exit_price)
+                pnl_per_share = trade_pnl_per_share(is_long, entry_fill, exit_fill)[0]
+                
+                trade_pnl = pnl_per_share * shares
+                day_pnl += trade_pnl
+                day_trades += 1
+                traded.add(sym)
+                
+                r_multiple = pnl_per_share / stop_distance if stop_distance > 0 else 0
+                
+                all_trades.append(TradeRecord(
+                    date=day_str,
+                    symbol=sym,
+                    signal=candidate['signal'],
+                    entry=round(entry_fill[0], 2),
+                    shares=shares,
+                    pnl=round(trade_pnl, 2),
+                    r_multiple=round(r_multiple, 2),
+                    risk_pct=candidate['risk_pct'],
+                    regime=candidate['regime'],
+                    vix=round(regime['vix'], 1),
+                    strategy=strategy.name,
+                    rank=candidate.get('rank', 0),
+                    exit_reason=str(EXIT_REASONS[exit_reason[0]]),
+                ))
         
         # Update equity
         equity += day_pnl
@@ -459,9 +1022,156 @@ def run_backtest():
             flat_days += 1
         
         # Progress
-        if (day_idx + 1) % 50 == 0:
+        if verbose and (day_idx + 1) % 50 == 0:
             print(f"  Day {day_idx+1}/{len(trading_days)} | Equity: ${equity:,.2f} | Trades: {len(all_trades)}")
     
+    return {
+        'config': dict(config),
+        'strategies': [strategy.name for strategy in strategies],
+        'trading_days': trading_days,
+        'equity': equity,
+        'equity_curve': equity_curve,
+        'daily_returns': daily_returns,
+        'trades': all_trades,
+        'monthly_pnl': monthly_pnl,
+        'winning_days': winning_days,
+        'losing_days': losing_days,
+        'flat_days': flat_days,
+        'no_trade_days': no_trade_days,
+        'total_trading_days': total_trading_days,
+    }
+
+
+def simulate_backtest(store, config=None, verbose=True, days=None, execution=None):
+    """
+    Run the ORB day loop over a prepared MarketData store.
+    
+    `config` defaults to CONFIG; pass a modified copy to try other
+    parameters without re-downloading. `days` restricts the run to a
+    subset of store.trading_days (e.g. one walk-forward window) while
+    reusing the store's precomputed features. Returns the raw results:
+    equity curve, daily returns, trades, monthly P&L and day counts.
+    """
+    config = CONFIG if config is None else config
+    return simulate_portfolio(store, [ORBStrategy(config, store.universe)], config, verbose, days,
+                              execution)
+
+
+def summarize_backtest(sim):
+    """Headline performance metrics for a simulate_backtest result (see backtest_analytics)."""
+    config = sim['config']
+    equity = sim['equity']
+    metrics = analytics.performance(sim)
+    
+    return {
+        'starting_equity': config['STARTING_EQUITY'],
+        'ending_equity': equity,
+        'total_return_pct': metrics['total_return_pct'],
+        'net_pnl': equity - config['STARTING_EQUITY'],
+        'sharpe_ratio': metrics['sharpe_ratio'],
+        'sortino_ratio': metrics['sortino_ratio'],
+        'calmar_ratio': metrics['calmar_ratio'],
+        'profit_factor': metrics['profit_factor'],
+        'max_drawdown_pct': metrics['max_drawdown_pct'],
+        'max_drawdown_dollar': metrics['max_drawdown_dollar'],
+        'max_drawdown_days': metrics['max_drawdown_days'],
+        'total_trades': metrics['total_trades'],
+        'winning_trades': metrics['winning_trades'],
+        'losing_trades': metrics['losing_trades'],
+        'win_rate_pct': metrics['win_rate_pct'],
+        'avg_win': metrics['avg_win'],
+        'avg_loss': metrics['avg_loss'],
+        'avg_r_multiple': metrics['avg_r_multiple'],
+        'winning_days': sim['winning_days'],
+        'losing_days': sim['losing_days'],
+        'no_trade_days': sim['no_trade_days'],
+    }
+
+
+def run_backtest(resolution='1h', export_dir=None, engine='loop', config=None,
+                 stage_dir=None, regime_calendar=None, candidate_workers=None,
+                 **download_options):
+    """
+    Main backtest loop.
+    
+    `resolution` is the bar size ('1m', '5m' or '1h'). With `export_dir`
+    every trade, the equity curve and the daily returns are also written
+    there (see backtest_export). `engine='vector'` runs the array engine
+    in backtest_vector instead of the day loop (same trades, much faster
+    on large universes). `config` defaults to CONFIG (e.g. pass
+    dict(CONFIG, **REALISTIC_COSTS) to model execution costs). With
+    `stage_dir` ('' for the default STAGE_DIR) intermediate stages are
+    cached on disk and a re-run only recomputes the stages whose inputs or
+    CONFIG keys changed (see backtest_stages). With `regime_calendar` (a
+    path) regimes are read from that saved calendar, extended with the
+    downloaded days (see attach_regime_calendar). With the vector engine,
+    `candidate_workers` > 1 generates candidates on that many processes
+    (same results; see backtest_vector.generate_candidates). Other
+    keyword arguments (symbols, symbol_master,
+    offline, cache_dir, max_workers, ...) are passed through to
+    prepare_market_data.
+    
+    The run's phase times and counters (kept apart from any concurrent
+    run's; see timing.collect) are printed at the end and written to
+    backtest_timing.json.
+    """
+    config = CONFIG if config is None else config
+    print("=" * 70)
+    print("ORB STRATEGY BACKTEST — 12-Month Simulation")
+    print(f"Starting Equity: ${config['STARTING_EQUITY']:,.2f}")
+    print(f"Risk per trade: {config['TIER1_RISK']*100}% (#1) / {config['TIER2_RISK']*100}% (#2-4)")
+    print(f"Target: {config['TARGET_R_MULTIPLE']}R | Max trades/day: {config['MAX_TRADES_PER_DAY']}")
+    print("=" * 70)
+    
+    with timing.collect() as timings:
+        stages = None
+        if stage_dir is not None:
+            import backtest_stages
+            stages = backtest_stages.StageCache(stage_dir or None)
+        
+        # Download data
+        store = prepare_market_data(resolution, stages=stages, **download_options)
+        if store is None:
+            return
+        if regime_calendar is not None:
+            attach_regime_calendar(store, regime_calendar)
+        
+        if engine == 'vector':
+            import backtest_vector
+            print(f"\nTrading days in period: {len(store.trading_days)}")
+            with timing.phase('simulation'):
+                sim = backtest_vector.simulate_vectorized(store, config, stages=stages,
+                                                          workers=candidate_workers)
+        else:
+            if stages is not None:
+                stages.selections(store, config)
+            sim = simulate_backtest(store, config)
+        
+        with timing.phase('reporting'):
+            results = report_backtest(sim, export_dir)
+        
+        timings.print_summary()
+        timings.write('backtest_timing.json', resolution=resolution, engine=engine,
+                      symbols=len(store.hourly), trading_days=len(sim['trading_days']))
+        print("Timing report saved to backtest_timing.json")
+    
+    return results
+
+
+def report_backtest(sim, export_dir=None):
+    """Print the results report and save backtest_results.json (and the export, if asked)."""
+    summary = summarize_backtest(sim)
+    
+    starting_equity = sim['config']['STARTING_EQUITY']
+    equity = sim['equity']
+    all_trades = sim['trades']
+    monthly_pnl = sim['monthly_pnl']
+    trading_days = sim['trading_days']
+    winning_days = sim['winning_days']
+    losing_days = sim['losing_days']
+    flat_days = sim['flat_days']
+    no_trade_days = sim['no_trade_days']
+    
     # ============================================================
     # RESULTS
     # ============================================================
@@ -469,57 +1179,29 @@ def run_backtest():
     print("BACKTEST RESULTS")
     print("=" * 70)
     
-    total_return = (equity - CONFIG['STARTING_EQUITY']) / CONFIG['STARTING_EQUITY'] * 100
-    
-    # Trade statistics
-    winning_trades = [t for t in all_trades if t['pnl'] > 0]
-    losing_trades = [t for t in all_trades if t['pnl'] < 0]
-    flat_trades = [t for t in all_trades if t['pnl'] == 0]
-    
-    win_rate = len(winning_trades) / len(all_trades) * 100 if all_trades else 0
-    avg_win = np.mean([t['pnl'] for t in winning_trades]) if winning_trades else 0
-    avg_loss = np.mean([t['pnl'] for t in losing_trades]) if losing_trades else 0
-    
-    # Risk-adjusted metrics
-    daily_returns_arr = np.array(daily_returns)
-    sharpe = np.mean(daily_returns_arr) / np.std(daily_returns_arr) * np.sqrt(252) if np.std(daily_returns_arr) > 0 else 0
-    
-    # Max drawdown
-    peak = CONFIG['STARTING_EQUITY']
-    max_dd = 0
-    max_dd_pct = 0
-    for eq in equity_curve:
-        if eq > peak:
-            peak = eq
-        dd = (peak - eq) / peak * 100
-        if dd > max_dd_pct:
-            max_dd_pct = dd
-            max_dd = peak - eq
-    
-    # Profit factor
-    gross_profit = sum(t['pnl'] for t in winning_trades) if winning_trades else 0
-    gross_loss = abs(sum(t['pnl'] for t in losing_trades)) if losing_trades else 1
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
-    
-    # Average R-multiple
-    avg_r = np.mean([t['r_multiple'] for t in all_trades]) if all_trades else 0
+    total_return = summary['total_return_pct']
+    win_rate = summary['win_rate_pct']
+    avg_win = summary['avg_win']
+    avg_loss = summary['avg_loss']
+    sharpe = summary['sharpe_ratio']
+    max_dd = summary['max_drawdown_dollar']
+    max_dd_pct = summary['max_drawdown_pct']
+    profit_factor = summary['profit_factor']
+    avg_r = summary['avg_r_multiple']
     
     # Best/worst trades
-    best_trade = max(all_trades, key=lambda t: t['pnl']) if all_trades else None
-    worst_trade = min(all_trades, key=lambda t: t['pnl']) if all_trades else None
+    trade_cols = analytics.trade_columns(all_trades)
+    best_trade = all_trades[int(np.argmax(trade_cols['pnl']))] if all_trades else None
+    worst_trade = all_trades[int(np.argmin(trade_cols['pnl']))] if all_trades else None
     
     # Most traded symbols
-    sym_counts = {}
-    sym_pnl = {}
-    for t in all_trades:
-        sym = t['symbol']
-        sym_counts[sym] = sym_counts.get(sym, 0) + 1
-        sym_pnl[sym] = sym_pnl.get(sym, 0) + t['pnl']
+    by_symbol = analytics.breakdown(trade_cols, 'symbol').sort_values(
+        'pnl', ascending=False, kind='stable')
     
     print(f"\n📊 ACCOUNT PERFORMANCE")
-    print(f"  Starting Equity:    ${CONFIG['STARTING_EQUITY']:>12,.2f}")
+    print(f"  Starting Equity:    ${starting_equity:>12,.2f}")
     print(f"  Ending Equity:      ${equity:>12,.2f}")
-    print(f"  Net P&L:            ${equity - CONFIG['STARTING_EQUITY']:>12,.2f}")
+    print(f"  Net P&L:            ${equity - starting_equity:>12,.2f}")
     print(f"  Total Return:       {total_return:>11.1f}%")
     print(f"  Sharpe Ratio:       {sharpe:>11.2f}")
     print(f"  Profit Factor:      {profit_factor:>11.2f}")
@@ -527,8 +1209,8 @@ def run_backtest():
     
     print(f"\n📈 TRADE STATISTICS")
     print(f"  Total Trades:       {len(all_trades):>8}")
-    print(f"  Winning Trades:     {len(winning_trades):>8} ({win_rate:.1f}%)")
-    print(f"  Losing Trades:      {len(losing_trades):>8} ({100-win_rate:.1f}%)")
+    print(f"  Winning Trades:     {summary['winning_trades']:>8} ({win_rate:.1f}%)")
+    print(f"  Losing Trades:      {summary['losing_trades']:>8} ({100-win_rate:.1f}%)")
     print(f"  Avg Win:            ${avg_win:>12,.2f}")
     print(f"  Avg Loss:           ${avg_loss:>12,.2f}")
     print(f"  Avg R-Multiple:     {avg_r:>11.2f}R")
@@ -554,47 +1236,42 @@ def run_backtest():
         print(f"  {emoji} {month}: {sign}${pnl:>10,.2f}  {bar}")
     
     print(f"\n🔝 TOP SYMBOLS BY P&L")
-    sorted_syms = sorted(sym_pnl.items(), key=lambda x: x[1], reverse=True)
-    for sym, pnl in sorted_syms[:10]:
-        trades = sym_counts[sym]
-        emoji = "🟢" if pnl >= 0 else "🔴"
-        print(f"  {emoji} {sym:>6}: ${pnl:>10,.2f} ({trades} trades)")
+    for row in by_symbol.head(10).itertuples():
+        emoji = "🟢" if row.pnl >= 0 else "🔴"
+        print(f"  {emoji} {row.Index:>6}: ${row.pnl:>10,.2f} ({row.trades} trades)")
     
     print(f"\n🔻 BOTTOM SYMBOLS BY P&L")
-    for sym, pnl in sorted_syms[-5:]:
-        trades = sym_counts[sym]
-        print(f"  🔴 {sym:>6}: ${pnl:>10,.2f} ({trades} trades)")
-    
-    # Regime breakdown
-    regime_trades = {}
-    for t in all_trades:
-        r = t['regime']
-        if r not in regime_trades:
-            regime_trades[r] = {'count': 0, 'pnl': 0, 'wins': 0}
-        regime_trades[r]['count'] += 1
-        regime_trades[r]['pnl'] += t['pnl']
-        if t['pnl'] > 0:
-            regime_trades[r]['wins'] += 1
+    for row in by_symbol.tail(5).itertuples():
+        print(f"  🔴 {row.Index:>6}: ${row.pnl:>10,.2f} ({row.trades} trades)")
     
     print(f"\n🏛️ REGIME BREAKDOWN")
-    for regime, data in sorted(regime_trades.items()):
-        wr = data['wins'] / data['count'] * 100 if data['count'] > 0 else 0
-        print(f"  {regime:>16}: {data['count']} trades, ${data['pnl']:>10,.2f} P&L, {wr:.0f}% win rate")
+    for row in analytics.breakdown(trade_cols, 'regime').itertuples():
+        print(f"  {row.Index:>16}: {row.trades} trades, ${row.pnl:>10,.2f} P&L, "
+              f"{row.win_rate_pct:.0f}% win rate")
+    
+    exits = analytics.exit_reason_distribution(trade_cols)
+    print(f"\n🚪 EXIT REASONS")
+    for row in exits.itertuples():
+        print(f"  {row.Index:>16}: {row.trades} trades ({row.pct:.0f}%), "
+              f"${row.pnl:>10,.2f} P&L, {row.avg_r_multiple:.2f}R avg")
     
     print("\n" + "=" * 70)
     print("⚠️  IMPORTANT CAVEATS:")
     print("  • Uses hourly bars as proxy for 5-min ORB (actual results will vary)")
-    print("  • No slippage/commissions modeled (Alpaca is commission-free)")
+    if not any(sim['config'].get(key) for key in COST_KEYS):
+        print("  • No slippage/commissions modeled (Alpaca is commission-free)")
+    else:
+        print("  • Fills include the modeled slippage, spread, gap stops and volume cap")
     print("  • Historical stock selection may differ from live scanner")
     print("  • Past performance does not guarantee future results")
     print("=" * 70)
     
     # Save results to JSON
     results = {
-        'starting_equity': CONFIG['STARTING_EQUITY'],
+        'starting_equity': starting_equity,
         'ending_equity': round(equity, 2),
         'total_return_pct': round(total_return, 2),
-        'net_pnl': round(equity - CONFIG['STARTING_EQUITY'], 2),
+        'net_pnl': round(equity - starting_equity, 2),
         'sharpe_ratio': round(sharpe, 2),
         'profit_factor': round(profit_factor, 2),
         'max_drawdown_pct': round(max_dd_pct, 2),
@@ -605,16 +1282,76 @@ def run_backtest():
         'avg_loss': round(avg_loss, 2),
         'avg_r_multiple': round(avg_r, 2),
         'monthly_pnl': {k: round(v, 2) for k, v in monthly_pnl.items()},
-        'top_symbols': {sym: round(pnl, 2) for sym, pnl in sorted_syms[:10]},
-        'trades': all_trades[-20:],  # Last 20 trades for reference
+        'top_symbols': {sym: round(pnl, 2) for sym, pnl in by_symbol['pnl'].head(10).items()},
+        'exit_reasons': {reason: int(n) for reason, n in exits['trades'].items()},
+        'trades': [t.to_dict() for t in all_trades[-20:]],  # Last 20 trades for reference
     }
     
     with open('backtest_results.json', 'w') as f:
         json.dump(results, f, indent=2)
     print(f"\nFull results saved to backtest_results.json")
     
+    if export_dir is not None:
+        with ResultsWriter(export_dir) as writer:
+            writer.write(sim)
+        print(f"All {len(all_trades)} trades and the daily equity curve exported to {export_dir}")
+    
     return results
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='ORB strategy backtest')
+    parser.add_argument('--resolution', choices=RESOLUTIONS, default='1h',
+                        help='bar size: 1h estimates the 5-min ORB, 1m/5m measure it (default: 1h)')
+    parser.add_argument('--period', default='1y',
+                        help='history to load, e.g. 6mo, 2y (default: 1y; longer runs can use '
+                             'backtest_chunked)')
+    parser.add_argument('--offline', action='store_true',
+                        help='run entirely from the local bar cache (no network)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='bar cache directory (default: $ORB_CACHE_DIR or ./.bar_cache)')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='concurrent download requests (default: 8)')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='retries per request, with exponential backoff (default: 3)')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help='symbols per multi-ticker request (default: 1, no batching)')
+    parser.add_argument('--export', default=None, metavar='DIR',
+                        help='also write every trade and the daily equity curve to DIR')
+    parser.add_argument('--universe', default=None, metavar='PATH',
+                        help='point-in-time symbol master (CSV/Parquet) instead of SCAN_STOCKS')
+    parser.add_argument('--costs', action='store_true',
+                        help='model slippage, spread, gap-through stops and a volume cap '
+                             '(REALISTIC_COSTS in backtest_costs)')
+    parser.add_argument('--engine', choices=('loop', 'vector'), default='loop',
+                        help='day loop or the vectorized array engine (default: loop)')
+    parser.add_argument('--candidate-workers', type=int, default=None, metavar='N',
+                        help='vector engine: generate candidates on N processes, split by '
+                             'symbol (identical results; default: in-process)')
+    parser.add_argument('--stage-cache', nargs='?', const='', default=None, metavar='DIR',
+                        help='cache intermediate stages on disk and reuse them on re-runs '
+                             '(default DIR: $ORB_STAGE_DIR or ./.stage_cache)')
+    parser.add_argument('--regime-calendar', default=None, metavar='PATH',
+                        help='read regimes from a saved regime calendar, appending new days '
+                             '(created if missing; see backtest_regime)')
+    parser.add_argument('--profile', nargs='?', const='backtest.prof', default=None, metavar='PATH',
+                        help='run under cProfile and save the stats (default PATH: backtest.prof)')
+    return parser.parse_args(argv)
+
+
 if __name__ == '__main__':
-    results = run_backtest()
+    args = parse_args()
+    options = dict(resolution=args.resolution, export_dir=args.export, engine=args.engine,
+                   config=dict(CONFIG, **REALISTIC_COSTS) if args.costs else None,
+                   stage_dir=args.stage_cache, regime_calendar=args.regime_calendar,
+                   candidate_workers=args.candidate_workers,
+                   period=args.period, offline=args.offline, cache_dir=args.cache_dir,
+                   max_workers=args.workers, retries=args.retries,
+                   batch_size=args.batch_size)
+    if args.universe:
+        options['symbol_master'] = load_symbol_master(args.universe)
+    if args.profile:
+        with timing.profiled(args.profile):
+            results = run_backtest(**options)
+    else:
+        results = run_backtest(**options)
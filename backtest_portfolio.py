@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Multi-strategy portfolio backtest on one shared data load.
+
+Strategies are objects with a `name`, a `universe`, a `config` and
+prepare / watchlist / signals methods (see backtest_orb.ORBStrategy).
+The union of their universes is downloaded once into a single MarketData
+store, and simulate_portfolio runs them together against one account that
+enforces MAX_TRADES_PER_DAY and MAX_DAILY_LOSS_PCT across all of them.
+
+Besides ORB this module ports the app's gap scanner (the `gap-scanner`
+edge function and the 'gap' strategy in dayTradingStrategies.ts).
+
+    python backtest_portfolio.py --strategies orb,gap
+    python backtest_portfolio.py --strategies gap,orb --offline
+"""
+
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+import backtest_orb as orb
+
+# Same list as supabase/functions/gap-scanner
+GAP_SCAN_SYMBOLS = [
+    'NVDA', 'TSLA', 'AMD', 'AAPL', 'MSFT', 'META', 'GOOGL', 'AMZN',
+    'SPY', 'QQQ', 'COIN', 'PLTR', 'SOFI', 'RIVN', 'LCID', 'NIO',
+    'MRNA', 'BABA', 'JD', 'PYPL', 'SQ', 'SNOW', 'CRWD', 'PANW',
+    'SMCI', 'ARM', 'AVGO', 'MRVL', 'MU', 'INTC', 'MARA', 'RIOT',
+]
+
+# Gap strategy settings, on top of CONFIG (defaults match the gap scanner
+# and defaultRiskSettings in dayTradingStrategies.ts)
+GAP_CONFIG = {
+    'MIN_GAP_PCT': 3.0,             # minGapPercent
+    'MIN_GAP_RVOL': 2.0,            # minRvol
+    'GAP_RVOL_LOOKBACK': 20,        # sessions in the opening-volume average
+    'MAX_GAP_PICKS': 3,
+    'GAP_RISK_PCT': 0.01,           # maxRiskPerTrade: 1%
+    'TARGET_R_MULTIPLE': 2,         # first 2:1 target
+}
+
+
+class GapStrategy:
+    """
+    Gap-and-go: stocks gapping at least MIN_GAP_PCT from the previous close
+    on opening volume of at least MIN_GAP_RVOL times normal, largest gaps
+    first. Trades the opening-range break in the direction of the gap, stop
+    at the other side of the range.
+
+    The live scanner compares pre-market volume with the previous day's;
+    here RVOL is the first bar's volume over its average across the prior
+    GAP_RVOL_LOOKBACK sessions, which is known by the time of entry.
+    """
+
+    name = 'gap'
+    universe = GAP_SCAN_SYMBOLS
+
+    def __init__(self, config=None):
+        self.config = dict(orb.CONFIG, **GAP_CONFIG) if config is None else config
+        self.opening_rvol = {}
+
+    def prepare(self, store):
+        """Opening-bar RVOL for every symbol and day."""
+        lookback = self.config['GAP_RVOL_LOOKBACK']
+        self.opening_rvol = {}
+        for sym in self.universe:
+            if sym not in store:
+                continue
+            slices = store.day_slices[sym]
+            first_volume = pd.Series(
+                store.arrays[sym]['Volume'][[start for start, _ in slices.values()]],
+                index=list(slices))
+            average = first_volume.rolling(lookback).mean().shift(1)
+            self.opening_rvol[sym] = (first_volume / average).to_dict()
+
+    def watchlist(self, store, date):
+        """The day's gappers among the symbols listed that day, largest absolute gap first."""
+        config = self.config
+        master = store.symbol_master
+        listed = None if master is None else set(master.members(date))
+        picks = []
+        for sym in self.universe:
+            if sym not in store or date not in store.day_slices[sym]:
+                continue
+            if listed is not None and sym not in listed:
+                continue
+            n_prior = store.prior_count(sym, date)
+            if n_prior == 0:
+                continue
+            prev_close = store.daily[sym]['Close'].iloc[n_prior - 1]
+            day_open = store.arrays[sym]['Open'][store.day_slices[sym][date][0]]
+            if prev_close <= 0 or day_open < config['MIN_PRICE']:
+                continue
+
+            gap_pct = (day_open - prev_close) / prev_close * 100
+            rvol = self.opening_rvol[sym].get(date, np.nan)
+            if abs(gap_pct) >= config['MIN_GAP_PCT'] and rvol >= config['MIN_GAP_RVOL']:
+                picks.append({'symbol': sym, 'gap_pct': gap_pct, 'rvol': rvol})
+
+        picks.sort(key=lambda p: -abs(p['gap_pct']))
+        return picks[:config['MAX_GAP_PICKS']]
+
+    def signals(self, store, date, regime, watchlist):
+        """
+        Opening-range breaks in the gap's direction, in watchlist order,
+        ranked by watchlist position (1-based) as ORBStrategy's are.
+        """
+        config = self.config
+        is_bullish = regime['spy_price'] > regime['spy_sma200']
+        aggressive_bull = is_bullish and regime['vix'] <= config['VIX_AGGRESSIVE_BULL']
+        regime_label = 'aggressive_bull' if aggressive_bull else ('bull' if is_bullish else 'bear')
+
+        candidates = []
+        for rank, pick in enumerate(watchlist, 1):
+            sym = pick['symbol']
+            opening = orb.opening_range(store, sym, date, config)
+            if opening is None or opening['range'] <= 0:
+                continue
+
+            gap_up = pick['gap_pct'] > 0
+            signal, entry_price, entry_idx = orb.find_breakout(
+                store, sym, opening, gap_up, not gap_up)
+            if signal is None:
+                continue
+
+            stop_distance = opening['range']
+            stop_loss, take_profit = orb.trade_levels(
+                signal == 'long', entry_price, stop_distance, config)
+            candidates.append({
+                'symbol': sym,
+                'signal': signal,
+                'entry': entry_price,
+                'entry_idx': entry_idx,
+                'stop': stop_loss,
+                'target': take_profit,
+                'stop_distance': stop_distance,
+                'risk_pct': config['GAP_RISK_PCT'],
+                'regime': regime_label,
+                'rank': rank,
+            })
+        return candidates
+
+
+STRATEGIES = {
+    'orb': orb.ORBStrategy,
+    'gap': GapStrategy,
+}
+
+
+def combined_universe(strategies):
+    """Every symbol any strategy trades, in first-seen order."""
+    return list(dict.fromkeys(sym for strategy in strategies for sym in strategy.universe))
+
+
+def strategy_breakdown(sim):
+    """{strategy: {'trades', 'pnl', 'win_rate_pct', 'avg_r_multiple'}} for a portfolio run."""
+    breakdown = {}
+    for name in sim['strategies']:
+        trades = [t for t in sim['trades'] if t['strategy'] == name]
+        wins = sum(1 for t in trades if t['pnl'] > 0)
+        breakdown[name] = {
+            'trades': len(trades),
+            'pnl': sum(t['pnl'] for t in trades),
+            'win_rate_pct': wins / len(trades) * 100 if trades else 0,
+            'avg_r_multiple': float(np.mean([t['r_multiple'] for t in trades])) if trades else 0,
+        }
+    return breakdown
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Multi-strategy portfolio backtest')
+    parser.add_argument('--strategies', default='orb,gap',
+                        help=f"comma-separated, in priority order (from: {', '.join(STRATEGIES)})")
+    parser.add_argument('--output', default='portfolio_results.json')
+    parser.add_argument('--resolution', choices=orb.RESOLUTIONS, default='1h')
+    parser.add_argument('--offline', action='store_true',
+                        help='run entirely from the local bar cache (no network)')
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.strategies.split(',') if name.strip()]
+    unknown = [name for name in names if name not in STRATEGIES]
+    if unknown or not names:
+        parser.error(f"unknown strategies: {', '.join(unknown) or '(none given)'}")
+    strategies = [STRATEGIES[name]() for name in names]
+
+    store = orb.prepare_market_data(args.resolution, symbols=combined_universe(strategies),
+                                    offline=args.offline, cache_dir=args.cache_dir)
+    if store is None:
+        return None
+
+    sim = orb.simulate_portfolio(store, strategies, verbose=False)
+    summary = orb.summarize_backtest(sim)
+    breakdown = strategy_breakdown(sim)
+
+    print(f"\n💼 PORTFOLIO ({' + '.join(names)}) — one account, shared limits")
+    print(f"  Ending Equity:      ${summary['ending_equity']:>12,.2f}")
+    print(f"  Total Return:       {summary['total_return_pct']:>11.1f}%")
+    print(f"  Sharpe Ratio:       {summary['sharpe_ratio']:>11.2f}")
+    print(f"  Max Drawdown:       {summary['max_drawdown_pct']:>11.1f}%")
+    print(f"  Total Trades:       {summary['total_trades']:>8}")
+    print(f"\n{'STRATEGY':<10} {'TRADES':>7} {'P&L':>14} {'WIN RATE':>9} {'AVG R':>7}")
+    for name, row in breakdown.items():
+        print(f"{name:<10} {row['trades']:>7} ${row['pnl']:>13,.2f} "
+              f"{row['win_rate_pct']:>8.1f}% {row['avg_r_multiple']:>7.2f}")
+
+    results = {
+        'strategies': names,
+        'ending_equity': round(summary['ending_equity'], 2),
+        'total_return_pct': round(summary['total_return_pct'], 2),
+        'sharpe_ratio': round(summary['sharpe_ratio'], 2),
+        'max_drawdown_pct': round(summary['max_drawdown_pct'], 2),
+        'total_trades': summary['total_trades'],
+        'by_strategy': {name: {k: round(v, 2) for k, v in row.items()}
+                        for name, row in breakdown.items()},
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Regime calendar: SPY trend and VIX inputs for every trading day, computed
+once and kept in a versioned file.
+
+Each row is one SPY trading day (as of that day's close, the convention
+day_regime has always used):
+
+    date            exchange-local calendar day
+    spy_close       SPY's daily close
+    sma50, sma200   SMAs of the daily closes (all rows so far while fewer
+                    than the period are available)
+    vix             last ^VIX close on or before the date (DEFAULT_VIX if none)
+    is_bullish, strong_uptrend, longs_allowed, aggressive_bull
+                    the ORB regime flags under the file's VIX thresholds
+
+The whole table is built in one vectorized pass; append() adds only the
+days after the last row, taking the SMA windows from the stored closes,
+so a daily job keeps the file current without re-reading history. It
+also rewrites the last row when that day comes again, so a calendar
+saved mid-session keeps the day's final close, not the partial one. Both
+engines read their regime from a calendar (one built from the store's own
+bars, or a saved one given with --regime-calendar), and the file is plain
+columnar JSON so the live functions can read the same values:
+
+    {"version": 1, "thresholds": {"VIX_SHORTS_ONLY": 25, ...},
+     "columns": {"date": ["2025-01-02", ...], "spy_close": [...], ...}}
+
+    python backtest_regime.py build regime_calendar.json --period 2y
+    python backtest_regime.py update regime_calendar.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+# File layout version; load_regime_calendar rejects other versions
+REGIME_VERSION = 1
+
+# CONFIG keys the flags depend on
+THRESHOLD_KEYS = ('VIX_SHORTS_ONLY', 'VIX_AGGRESSIVE_BULL')
+
+# VIX level assumed before the first ^VIX bar (as MarketData.asof_close's default)
+DEFAULT_VIX = 20
+
+VALUE_COLUMNS = ('spy_close', 'sma50', 'sma200', 'vix')
+FLAG_COLUMNS = ('is_bullish', 'strong_uptrend', 'longs_allowed', 'aggressive_bull')
+
+
+def rolling_sma(closes, period):
+    """
+    Per-row simple moving average over the last `period` values (or all
+    values so far during warm-up). Full windows are reduced together over
+    a sliding window view; every row equals the mean of its slice bit for
+    bit, as Series.mean() over the same rows would give.
+    """
+    closes = np.asarray(closes, dtype=float)
+    n = len(closes)
+    out = np.empty(n)
+    warmup = min(period - 1, n)
+    for i in range(warmup):
+        out[i] = closes[:i + 1].mean()
+    if n >= period:
+        out[period - 1:] = np.lib.stride_tricks.sliding_window_view(closes, period).mean(axis=1)
+    return out
+
+
+def regime_flags(spy_close, sma50, sma200, vix, thresholds):
+    """The ORB regime flags for arrays of regime inputs."""
+    is_bullish = spy_close > sma200
+    return {
+        'is_bullish': is_bullish,
+        'strong_uptrend': is_bullish & (spy_close > sma50),
+        'longs_allowed': is_bullish & (vix <= thresholds['VIX_SHORTS_ONLY']),
+        'aggressive_bull': is_bullish & (vix <= thresholds['VIX_AGGRESSIVE_BULL']),
+    }
+
+
+def _asof(days, keys, values, default):
+    """values at the last of `keys` on or before each day (default before the first)."""
+    n = np.searchsorted(keys, days, side='right')
+    if len(values) == 0:
+        return np.full(len(days), float(default))
+    return np.where(n > 0, np.asarray(values, dtype=float)[np.maximum(n - 1, 0)], default)
+
+
+def daily_closes(daily):
+    """(days as datetime64[D], closes) of a daily bar frame (None -> empty)."""
+    if daily is None:
+        return np.zeros(0, dtype='datetime64[D]'), np.zeros(0)
+    index = daily.index
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.values.astype('datetime64[D]'), daily['Close'].to_numpy(dtype=float)
+
+
+class RegimeCalendar:
+    """Per-day SPY/VIX regime inputs and flags (see the module docstring)."""
+
+    def __init__(self, columns, thresholds):
+        self.date = np.asarray(columns['date'], dtype='datetime64[D]')
+        for col in VALUE_COLUMNS:
+            setattr(self, col, np.asarray(columns[col], dtype=float))
+        self.thresholds = {key: thresholds[key] for key in THRESHOLD_KEYS}
+        if len(self.date) > 1 and (np.diff(self.date) <= np.timedelta64(0, 'D')).any():
+            raise ValueError("Regime calendar dates must be strictly increasing")
+        self._flags = {}
+        if all(col in columns for col in FLAG_COLUMNS):
+            self._flags[self._threshold_key(self.thresholds)] = {
+                col: np.asarray(columns[col], dtype=bool) for col in FLAG_COLUMNS}
+
+    def __len__(self):
+        return len(self.date)
+
+    @classmethod
+    def from_closes(cls, days, spy_close, vix_days, vix_close, thresholds):
+        """Build the calendar for SPY's daily closes (and ^VIX's, possibly empty)."""
+        days = np.asarray(days, dtype='datetime64[D]')
+        spy_close = np.asarray(spy_close, dtype=float)
+        return cls({
+            'date': days,
+            'spy_close': spy_close,
+            'sma50': rolling_sma(spy_close, 50),
+            'sma200': rolling_sma(spy_close, 200),
+            'vix': _asof(days, np.asarray(vix_days, dtype='datetime64[D]'), vix_close, DEFAULT_VIX),
+        }, thresholds)
+
+    @classmethod
+    def from_daily(cls, spy_daily, vix_daily, thresholds):
+        """Build the calendar from SPY and ^VIX daily bar frames (vix_daily may be None)."""
+        return cls.from_closes(*daily_closes(spy_daily), *daily_closes(vix_daily), thresholds)
+
+    def append(self, days, spy_close, vix_days=(), vix_close=()):
+        """
+        Add the days after the last row, replacing the last row itself if
+        its day is given again (it may have been stored mid-session). SMA
+        windows reach back into the stored closes; a day without a ^VIX bar
+        on or before it keeps the last stored VIX. Returns the number of
+        rows added or replaced.
+        """
+        days = np.asarray(days, dtype='datetime64[D]')
+        new = days >= self.date[-1] if len(self) else np.ones(len(days), dtype=bool)
+        if not new.any():
+            return 0
+        days = days[new]
+        closes = np.asarray(spy_close, dtype=float)[new]
+        last_vix = self.vix[-1] if len(self) else DEFAULT_VIX
+        if len(self) and days[0] == self.date[-1]:
+            # The last stored day comes again: rebuild its row from the new close
+            for col in ('date',) + VALUE_COLUMNS:
+                setattr(self, col, getattr(self, col)[:-1])
+        # 199 stored closes complete the first new row's 200-day window
+        # (with fewer stored, the warm-up takes them all, as a full build does)
+        tail = self.spy_close[-199:]
+        history = np.concatenate([tail, closes])
+        sma50 = rolling_sma(history, 50)[len(tail):]
+        sma200 = rolling_sma(history, 200)[len(tail):]
+        vix = _asof(days, np.asarray(vix_days, dtype='datetime64[D]'), vix_close, np.nan)
+        vix = np.where(np.isnan(vix), last_vix, vix)
+
+        self.date = np.concatenate([self.date, days])
+        self.spy_close = np.concatenate([self.spy_close, closes])
+        self.sma50 = np.concatenate([self.sma50, sma50])
+        self.sma200 = np.concatenate([self.sma200, sma200])
+        self.vix = np.concatenate([self.vix, vix])
+        self._flags = {}
+        return len(days)
+
+    def append_daily(self, spy_daily, vix_daily=None):
+        """append() from SPY and ^VIX daily bar frames."""
+        return self.append(*daily_closes(spy_daily), *daily_closes(vix_daily))
+
+    def rows(self, days):
+        """Row of each day (the last row on or before it; -1 before the first)."""
+        keys = np.array([np.datetime64(pd.Timestamp(d).date(), 'D') for d in days],
+                        dtype='datetime64[D]')
+        return np.searchsorted(self.date, keys, side='right') - 1
+
+    def row(self, date):
+        return int(self.rows([date])[0])
+
+    def flags(self, config):
+        """Flag arrays under `config`'s VIX thresholds (the stored ones if they match)."""
+        key = self._threshold_key(config)
+        if key not in self._flags:
+            self._flags[key] = regime_flags(self.spy_close, self.sma50, self.sma200, self.vix,
+                                            dict(zip(THRESHOLD_KEYS, key)))
+        return self._flags[key]
+
+    def fingerprint(self):
+        """Hash of the calendar's values (for stage cache keys)."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.date.astype(np.int64).tobytes())
+        for col in VALUE_COLUMNS:
+            digest.update(getattr(self, col).tobytes())
+        return digest.hexdigest()
+
+    def to_frame(self):
+        stored = self.flags(self.thresholds)
+        frame = pd.DataFrame({'date': self.date.astype('datetime64[ns]')})
+        for col in VALUE_COLUMNS:
+            frame[col] = getattr(self, col)
+        for col in FLAG_COLUMNS:
+            frame[col] = stored[col]
+        return frame
+
+    def save(self, path):
+        """Write the calendar as versioned columnar JSON (atomically)."""
+        stored = self.flags(self.thresholds)
+        columns = {'date': [str(d) for d in self.date]}
+        for col in VALUE_COLUMNS:
+            columns[col] = getattr(self, col).tolist()
+        for col in FLAG_COLUMNS:
+            columns[col] = stored[col].tolist()
+        # Unique per writer, so concurrent saves never share a temp file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'version': REGIME_VERSION, 'thresholds': self.thresholds,
+                       'columns': columns}, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _threshold_key(config):
+        return tuple(config[k] for k in THRESHOLD_KEYS)
+
+
+def load_regime_calendar(path):
+    """Load a RegimeCalendar saved by RegimeCalendar.save()."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No regime calendar at {path}")
+    with open(path) as f:
+        payload = json.load(f)
+    if payload.get('version') != REGIME_VERSION:
+        raise ValueError(f"Regime calendar {path} has version {payload.get('version')}, "
+                         f"expected {REGIME_VERSION}")
+    return RegimeCalendar(payload['columns'], payload['thresholds'])
+
+
+def main(argv=None):
+    import backtest_orb as orb
+
+    parser = argparse.ArgumentParser(description='Build or update the regime calendar')
+    parser.add_argument('command', choices=('build', 'update'))
+    parser.add_argument('path')
+    parser.add_argument('--period', default='2y',
+                        help='history to download for build (default: 2y)')
+    parser.add_argument('--offline', action='store_true',
+                        help='read SPY and ^VIX from the local bar cache only')
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == 'update' and not os.path.exists(args.path):
+        parser.error(f"{args.path} does not exist (run build first)")
+    period = args.period if args.command == 'build' else '1mo'
+    data = orb.download_data([], period=period, offline=args.offline, cache_dir=args.cache_dir)
+    if 'SPY' not in data:
+        print("ERROR: Could not download SPY data")
+        return 1
+    spy = orb.get_daily_bars(data['SPY'])
+    vix = orb.get_daily_bars(data['^VIX']) if '^VIX' in data else None
+
+    if args.command == 'build':
+        calendar = RegimeCalendar.from_daily(spy, vix, orb.CONFIG)
+        added = len(calendar)
+    else:
+        calendar = load_regime_calendar(args.path)
+        added = calendar.append_daily(spy, vix)
+    calendar.save(args.path)
+    print(f"{args.path}: {len(calendar)} days through {calendar.date[-1]} "
+          f"({added} added or refreshed)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
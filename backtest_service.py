@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Backtest service: run ORB backtests over HTTP/JSON.
+
+Market data is downloaded (or read from the bar cache) once at startup
+and kept warm in a MarketData store, together with the default config's
+selections and SPY SMAs, so a request only pays for its own simulation.
+Requests are queued and run by a pool of worker threads; results are
+memoized by a hash of (full config, date range, engine) in an LRU cache,
+so repeating a request — or two dashboard users asking the same thing —
+returns immediately.
+
+    POST /backtests              {"config": {"TARGET_R_MULTIPLE": 2},
+                                  "start": "2025-01-01", "end": "2025-06-30",
+                                  "engine": "vector"}
+                                 → 202 {"id": ..., "status": "queued", ...}
+                                   (200 with the result if already cached)
+    GET  /backtests/<id>         job status, progress and, once done, the result
+    GET  /backtests/<id>/events  progress as JSON lines until the job finishes
+    GET  /health                 data loaded, queue length, cache stats
+
+`config` holds CONFIG overrides only; unknown keys are rejected. `start`
+and `end` (inclusive, optional) pick a slice of the loaded trading days.
+The result has the summarize_backtest metrics, every trade, the daily
+equity curve and monthly P&L; the job state also carries the job's own
+phase times and counters ('timing', recorded apart from the other
+workers' jobs).
+
+    python backtest_service.py --offline --port 8000 --workers 2
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import queue
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+import backtest_orb as orb
+import backtest_timing as timing
+import backtest_vector as vector
+from backtest_universe import load_symbol_master
+
+ENGINES = ('vector', 'loop')
+
+# Finished jobs kept for status lookups (results also live in the LRU)
+MAX_JOBS = 1000
+
+# Job progress when each vector-engine stage finishes; the account scan
+# reports its own fraction on top of the last one
+STAGE_PROGRESS = {
+    'selection': 0.1,
+    'regime': 0.15,
+    'orb_ranges': 0.3,
+    'signals': 0.4,
+    'outcomes': 0.5,
+}
+
+
+class RequestError(ValueError):
+    """A malformed backtest request (HTTP 400)."""
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, orb.TradeRecord):
+        return value.to_dict()
+    return str(value)
+
+
+def request_key(config, start, end, engine):
+    """Hash of everything a result depends on, for the result cache."""
+    payload = json.dumps([config, start, end, engine], sort_keys=True, default=_json_default)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def build_result(sim):
+    """JSON-ready result for a finished simulation."""
+    summary = orb.summarize_backtest(sim)
+    days = [pd.Timestamp(d).strftime('%Y-%m-%d') for d in sim['trading_days']]
+    return {
+        'summary': {k: round(float(v), 4) if math.isfinite(v) else None
+                    for k, v in summary.items()},
+        'trades': [t.to_dict() for t in sim['trades']],
+        'equity_curve': [{'date': d, 'equity': round(float(e), 2)}
+                         for d, e in zip(days, sim['equity_curve'][1:])],
+        'monthly_pnl': {k: round(float(v), 2) for k, v in sim['monthly_pnl'].items()},
+    }
+
+
+class Job:
+    """One queued backtest and its progress."""
+
+    def __init__(self, key, config, start, end, engine):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.config = config
+        self.start = start
+        self.end = end
+        self.engine = engine
+        self.status = 'queued'
+        self.stage = None
+        self.progress = 0.0
+        self.error = None
+        self.result = None
+        self.timing = None
+        self.created = time.time()
+        self.finished = None
+        self.changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed')
+
+    def update(self, **fields):
+        with self.changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.changed.notify_all()
+
+    def state(self, with_result=True):
+        out = {
+            'id': self.id,
+            'key': self.key,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 3),
+            'created': self.created,
+            'finished': self.finished,
+        }
+        if self.error is not None:
+            out['error'] = self.error
+        if self.timing is not None:
+            out['timing'] = self.timing
+        if with_result and self.result is not None:
+            out['result'] = self.result
+        return out
+
+
+class BacktestService:
+    """
+    Job queue, worker threads and LRU result cache over one warm store.
+    Worker threads share the store; its lazily filled caches (selections,
+    SPY SMAs, regime flags) are filled for each job's config under
+    `cache_lock` before it runs, so simulations only read them.
+    """
+
+    def __init__(self, store, workers=2, cache_size=128, stages=None):
+        self.store = store
+        self.stages = stages
+        self.cache_size = cache_size
+        self.results = OrderedDict()
+        self.jobs = OrderedDict()
+        self.running = {}
+        self.lock = threading.Lock()
+        self.cache_lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.hits = 0
+        self.misses = 0
+        self.workers = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def parse(self, body):
+        """(config, start, end, engine) from a request body, validated."""
+        if not isinstance(body, dict):
+            raise RequestError("Request body must be a JSON object")
+        overrides = body.get('config') or {}
+        if not isinstance(overrides, dict):
+            raise RequestError("'config' must be an object of CONFIG overrides")
+        unknown = sorted(set(overrides) - set(orb.CONFIG))
+        if unknown:
+            raise RequestError(f"Unknown CONFIG keys: {unknown}")
+        engine = body.get('engine', 'vector')
+        if engine not in ENGINES:
+            raise RequestError(f"Unknown engine: {engine} (expected one of {ENGINES})")
+        try:
+            start = pd.Timestamp(body['start']).date() if body.get('start') else None
+            end = pd.Timestamp(body['end']).date() if body.get('end') else None
+        except ValueError as e:
+            raise RequestError(f"Bad date: {e}") from None
+        return dict(orb.CONFIG, **overrides), start, end, engine
+
+    def submit(self, body):
+        """Queue a backtest (or answer it from the cache); returns its Job."""
+        config, start, end, engine = self.parse(body)
+        key = request_key(config, start, end, engine)
+        with self.lock:
+            if key in self.running:
+                return self.running[key]
+            job = Job(key, config, start, end, engine)
+            self._remember(job)
+            if key in self.results:
+                self.results.move_to_end(key)
+                self.hits += 1
+                job.update(status='done', progress=1.0, result=self.results[key],
+                           finished=time.time())
+                return job
+            self.misses += 1
+            self.running[key] = job
+        self.queue.put(job)
+        return job
+
+    def job(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def health(self):
+        with self.lock:
+            return {
+                'resolution': self.store.resolution,
+                'symbols': len(self.store.hourly),
+                'trading_days': len(self.store.trading_days),
+                'first_day': str(self.store.trading_days[0]) if self.store.trading_days else None,
+                'last_day': str(self.store.trading_days[-1]) if self.store.trading_days else None,
+                'workers': len(self.workers),
+                'queued': self.queue.qsize(),
+                'running': len(self.running),
+                'cached_results': len(self.results),
+                'cache_hits': self.hits,
+                'cache_misses': self.misses,
+            }
+
+    def _remember(self, job):
+        self.jobs[job.id] = job
+        while len(self.jobs) > MAX_JOBS:
+            oldest = next(iter(self.jobs.values()))
+            if not oldest.done:
+                break
+            self.jobs.popitem(last=False)
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            try:
+                with timing.collect() as timings:
+                    self._run(job)
+                job.update(timing=timings.report())
+            except Exception as e:  # report any failure on the job, keep the worker alive
+                job.update(status='failed', error=f"{type(e).__name__}: {e}", finished=time.time())
+            finally:
+                with self.lock:
+                    self.running.pop(job.key, None)
+                self.queue.task_done()
+
+    def _warm(self, config):
+        """Fill the store's caches `config` reads, one job at a time."""
+        with self.cache_lock:
+            if self.stages is not None:
+                self.stages.selections(self.store, config)
+            orb.warm_caches(self.store, [config])
+            self.store.regimes().flags(config)
+
+    def _run(self, job):
+        job.update(status='running', stage='selection')
+        self._warm(job.config)
+        days = [d for d in self.store.trading_days
+                if (job.start is None or d >= job.start) and (job.end is None or d <= job.end)]
+
+        if job.engine == 'vector':
+            def progress(stage, fraction):
+                done = STAGE_PROGRESS.get(stage, 0.5 + 0.45 * fraction)
+                job.update(stage=stage, progress=done)
+
+            sim = vector.simulate_vectorized(self.store, job.config, days, stages=self.stages,
+                                             progress=progress)
+        else:
+            job.update(stage='simulation', progress=0.2)
+            sim = orb.simulate_backtest(self.store, job.config, verbose=False, days=days)
+
+        job.update(stage='reporting', progress=0.95)
+        result = build_result(sim)
+        with self.lock:
+            self.results[job.key] = result
+            self.results.move_to_end(job.key)
+            while len(self.results) > self.cache_size:
+                self.results.popitem(last=False)
+        job.update(status='done', stage=None, progress=1.0, result=result, finished=time.time())
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def do_OPTIONS(self):
+            self.send_response(204)
+            self._cors()
+            self.end_headers()
+
+        def do_GET(self):
+            parts = [p for p in self.path.split('?')[0].split('/') if p]
+            if parts == ['health']:
+                return self._send(200, service.health())
+            if len(parts) in (2, 3) and parts[0] == 'backtests':
+                job = service.job(parts[1])
+                if job is None:
+                    return self._send(404, {'error': f"No job {parts[1]}"})
+                if len(parts) == 2:
+                    return self._send(200, job.state())
+                if parts[2] == 'events':
+                    return self._stream(job)
+            self._send(404, {'error': f"Not found: {self.path}"})
+
+        def do_POST(self):
+            if self.path.split('?')[0].rstrip('/') != '/backtests':
+                return self._send(404, {'error': f"Not found: {self.path}"})
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                job = service.submit(body)
+            except (ValueError, RequestError) as e:
+                return self._send(400, {'error': str(e)})
+            self._send(200 if job.done else 202, job.state())
+
+        def _stream(self, job):
+            """JSON lines of job state on every change, ending when the job does."""
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Cache-Control', 'no-cache')
+            self._cors()
+            self.end_headers()
+            last = None
+            while True:
+                with job.changed:
+                    state = job.state(with_result=False)
+                    if state == last and not job.done:
+                        job.changed.wait(timeout=15)
+                        continue
+                if job.done:
+                    state = job.state()
+                try:
+                    self.wfile.write((json.dumps(state, default=_json_default) + '\n').encode())
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                if job.done:
+                    return
+                last = state
+
+        def _send(self, status, payload):
+            data = json.dumps(payload, default=_json_default).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self._cors()
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _cors(self):
+            # The dashboard calls from the Vite dev server's origin
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+
+    return Handler
+
+
+def serve(service, host='127.0.0.1', port=8000):
+    with ThreadingHTTPServer((host, port), make_handler(service)) as server:
+        print(f"Backtest service on http://{host}:{port} (Ctrl-C to stop)")
+        server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ORB backtest HTTP/JSON service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=2,
+                        help='backtests run concurrently (default: 2)')
+    parser.add_argument('--cache-size', type=int, default=128,
+                        help='results kept in the LRU cache (default: 128)')
+    parser.add_argument('--resolution', choices=orb.RESOLUTIONS, default='1h')
+    parser.add_argument('--period', default='1y', help='history to load (default: 1y)')
+    parser.add_argument('--offline', action='store_true',
+                        help='load from the local bar cache only (no network)')
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--universe', default=None, metavar='PATH',
+                        help='point-in-time symbol master (CSV/Parquet) instead of SCAN_STOCKS')
+    parser.add_argument('--stage-cache', nargs='?', const='', default=None, metavar='DIR',
+                        help='also reuse intermediate stages across restarts (see backtest_stages)')
+    args = parser.parse_args(argv)
+
+    stages = None
+    if args.stage_cache is not None:
+        import backtest_stages
+        stages = backtest_stages.StageCache(args.stage_cache or None)
+    master = load_symbol_master(args.universe) if args.universe else None
+    store = orb.prepare_market_data(args.resolution, period=args.period, symbol_master=master,
+                                    stages=stages, offline=args.offline, cache_dir=args.cache_dir)
+    if store is None:
+        return 1
+    orb.warm_caches(store, [orb.CONFIG])
+    service = BacktestService(store, args.workers, args.cache_size, stages)
+    try:
+        serve(service, args.host, args.port)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+On-disk cache of intermediate backtest stages for fast re-runs.
+
+A run is a chain of stages, each depending on its upstream stages and on
+a few CONFIG keys:
+
+    daily_bars ─┬─ selection ── orb_ranges ─┬─ signals ── outcomes ── account
+                └─ regime ──────────────────┘
+
+Each stage's result is stored under a key hashed from the stage name,
+the keys of its inputs (the root being a fingerprint of the bar data)
+and the values of the CONFIG keys in STAGE_DEPS[stage]. Changing
+TARGET_R_MULTIPLE therefore only invalidates outcomes; changing
+MIN_RVOL invalidates selection and everything after it, but not daily
+bars or regime. The account scan (sizing, trade cap, daily loss stop,
+compounding) is always re-run; it is a short loop over the cached
+signals.
+
+daily_bars and selection are shared by both engines; the later stages
+are the vector engine's (backtest_vector). Entries are pickles named
+<stage>-<key>.pkl under STAGE_DIR; stale ones are never read again and
+can be removed with clear().
+
+    stages = StageCache()
+    store = orb.prepare_market_data('1h', offline=True, stages=stages)
+    sim = backtest_vector.simulate_vectorized(store, config, stages=stages)
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+
+import numpy as np
+
+import backtest_orb as orb
+import backtest_timing as timing
+from backtest_costs import COST_KEYS
+
+STAGE_DIR = os.environ.get(
+    'ORB_STAGE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.stage_cache'),
+)
+
+# Part of every key; bump when a stage's result layout changes so
+# entries written by older code are never read
+STAGE_FORMAT = 2
+
+# CONFIG keys each stage reads (upstream stages are covered by their keys)
+STAGE_DEPS = {
+    'daily_bars': (),
+    'selection': orb.SELECTOR_KEYS,
+    'regime': ('VIX_SHORTS_ONLY', 'VIX_AGGRESSIVE_BULL'),
+    'orb_ranges': ('ORB_MINUTES', 'ENTRY_CUTOFF_MINUTE', 'PREMARKET_COOLOFF_PCT'),
+    'signals': ('TIER1_RISK', 'TIER1_AGGRESSIVE_RISK', 'TIER2_RISK'),
+    'outcomes': ('TARGET_R_MULTIPLE',) + COST_KEYS,
+}
+
+
+def data_fingerprint(all_data, resolution):
+    """Hash of every symbol's bar index and OHLCV values."""
+    digest = hashlib.blake2b(resolution.encode(), digest_size=16)
+    for sym in sorted(all_data):
+        df = all_data[sym]
+        digest.update(sym.encode())
+        digest.update(np.ascontiguousarray(df.index.asi8).tobytes())
+        for col in ('Open', 'High', 'Low', 'Close', 'Volume'):
+            digest.update(np.ascontiguousarray(df[col].to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+
+def master_fingerprint(master):
+    """Hash of a SymbolMaster's intervals (None without one)."""
+    if master is None:
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update('\n'.join(master.symbol).encode())
+    digest.update(master.start.tobytes())
+    digest.update(master.end.tobytes())
+    return digest.hexdigest()
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+class StageCache:
+    """Stage results persisted under cache_dir (default STAGE_DIR)."""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = STAGE_DIR if cache_dir is None else cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, name, config, inputs=(), extra=()):
+        """Cache key for a stage: its name, input keys, CONFIG subset and any extra values."""
+        subset = {k: config[k] for k in STAGE_DEPS.get(name, ())}
+        payload = json.dumps([STAGE_FORMAT, name, list(inputs), subset, extra], sort_keys=True,
+                             default=_json_default)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def path(self, name, key):
+        return os.path.join(self.cache_dir, f"{name}-{key}.pkl")
+
+    def get(self, name, config, compute, inputs=(), extra=()):
+        """The stage's cached result, or compute() it and store it. Returns (value, key)."""
+        key = self.key(name, config, inputs, extra)
+        path = self.path(name, key)
+        if os.path.exists(path):
+            with timing.phase('stage_load'):
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+            timing.count('stage_hits')
+            return value, key
+
+        value = compute()
+        timing.count('stage_misses')
+        # Unique per writer: two jobs computing one stage must not share a temp file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        return value, key
+
+    def market_data(self, all_data, resolution='1h', universe=None, symbol_master=None):
+        """
+        MarketData built from cached daily bars (and SPY SMAs) when the bar
+        data matches an earlier run's. The store remembers its stage key
+        as store.stage_key for the stages downstream.
+        """
+        fingerprint = data_fingerprint(all_data, resolution)
+        built = []
+
+        def build():
+            store = orb.MarketData(all_data, resolution, universe, symbol_master)
+            if 'SPY' in store:
+                store.sma('SPY', 50)
+                store.sma('SPY', 200)
+            built.append(store)
+            return {'daily': store.daily, 'smas': store.smas}
+
+        cached, key = self.get('daily_bars', {}, build, extra=fingerprint)
+        if built:
+            store = built[0]
+        else:
+            store = orb.MarketData(all_data, resolution, universe, symbol_master,
+                                   daily=cached['daily'])
+            store.smas.update(cached['smas'])
+        store.stage_key = key
+        return store
+
+    def selections(self, store, config, universe=None):
+        """
+        store_selections through the cache; the result is also put in the
+        store's in-memory selections so either engine picks it up.
+        Returns (selections, key).
+        """
+        universe = store.universe if universe is None else universe
+        selector_key = tuple(config[k] for k in orb.SELECTOR_KEYS) + (tuple(universe),)
+
+        def compute():
+            return orb.store_selections(store, config, universe)
+
+        value, key = self.get('selection', config, compute, inputs=(self.store_key(store),),
+                              extra=[list(universe), master_fingerprint(store.symbol_master)])
+        store.selections[selector_key] = value
+        return value, key
+
+    def store_key(self, store):
+        """The daily_bars key a store was built under (fingerprinted on demand)."""
+        if getattr(store, 'stage_key', None) is None:
+            store.stage_key = self.key('daily_bars', {},
+                                       extra=data_fingerprint(store.hourly, store.resolution))
+        return store.stage_key
+
+    def clear(self):
+        """Delete every cached stage."""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.pkl'):
+                os.remove(os.path.join(self.cache_dir, name))
@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+"""
+Event-driven ORB engine: replays bars one timestamp at a time.
+
+Unlike run_backtest, which loads the whole history and slices it per day,
+StreamingEngine only keeps incremental state: the last 35 daily closes and
+volumes per symbol (enough for the selector's 30-day average volume and
+5-day lookback), running SPY 50/200-day SMA sums, the last VIX print and
+the open positions. Memory is bounded by the lookback window, not by the
+length of the history.
+
+Decisions only use what is known at the bar being processed, like the
+live auto-trade function: the regime uses the latest SPY price with the
+SMAs over the completed daily closes plus that price, and the daily loss
+stop sees realized P&L. run_backtest instead reads the regime off the
+day's close, so the two engines differ slightly on regime-flip days;
+given a RegimeCalendar, the engine reads the day's regime from it as
+run_backtest does. Days before the first SPY print (or the calendar's
+first row) have no regime and, as in run_backtest, are left out of the
+day counts, returns and equity curve.
+
+Fills go through the config's ExecutionModel like the loop engine's,
+one trade at a time, and a SymbolMaster limits the selector to the
+symbols listed on each day.
+
+The same engine backtests from the bar cache or paper-trades from a bar
+feed, e.g. the local replay server:
+
+    python backtest_stream.py backtest --offline
+    python backtest_stream.py serve --port 8765 --speed 0.5
+    python backtest_stream.py paper --connect localhost:8765
+"""
+
+import argparse
+import heapq
+import json
+import socket
+import socketserver
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+import pandas as pd
+
+import backtest_orb as orb
+from backtest_costs import ExecutionModel
+from backtest_data import CACHE_FORMAT, cache_path, load_cached
+
+Bar = namedtuple('Bar', 'time symbol open high low close volume')
+
+MARKET_TZ = 'America/New_York'
+
+# Daily rows the selector needs: 30-day volume average + 5 excluded days
+SELECTOR_LOOKBACK = 35
+
+
+# ============================================================
+# BAR SOURCES
+# ============================================================
+
+def _frame_bars(symbol, df):
+    index = df.index.tz_convert(MARKET_TZ) if df.index.tz is not None else df.index
+    cols = [df[c].to_numpy(dtype=float) for c in ('Open', 'High', 'Low', 'Close', 'Volume')]
+    for ts, o, h, l, c, v in zip(index, *cols):
+        yield ts.value, symbol, Bar(ts, symbol, o, h, l, c, v)
+
+
+def _cached_bars(symbol, interval, cache_dir, batch_size):
+    if CACHE_FORMAT == 'parquet':
+        import pyarrow.parquet as pq
+        path = cache_path(symbol, interval, cache_dir)
+        try:
+            parquet = pq.ParquetFile(path)
+        except FileNotFoundError:
+            return
+        for batch in parquet.iter_batches(batch_size=batch_size):
+            yield from _frame_bars(symbol, batch.to_pandas())
+    else:
+        df = load_cached(symbol, interval, cache_dir)
+        if df is not None:
+            yield from _frame_bars(symbol, df)
+
+
+def replay_frames(frames):
+    """Merge {symbol: DataFrame} into one time-ordered stream of Bars."""
+    streams = [_frame_bars(sym, df) for sym, df in frames.items()]
+    for _, _, bar in heapq.merge(*streams, key=lambda item: (item[0], item[1])):
+        yield bar
+
+
+def replay_cache(symbols, interval='1h', cache_dir=None, batch_size=4096):
+    """
+    Stream cached bars for many symbols in time order. Parquet caches are
+    read in row batches, so only one batch per symbol is held in memory.
+    """
+    streams = [_cached_bars(sym, interval, cache_dir, batch_size) for sym in symbols]
+    for _, _, bar in heapq.merge(*streams, key=lambda item: (item[0], item[1])):
+        yield bar
+
+
+# ============================================================
+# ENGINE
+# ============================================================
+
+class SymbolState:
+    """Rolling daily history plus today's bar accumulator for one symbol."""
+
+    __slots__ = ('closes', 'volumes', 'n_days', 'bars_today', 'open', 'close',
+                 'volume', 'first_minute', 'orb_high', 'orb_low', 'orb', 'skip')
+
+    def __init__(self):
+        self.closes = deque(maxlen=SELECTOR_LOOKBACK)
+        self.volumes = deque(maxlen=SELECTOR_LOOKBACK)
+        self.n_days = 0
+        self.reset_day()
+
+    def reset_day(self):
+        self.bars_today = 0
+        self.open = self.close = None
+        self.volume = 0
+        self.first_minute = None
+        self.orb_high = -np.inf
+        self.orb_low = np.inf
+        self.orb = None
+        self.skip = False
+
+    def end_day(self):
+        if self.bars_today:
+            self.closes.append(self.close)
+            self.volumes.append(self.volume)
+            self.n_days += 1
+        self.reset_day()
+
+
+class RollingSMA:
+    """SMA over the last `period` completed daily closes, plus a live price."""
+
+    def __init__(self, period):
+        self.period = period
+        self.values = deque()
+        self.total = 0.0
+
+    def push(self, value):
+        self.values.append(value)
+        self.total += value
+        if len(self.values) > self.period - 1:
+            self.total -= self.values.popleft()
+
+    def value(self, live_price):
+        return (self.total + live_price) / (len(self.values) + 1)
+
+
+class StreamingEngine:
+    """
+    Incremental ORB engine. Feed bars in time order with on_bar() (bars
+    sharing a timestamp are handled together, in the day's rank order),
+    then call finish() for results shaped like simulate_backtest's, so
+    summarize_backtest works on them. `on_fill(event)` is called for
+    every entry and exit. `regime_calendar`, `symbol_master` and
+    `execution` play the same parts as in the loop engine (see the module
+    docstring).
+    """
+
+    def __init__(self, config=None, universe=None, resolution='1h', on_fill=None,
+                 regime_calendar=None, symbol_master=None, execution=None):
+        self.config = dict(orb.CONFIG if config is None else config)
+        if universe is None:
+            universe = orb.SCAN_STOCKS if symbol_master is None else symbol_master.symbols
+        self.universe = universe
+        self.resolution = resolution
+        self.on_fill = on_fill
+        self.regime_calendar = regime_calendar
+        self.symbol_master = symbol_master
+        self.execution = ExecutionModel.from_config(self.config) if execution is None else execution
+
+        self.states = {}
+        self.sma50 = RollingSMA(50)
+        self.sma200 = RollingSMA(200)
+        self.spy_price = None
+        self.vix_level = 20
+
+        self.date = None
+        self.day_regime = None
+        self.picks = []
+        self.positions = {}
+        self.day_pnl = 0
+        self.day_trades = 0
+        self.halted = False
+        self.day_equity = self.config['STARTING_EQUITY']
+
+        self.equity = self.config['STARTING_EQUITY']
+        self.results = {
+            'config': self.config,
+            'trading_days': [],
+            'equity_curve': [self.equity],
+            'daily_returns': [],
+            'trades': [],
+            'monthly_pnl': {},
+            'winning_days': 0,
+            'losing_days': 0,
+            'flat_days': 0,
+            'no_trade_days': 0,
+            'total_trading_days': 0,
+        }
+        self._pending = []
+
+    # --- feeding -------------------------------------------------------
+
+    def on_bar(self, bar):
+        if self._pending and bar.time != self._pending[0].time:
+            self._process(self._pending)
+            self._pending = []
+        self._pending.append(bar)
+
+    def run(self, bars):
+        for bar in bars:
+            self.on_bar(bar)
+        return self.finish()
+
+    def finish(self):
+        if self._pending:
+            self._process(self._pending)
+            self._pending = []
+        if self.date is not None:
+            self._end_day()
+            self.date = None
+        self.results['equity'] = self.equity
+        return self.results
+
+    # --- per timestamp -------------------------------------------------
+
+    def _process(self, bars):
+        ts = bars[0].time
+        day = ts.tz_convert(MARKET_TZ).date() if ts.tzinfo is not None else ts.date()
+        if day != self.date:
+            if self.date is not None:
+                self._end_day()
+            self._start_day(day)
+
+        by_symbol = {bar.symbol: bar for bar in bars}
+        regime = self._regime() if self.regime_calendar is None else self.day_regime
+
+        # Picks in rank order first, then everything else
+        ranked = [info['symbol'] for info in self.picks[:5]]
+        for rank, sym in enumerate(ranked, 1):
+            if sym in by_symbol:
+                self._on_candidate_bar(by_symbol[sym], rank, regime)
+        for sym, pos in list(self.positions.items()):
+            if sym in by_symbol and not pos.get('checked'):
+                self._check_exit(pos, by_symbol[sym])
+        for pos in self.positions.values():
+            pos.pop('checked', None)
+
+        for bar in bars:
+            self._accumulate(bar)
+
+    def _accumulate(self, bar):
+        if bar.symbol == 'SPY':
+            self.spy_price = bar.close
+        elif bar.symbol == '^VIX':
+            self.vix_level = bar.close
+        state = self.states.setdefault(bar.symbol, SymbolState())
+        if state.bars_today == 0:
+            state.open = bar.open
+            state.first_minute = bar.time.hour * 60 + bar.time.minute
+        state.close = bar.close
+        state.volume += bar.volume
+        state.bars_today += 1
+
+    def _regime(self):
+        if self.spy_price is None:
+            return None
+        return self._regime_flags(self.spy_price, self.sma50.value(self.spy_price),
+                                  self.sma200.value(self.spy_price), self.vix_level)
+
+    def _calendar_regime(self, day):
+        calendar = self.regime_calendar
+        row = calendar.row(day)
+        if row < 0:
+            return None
+        return self._regime_flags(calendar.spy_close[row], calendar.sma50[row],
+                                  calendar.sma200[row], calendar.vix[row])
+
+    def _regime_flags(self, spy_price, sma50, sma200, vix):
+        is_bullish = spy_price > sma200
+        return {
+            'is_bullish': is_bullish,
+            'strong_uptrend': is_bullish and spy_price > sma50,
+            'longs_allowed': is_bullish and vix <= self.config['VIX_SHORTS_ONLY'],
+            'aggressive_bull': is_bullish and vix <= self.config['VIX_AGGRESSIVE_BULL'],
+            'vix': vix,
+        }
+
+    # --- entries and exits ---------------------------------------------
+
+    def _on_candidate_bar(self, bar, rank, regime):
+        state = self.states.setdefault(bar.symbol, SymbolState())
+        config = self.config
+        i = state.bars_today
+        minute = bar.time.hour * 60 + bar.time.minute
+
+        if i == 0:
+            # Check pre-market cool-off (use gap from previous close)
+            prev_close = state.closes[-1] if state.closes else None
+            if prev_close is None:
+                state.skip = True
+            elif prev_close > 0 and abs((bar.open - prev_close) / prev_close * 100) > config['PREMARKET_COOLOFF_PCT']:
+                state.skip = True
+            if self.resolution == '1h':
+                state.orb = orb.orb_from_first_bar({
+                    'Open': bar.open, 'High': bar.high, 'Low': bar.low, 'Volume': bar.volume})
+                return
+            state.first_minute = minute
+
+        if state.skip or regime is None or bar.symbol in self.positions:
+            return
+
+        if self.resolution == '1h':
+            if i != 1 or state.orb is None:
+                return
+        elif minute < state.first_minute + config['ORB_MINUTES']:
+            state.orb_high = max(state.orb_high, bar.high)
+            state.orb_low = min(state.orb_low, bar.low)
+            return
+        else:
+            if state.orb is None:
+                state.orb = {'high': state.orb_high, 'low': state.orb_low,
+                             'range': state.orb_high - state.orb_low}
+            if minute > config['ENTRY_CUTOFF_MINUTE']:
+                return
+
+        setup = state.orb
+        if setup['range'] <= 0:
+            state.skip = True
+            return
+
+        signal = None
+        if bar.high > setup['high'] and regime['longs_allowed']:
+            signal, entry_price = 'long', setup['high']
+        elif bar.low < setup['low'] and not regime['strong_uptrend']:
+            signal, entry_price = 'short', setup['low']
+        if signal is None:
+            return
+        state.skip = True  # one trade per symbol per day
+
+        if self.halted or self.day_trades >= config['MAX_TRADES_PER_DAY']:
+            self.halted = True
+            return
+        if abs(self.day_pnl) >= self.day_equity * config['MAX_DAILY_LOSS_PCT']:
+            self.halted = True
+            return
+
+        # ATR fallback for tight ranges
+        stop_distance = setup['range']
+        if (setup['range'] / entry_price * 100 if entry_price > 0 else 0) < 0.3:
+            stop_distance = entry_price * 0.015
+
+        if rank == 1:
+            risk_pct = config['TIER1_AGGRESSIVE_RISK'] if regime['aggressive_bull'] else config['TIER1_RISK']
+        else:
+            risk_pct = config['TIER2_RISK']
+        shares = int(self.day_equity * risk_pct / stop_distance)
+        cap = self.execution.share_cap([bar.volume])
+        if cap is not None:
+            shares = min(shares, int(cap[0]))
+        if shares <= 0:
+            return
+
+        stop_loss, take_profit = orb.trade_levels(signal == 'long', entry_price, stop_distance, config)
+        pos = {
+            'symbol': bar.symbol, 'signal': signal, 'entry': entry_price,
+            'stop': float(stop_loss), 'target': float(take_profit),
+            'stop_distance': stop_distance, 'shares': shares, 'risk_pct': risk_pct,
+            'regime': 'aggressive_bull' if regime['aggressive_bull'] else (
+                'bull' if regime['is_bullish'] else 'bear'),
+            'vix': regime['vix'], 'rank': rank, 'entry_bar': bar, 'last_bar': bar,
+        }
+        self.positions[bar.symbol] = pos
+        self.day_trades += 1
+        self._emit('entry', pos, bar.time)
+        # The breakout bar itself can stop out or hit target
+        self._check_exit(pos, bar)
+
+    def _check_exit(self, pos, bar):
+        pos['checked'] = True
+        pos['last_bar'] = bar
+        long = pos['signal'] == 'long'
+        # Check stop loss first (conservative)
+        if (bar.low <= pos['stop']) if long else (bar.high >= pos['stop']):
+            self._close(pos, pos['stop'], 'stop', bar.time)
+        elif (bar.high >= pos['target']) if long else (bar.low <= pos['target']):
+            self._close(pos, pos['target'], 'target', bar.time)
+
+    def _close(self, pos, price, reason, ts):
+        del self.positions[pos['symbol']]
+        entry_fill, exit_fill = self._fills(pos, price, reason)
+        pnl_per_share = float(orb.trade_pnl_per_share(pos['signal'] == 'long', entry_fill, exit_fill))
+        trade_pnl = pnl_per_share * pos['shares']
+        self.day_pnl += trade_pnl
+        r_multiple = pnl_per_share / pos['stop_distance'] if pos['stop_distance'] > 0 else 0
+        record = orb.TradeRecord(
+            date=self.date.strftime('%Y-%m-%d'),
+            symbol=pos['symbol'],
+            signal=pos['signal'],
+            entry=round(entry_fill, 2),
+            shares=pos['shares'],
+            pnl=round(trade_pnl, 2),
+            r_multiple=round(r_multiple, 2),
+            risk_pct=pos['risk_pct'],
+            regime=pos['regime'],
+            vix=round(pos['vix'], 1),
+            rank=pos['rank'],
+            exit_reason=reason,
+        )
+        self.results['trades'].append(record)
+        self._emit('exit', dict(record.to_dict(), exit=round(exit_fill, 2), reason=reason), ts)
+
+    def _fills(self, pos, price, reason):
+        """(entry fill, exit fill) for one trade through the execution model."""
+        entry_bar, exit_bar = pos['entry_bar'], pos['last_bar']
+        bars = {col: np.array([getattr(entry_bar, attr), getattr(exit_bar, attr)])
+                for col, attr in (('Open', 'open'), ('High', 'high'), ('Low', 'low'))}
+        exit_idx = 0 if exit_bar is entry_bar else 1
+        exit_reason = int(np.flatnonzero(orb.EXIT_REASONS == reason)[0])
+        entry_fill, exit_fill = self.execution.fills(
+            bars, [0], [exit_idx], [exit_reason], np.array([pos['signal'] == 'long']),
+            [pos['entry']], [price])
+        return float(entry_fill[0]), float(exit_fill[0])
+
+    def _emit(self, kind, payload, ts):
+        if self.on_fill is not None:
+            self.on_fill(dict(payload, event=kind, time=str(ts)))
+
+    # --- day boundaries ------------------------------------------------
+
+    def _start_day(self, day):
+        self.date = day
+        if self.regime_calendar is not None:
+            self.day_regime = self._calendar_regime(day)
+        self.picks = self._select()
+        self.day_pnl = 0
+        self.day_trades = 0
+        self.halted = False
+        self.day_equity = self.equity
+
+    def _end_day(self):
+        # EOD flatten — use last bar's close
+        for pos in list(self.positions.values()):
+            self._close(pos, pos['last_bar'].close, 'eod', None)
+
+        results = self.results
+        # Without a SPY price there is no regime; run_backtest skips such days outright
+        has_regime = (self.spy_price is not None if self.regime_calendar is None
+                      else self.day_regime is not None)
+        if has_regime:
+            results['trading_days'].append(self.date)
+            if self.picks:
+                results['total_trading_days'] += 1
+                self.equity += self.day_pnl
+                prev = self.equity - self.day_pnl
+                results['daily_returns'].append(self.day_pnl / prev * 100 if prev > 0 else 0)
+                month = self.date.strftime('%Y-%m')
+                results['monthly_pnl'][month] = results['monthly_pnl'].get(month, 0) + self.day_pnl
+                if self.day_trades == 0:
+                    results['no_trade_days'] += 1
+                elif self.day_pnl > 0:
+                    results['winning_days'] += 1
+                elif self.day_pnl < 0:
+                    results['losing_days'] += 1
+                else:
+                    results['flat_days'] += 1
+            else:
+                results['no_trade_days'] += 1
+                results['daily_returns'].append(0)
+            results['equity_curve'].append(self.equity)
+
+        for sym, state in self.states.items():
+            if sym == 'SPY' and state.bars_today:
+                self.sma50.push(state.close)
+                self.sma200.push(state.close)
+            state.end_day()
+
+    def _select(self):
+        """Same rules as build_selection_table, from the rolling daily state."""
+        config = self.config
+        members = None if self.symbol_master is None else set(self.symbol_master.members(self.date))
+        listed = (lambda sym: True) if members is None else members.__contains__
+        qualified = []
+        for sym in self.universe:
+            state = self.states.get(sym)
+            if state is None or state.n_days < SELECTOR_LOOKBACK or not listed(sym):
+                continue
+            volumes = list(state.volumes)
+            closes = list(state.closes)
+            # 30-day average volume (excluding last 5 days)
+            avg_vol_30d = sum(volumes[:30]) / 30
+            if avg_vol_30d < 800000:
+                continue
+            best_rvol = 0
+            for i in range(len(closes) - 5, len(closes)):
+                prev_close, close = closes[i - 1], closes[i]
+                if prev_close <= 0:
+                    continue
+                rvol = volumes[i] / avg_vol_30d
+                change = abs((close - prev_close) / prev_close * 100)
+                if (rvol >= config['MIN_RVOL'] and change >= config['MIN_CHANGE_PCT'] and
+                        close >= config['MIN_PRICE'] and rvol > best_rvol):
+                    best_rvol = rvol
+            if best_rvol > 0:
+                qualified.append({'symbol': sym, 'rvol': best_rvol})
+        qualified.sort(key=lambda x: x['rvol'], reverse=True)
+        picks = qualified[:8]
+        if not picks:
+            picks = [{'symbol': fb, 'rvol': 1.0, 'is_fallback': True}
+                     for fb in orb.FALLBACK_STOCKS
+                     if fb in self.states and self.states[fb].n_days > 0 and listed(fb)]
+        return picks
+
+
+# ============================================================
+# REPLAY SERVER / PAPER LOOP
+# ============================================================
+
+def bar_to_json(bar):
+    return json.dumps({'t': bar.time.isoformat(), 's': bar.symbol, 'o': bar.open,
+                       'h': bar.high, 'l': bar.low, 'c': bar.close, 'v': bar.volume})
+
+
+def bar_from_json(line):
+    d = json.loads(line)
+    return Bar(pd.Timestamp(d['t']), d['s'], d['o'], d['h'], d['l'], d['c'], d['v'])
+
+
+def serve_replay(bars_factory, host='127.0.0.1', port=8765, speed=0.0):
+    """
+    Serve a bar feed as JSON lines over TCP. Each client gets a fresh
+    replay from bars_factory(); `speed` seconds pass between timestamps.
+    """
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            last = None
+            for bar in bars_factory():
+                if speed and last is not None and bar.time != last:
+                    time.sleep(speed)
+                last = bar.time
+                try:
+                    self.wfile.write((bar_to_json(bar) + '\n').encode())
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+
+    socketserver.TCPServer.allow_reuse_address = True
+    with socketserver.ThreadingTCPServer((host, port), Handler) as server:
+        print(f"Replaying bars on {host}:{port} (Ctrl-C to stop)")
+        server.serve_forever()
+
+
+def read_feed(host, port):
+    """Bars from a replay server (or any JSON-lines bar feed)."""
+    with socket.create_connection((host, port)) as sock, sock.makefile('r') as feed:
+        for line in feed:
+            if line.strip():
+                yield bar_from_json(line)
+
+
+def print_fill(event):
+    if event['event'] == 'entry':
+        print(f"  {event['time']}  ENTER {event['signal']:<5} {event['symbol']:>6} "
+              f"{event['shares']} @ {event['entry']:.2f} (stop {event['stop']:.2f}, target {event['target']:.2f})")
+    else:
+        print(f"  {event['date']}  EXIT  {event['reason']:<6} {event['symbol']:>6} "
+              f"@ {event['exit']:.2f} → ${event['pnl']:,.2f} ({event['r_multiple']}R)")
+
+
+def print_summary(results):
+    summary = orb.summarize_backtest(results)
+    print(f"\nDays: {len(results['trading_days'])} | Trades: {summary['total_trades']} | "
+          f"Return: {summary['total_return_pct']:.1f}% | Sharpe: {summary['sharpe_ratio']:.2f} | "
+          f"Max DD: {summary['max_drawdown_pct']:.1f}%")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Event-driven ORB engine')
+    parser.add_argument('mode', choices=('backtest', 'serve', 'paper'))
+    parser.add_argument('--resolution', choices=orb.RESOLUTIONS, default='1h')
+    parser.add_argument('--offline', action='store_true',
+                        help='replay the bar cache without refreshing it first')
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--connect', default=None, metavar='HOST:PORT',
+                        help='bar feed for paper mode (default: --host/--port)')
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help='seconds between timestamps when serving (default: 0)')
+    args = parser.parse_args(argv)
+
+    symbols = sorted(set(orb.SCAN_STOCKS + ['SPY', '^VIX']))
+
+    def cached_feed():
+        return replay_cache(symbols, args.resolution, args.cache_dir)
+
+    if args.mode in ('backtest', 'serve') and not args.offline:
+        # Refresh the cache once, then stream from it
+        orb.download_data(orb.SCAN_STOCKS, interval=args.resolution, cache_dir=args.cache_dir)
+
+    if args.mode == 'serve':
+        serve_replay(cached_feed, args.host, args.port, args.speed)
+        return None
+
+    if args.mode == 'backtest':
+        engine = StreamingEngine(resolution=args.resolution)
+        return print_summary(engine.run(cached_feed()))
+
+    host, _, port = (args.connect or f"{args.host}:{args.port}").rpartition(':')
+    engine = StreamingEngine(resolution=args.resolution, on_fill=print_fill)
+    print(f"Paper trading from {host}:{port}...")
+    try:
+        for bar in read_feed(host, int(port)):
+            engine.on_bar(bar)
+    except KeyboardInterrupt:
+        pass
+    return print_summary(engine.finish())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+ORB parameter sweep — grid or random search over CONFIG keys.
+
+Market data is downloaded and precomputed once, then shared read-only with
+a pool of worker processes: on platforms with fork() the workers inherit
+the parent's MarketData store copy-on-write, elsewhere each worker loads it
+once from the local bar cache. Nothing is pickled per task except the
+parameter dict and the metrics row coming back.
+
+    python backtest_sweep.py --grid TARGET_R_MULTIPLE=2,2.5,3 --grid MIN_RVOL=1.5,2
+    python backtest_sweep.py --grid MIN_RVOL=1.2,1.5,2,2.5 --random 3 --seed 7
+"""
+
+import argparse
+import itertools
+import multiprocessing as mp
+import os
+import random
+import time
+
+import pandas as pd
+
+import backtest_export as export
+import backtest_orb as orb
+
+# MarketData shared by every task in this process
+_STORE = None
+
+
+def parse_value(text):
+    """'3' -> 3, '2.5' -> 2.5."""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_grid(specs):
+    """['KEY=v1,v2', ...] -> {'KEY': [v1, v2], ...}, checked against CONFIG."""
+    grid = {}
+    for spec in specs:
+        key, _, values = spec.partition('=')
+        key = key.strip()
+        if key not in orb.CONFIG:
+            raise ValueError(f"Unknown CONFIG key: {key}")
+        if not values:
+            raise ValueError(f"No values given for {key}")
+        grid[key] = [parse_value(v) for v in values.split(',')]
+    return grid
+
+
+def expand_grid(grid, n_random=None, seed=0):
+    """
+    Every parameter combination in the grid, or a random sample of
+    n_random of them (without replacement) when n_random is given.
+    """
+    keys = list(grid)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+    if n_random is not None and n_random < len(combos):
+        combos = random.Random(seed).sample(combos, n_random)
+    return combos
+
+
+def _init_worker(download_options):
+    global _STORE
+    if _STORE is None:
+        # Spawned worker: load from the bar cache the parent just refreshed
+        options = dict(download_options, offline=True)
+        _STORE = orb.prepare_market_data(**options)
+
+
+def _run_one(task):
+    i, params, keep_trades = task
+    started = time.perf_counter()
+    config = dict(orb.CONFIG, **params)
+    sim = orb.simulate_backtest(_STORE, config, verbose=False)
+    row = dict(params)
+    row.update(orb.summarize_backtest(sim))
+    row['elapsed_s'] = round(time.perf_counter() - started, 3)
+    # Trades travel back as compact structured arrays, not dicts
+    arrays = (export.trades_to_array(sim['trades'], i),
+              export.daily_to_array(sim, i)) if keep_trades else None
+    return i, row, arrays
+
+
+def shared_map(func, tasks, store, workers=None, download_options=None, label='tasks'):
+    """
+    Yield func(task) for every task, unordered, on a process pool whose
+    workers see `store` as this module's _STORE (see the module docstring).
+    workers=1 runs in-process.
+    """
+    global _STORE
+    _STORE = store
+    workers = workers or os.cpu_count() or 1
+    methods = mp.get_all_start_methods()
+    ctx = mp.get_context('fork' if 'fork' in methods else None)
+
+    if workers == 1:
+        results = map(func, tasks)
+        pool = None
+    else:
+        pool = ctx.Pool(workers, initializer=_init_worker,
+                        initargs=(download_options or {},))
+        results = pool.imap_unordered(func, tasks)
+    try:
+        for done, result in enumerate(results, 1):
+            if done % max(1, len(tasks) // 10) == 0 or done == len(tasks):
+                print(f"  {done}/{len(tasks)} {label} done")
+            yield result
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def run_sweep(param_sets, store, workers=None, download_options=None, export_dir=None):
+    """
+    Run simulate_backtest for each parameter set on a process pool.
+    Returns a DataFrame with one row of metrics per parameter set, in the
+    order given. With `export_dir`, every run's trades and daily equity are
+    streamed there as runs finish, tagged with the row number as `run`.
+    """
+    orb.warm_caches(store, [dict(orb.CONFIG, **params) for params in param_sets])
+    rows = [None] * len(param_sets)
+    tasks = [(i, params, export_dir is not None) for i, params in enumerate(param_sets)]
+    writer = export.ResultsWriter(export_dir) if export_dir is not None else None
+    try:
+        for i, row, arrays in shared_map(_run_one, tasks, store, workers, download_options,
+                                         label='parameter sets'):
+            rows[i] = row
+            if writer is not None:
+                writer.write_arrays(*arrays)
+    finally:
+        if writer is not None:
+            writer.close()
+    return pd.DataFrame(rows)
+
+
+def write_results(table, path):
+    """Write the sweep table as CSV, or Parquet if the path ends in .parquet."""
+    if path.endswith('.parquet'):
+        table.to_parquet(path, index=False)
+    else:
+        table.to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ORB parameter sweep')
+    parser.add_argument('--grid', action='append', default=[], metavar='KEY=V1,V2,...',
+                        help='CONFIG key and values to sweep (repeatable)')
+    parser.add_argument('--random', type=int, default=None, metavar='N',
+                        help='sample N parameter sets from the grid instead of all')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: all cores)')
+    parser.add_argument('--output', default='sweep_results.csv',
+                        help='results table (.csv or .parquet)')
+    parser.add_argument('--export', default=None, metavar='DIR',
+                        help='also stream every trade and daily equity curve to DIR')
+    parser.add_argument('--resolution', choices=orb.RESOLUTIONS, default='1h',
+                        help='bar size (default: 1h)')
+    parser.add_argument('--offline', action='store_true',
+                        help='run entirely from the local bar cache (no network)')
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        grid = parse_grid(args.grid)
+    except ValueError as e:
+        parser.error(str(e))
+    if not grid:
+        parser.error('at least one --grid KEY=V1,V2 is required')
+
+    param_sets = expand_grid(grid, args.random, args.seed)
+    print(f"Sweeping {len(param_sets)} parameter sets over {', '.join(grid)}")
+
+    download_options = {'resolution': args.resolution, 'offline': args.offline,
+                         'cache_dir': args.cache_dir}
+    store = orb.prepare_market_data(**download_options)
+    if store is None:
+        return None
+
+    started = time.perf_counter()
+    table = run_sweep(param_sets, store, args.workers, download_options, args.export)
+    print(f"Sweep finished in {time.perf_counter() - started:.1f}s")
+
+    write_results(table, args.output)
+    print(f"Results saved to {args.output}")
+    if args.export is not None:
+        print(f"Trades and daily equity for every run exported to {args.export}")
+
+    cols = list(grid) + ['total_return_pct', 'sharpe_ratio', 'max_drawdown_pct', 'total_trades']
+    print(table.sort_values('sharpe_ratio', ascending=False)[cols].head(10).to_string(index=False))
+    return table
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Synthetic OHLCV bars for benchmarks and offline runs.
+
+Generates a market of N symbols over M years of regular sessions, at
+hourly ('1h', Yahoo-style: 9:30, 10:30, ... 15:30) or minute ('1m', '5m',
+...) resolution, with analogues of the two index series the backtest
+needs:
+
+  * SPY  — daily returns with clustered volatility (AR(1) log-vol) and
+           fat tails; every stock loads on it with its own beta.
+  * ^VIX — annualized trailing SPY volatility plus noise, floored at 9,
+           with zero volume like Yahoo's index bars.
+
+Stocks add idiosyncratic Student-t returns, part of each day's move
+happening overnight as a gap, and occasional news days with a large gap
+and a volume spike — enough for the ORB selector to find RVOL/change
+candidates. Intraday prices follow a Brownian bridge to the day's close
+and volume follows the usual U-shaped profile. Output is deterministic:
+symbol i gets the same bars for a given seed whatever N is.
+
+    frames = synthetic_market(500, years=5)
+    store = backtest_orb.MarketData(frames, universe=synthetic_symbols(500))
+"""
+
+import numpy as np
+import pandas as pd
+
+import backtest_orb as orb
+
+TRADING_DAYS_PER_YEAR = 252
+MARKET_TZ = 'America/New_York'
+
+
+def synthetic_symbols(n):
+    """n stock symbols: the real SCAN_STOCKS names first, then S0001, S0002, ..."""
+    names = list(orb.SCAN_STOCKS[:n])
+    return names + [f"S{i:04d}" for i in range(1, n - len(names) + 1)]
+
+
+def session_offsets(interval='1h'):
+    """Bar start times within a regular session, as offsets from midnight."""
+    if interval == '1h':
+        return pd.to_timedelta([f"{9 + h}:30:00" for h in range(7)])
+    if interval.endswith('m'):
+        return pd.to_timedelta(np.arange(0, 390, int(interval[:-1])), unit='min') + \
+            pd.Timedelta(hours=9, minutes=30)
+    raise ValueError(f"Unsupported interval: {interval}")
+
+
+def session_index(days, interval='1h'):
+    """Bar timestamps (New York time) for regular sessions on the given days."""
+    offsets = session_offsets(interval)
+    stamps = (days.values[:, None] + offsets.values[None, :]).ravel()
+    index = pd.DatetimeIndex(stamps).tz_localize(MARKET_TZ)
+    index.name = 'Datetime'
+    return index, len(offsets)
+
+
+def market_factor(n_days, seed=0):
+    """SPY-like daily log returns with clustered volatility and fat tails."""
+    rng = np.random.default_rng([seed, 0])
+    log_vol = np.empty(n_days)
+    level, persistence = np.log(0.009), 0.97
+    log_vol[0] = level
+    shocks = rng.normal(0, 0.15, n_days)
+    for t in range(1, n_days):
+        log_vol[t] = level + persistence * (log_vol[t - 1] - level) + shocks[t]
+    vol = np.exp(log_vol)
+    returns = 0.0003 + vol * rng.standard_t(5, n_days) / np.sqrt(5 / 3)
+    return returns, vol
+
+
+def _bars(rng, daily_returns, start_price, bars_per_day, overnight_share, news, base_volume):
+    """Intraday OHLCV arrays for one symbol from its daily log returns."""
+    n_days = len(daily_returns)
+    overnight = daily_returns * overnight_share + np.where(news, rng.normal(0, 0.06, n_days), 0)
+    intraday = daily_returns - daily_returns * overnight_share
+
+    # Brownian bridge from the open to each day's close
+    steps = rng.normal(0, 1, (n_days, bars_per_day))
+    path = np.cumsum(steps, axis=1)
+    path -= np.linspace(1 / bars_per_day, 1, bars_per_day) * path[:, -1:]
+    bar_vol = np.abs(intraday).mean() / np.sqrt(bars_per_day) + 1e-4
+    log_close = path * bar_vol + np.linspace(1 / bars_per_day, 1, bars_per_day) * intraday[:, None]
+
+    day_open = np.log(start_price) + np.cumsum(overnight + np.r_[0, intraday[:-1]])
+    close = np.exp(day_open[:, None] + log_close)
+    open_ = np.concatenate([np.exp(day_open)[:, None], close[:, :-1]], axis=1)
+    wick = np.abs(rng.normal(0, bar_vol * 0.6, (2, n_days, bars_per_day)))
+    high = np.maximum(open_, close) * np.exp(wick[0])
+    low = np.minimum(open_, close) * np.exp(-wick[1])
+
+    # U-shaped intraday volume, heavier on big-move and news days
+    x = (np.arange(bars_per_day) + 0.5) / bars_per_day
+    profile = 1 + 3 * (2 * x - 1) ** 2
+    profile /= profile.sum()
+    day_volume = base_volume * rng.lognormal(0, 0.25, n_days) * \
+        (1 + 20 * np.abs(daily_returns)) * np.where(news, rng.uniform(3, 6, n_days), 1)
+    volume = np.round(day_volume[:, None] * profile * rng.lognormal(0, 0.2, (n_days, bars_per_day)))
+    return [a.ravel() for a in (open_, high, low, close, volume)]
+
+
+def _frame(index, open_, high, low, close, volume):
+    return pd.DataFrame({
+        'Open': open_, 'High': high, 'Low': low, 'Close': close,
+        'Volume': volume.astype(np.int64), 'Dividends': 0.0, 'Stock Splits': 0.0,
+    }, index=index)
+
+
+def synthetic_market(n_symbols, years=1.0, interval='1h', end=None, seed=0, symbols=None):
+    """
+    {symbol: bars} for `n_symbols` stocks plus SPY and ^VIX, ending on the
+    last business day before `end` (default: today). Frames look like
+    yfinance's Ticker.history output.
+    """
+    symbols = synthetic_symbols(n_symbols) if symbols is None else list(symbols)
+    end = pd.Timestamp.now().normalize() if end is None else pd.Timestamp(end).normalize()
+    n_days = int(round(TRADING_DAYS_PER_YEAR * years))
+    days = pd.bdate_range(end=end - pd.Timedelta(days=1), periods=n_days)
+    index, bars_per_day = session_index(days, interval)
+
+    spy_returns, spy_vol = market_factor(n_days, seed)
+    rng = np.random.default_rng([seed, 1])
+    frames = {'SPY': _frame(index, *_bars(rng, spy_returns, 450.0, bars_per_day, 0.3,
+                                         np.zeros(n_days, bool), 6e7))}
+
+    # ^VIX: trailing realized vol of the market, annualized, plus noise
+    realized = pd.Series(spy_returns).rolling(20, min_periods=1).std().fillna(0.011).to_numpy()
+    vix = np.maximum(9, 100 * np.sqrt(TRADING_DAYS_PER_YEAR) * (0.6 * realized + 0.4 * spy_vol)
+                     + rng.normal(0, 1.0, n_days))
+    vix_bars = np.repeat(vix, bars_per_day) * np.exp(rng.normal(0, 0.01, len(index)))
+    frames['^VIX'] = _frame(index, vix_bars, vix_bars * 1.01, vix_bars * 0.99, vix_bars,
+                            np.zeros(len(index)))
+
+    for i, sym in enumerate(symbols, start=1):
+        rng = np.random.default_rng([seed, 2, i])
+        beta = rng.uniform(0.6, 2.2)
+        idio = rng.uniform(0.012, 0.045) * rng.standard_t(4, n_days) / np.sqrt(2)
+        news = rng.random(n_days) < 0.03
+        returns = beta * spy_returns + idio
+        frames[sym] = _frame(index, *_bars(rng, returns, rng.uniform(6, 500), bars_per_day,
+                                           rng.uniform(0.2, 0.5), news,
+                                           rng.lognormal(np.log(5e6), 1.0)))
+    return frames
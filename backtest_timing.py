@@ -0,0 +1,169 @@
+"""
+Timing instrumentation for backtest runs.
+
+Code marks phases and bumps counters on the module-level TIMINGS:
+
+    with timing.phase('download'):
+        ...
+    timing.count('trades_simulated', n)
+
+or decorate a function with @timing.timed('simulation').
+
+Phases nest: a 'regime' phase entered inside 'simulation' is recorded as
+'simulation/regime', so every entry is inclusive wall time for that path
+and nothing is double-counted at one level. The nesting is tracked per
+thread. report() returns the totals as a plain dict for a JSON timing
+file; comparing those files between runs shows where a regression came
+from.
+
+To time one run on its own while others run on other threads (e.g. the
+service's workers), record it in a collect() block:
+
+    with timing.collect() as timings:
+        ...
+    timings.report()
+
+Inside the block the calling thread's phases and counters go to a fresh
+Timings; on exit they are added to the enclosing block's (or TIMINGS),
+so TIMINGS still holds the process-wide totals.
+
+profiled() wraps a block in cProfile and writes the stats file for
+`python -m pstats` or snakeviz.
+"""
+
+import cProfile
+import functools
+import io
+import json
+import pstats
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class Timings:
+    """Accumulated phase wall times (seconds) and event counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.phases = {}
+        self.counters = Counter()
+        self._local = threading.local()
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(name)
+        key = '/'.join(stack)
+        with self._lock:
+            self.phases.setdefault(key, 0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[key] = self.phases.get(key, 0.0) + time.perf_counter() - started
+            stack.pop()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def report(self, **extra):
+        """Phase times, counters and total wall time since reset(), plus `extra` fields."""
+        with self._lock:
+            return dict(extra, **{
+                'total_s': round(time.perf_counter() - self._started, 4),
+                'phases': {key: round(seconds, 4) for key, seconds in self.phases.items()},
+                'counters': dict(self.counters),
+            })
+
+    def merge(self, other):
+        """Add another Timings' phase times and counters to these."""
+        with other._lock:
+            phases = dict(other.phases)
+            counters = Counter(other.counters)
+        with self._lock:
+            for key, seconds in phases.items():
+                self.phases[key] = self.phases.get(key, 0.0) + seconds
+            self.counters.update(counters)
+
+    def write(self, path, **extra):
+        with open(path, 'w') as f:
+            json.dump(self.report(**extra), f, indent=2)
+
+    def print_summary(self):
+        report = self.report()
+        print(f"\n⏱️  TIMING ({report['total_s']:.2f}s total)")
+        for key, seconds in report['phases'].items():
+            depth = key.count('/')
+            print(f"  {'  ' * depth}{key.rsplit('/', 1)[-1]:<{20 - 2 * depth}} {seconds:>9.3f}s")
+        for name, value in report['counters'].items():
+            print(f"  {name:<20} {value:>10,}")
+
+
+TIMINGS = Timings()
+
+# Per-thread stack of the collect() blocks being recorded
+_collecting = threading.local()
+
+
+def current():
+    """The Timings this thread records into: its innermost collect() block's, else TIMINGS."""
+    stack = getattr(_collecting, 'stack', None)
+    return stack[-1] if stack else TIMINGS
+
+
+@contextmanager
+def collect():
+    """Record this thread's phases and counters in a fresh Timings (see the module docstring)."""
+    timings = Timings()
+    stack = _collecting.__dict__.setdefault('stack', [])
+    stack.append(timings)
+    try:
+        yield timings
+    finally:
+        stack.pop()
+        current().merge(timings)
+
+
+def phase(name):
+    """Time a block as phase `name` on the current Timings."""
+    return current().phase(name)
+
+
+def count(name, n=1):
+    """Add n to counter `name` on the current Timings."""
+    current().count(name, n)
+
+
+def timed(name):
+    """Decorator: time every call of the function as phase `name`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with current().phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def profiled(path, top=20):
+    """Run the block under cProfile, save the stats to `path` and print the top entries."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+        print(out.getvalue())
+        print(f"Profile saved to {path} (view with: python -m pstats {path})")
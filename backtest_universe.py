@@ -0,0 +1,140 @@
+"""
+Point-in-time universe: which symbols were tradable on which dates.
+
+SCAN_STOCKS is a list of today's names, so a multi-year backtest over it
+only ever picks companies that survived. A SymbolMaster holds dated
+membership instead — one row per (symbol, interval) with the first and
+last day the symbol was in the universe (its listing / index-add date
+and its delisting / removal date; an empty end means still listed). A
+symbol that left and came back has several rows.
+
+Snapshots are plain tables, CSV or Parquet:
+
+    symbol,start,end
+    AAPL,2000-01-03,
+    LEH,2000-01-03,2008-09-17
+    ...
+
+Lookups go through an interval index over the rows: intervals sorted by
+start, with a running maximum of their ends, so members(date) is a
+binary search plus a scan of the intervals that could still be open.
+membership(dates, symbols) builds the whole (date × symbol) mask in one
+pass over the intervals for the selector.
+
+    master = load_symbol_master('universe.csv')
+    store = backtest_orb.prepare_market_data('1h', symbol_master=master)
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ('symbol', 'start', 'end')
+
+# End date stored for symbols that are still listed
+OPEN_END = np.datetime64('9999-12-31', 'D')
+
+
+def _days(values):
+    """Dates / strings / timestamps as datetime64[D] (NaT stays NaT)."""
+    return pd.to_datetime(pd.Series(values), errors='raise').to_numpy().astype('datetime64[D]')
+
+
+class SymbolMaster:
+    """
+    Dated universe membership. `intervals` is a frame with columns symbol,
+    start and end (inclusive calendar days; end NaT/empty = still listed).
+    """
+
+    def __init__(self, intervals):
+        missing = [col for col in COLUMNS if col not in intervals.columns]
+        if missing:
+            raise ValueError(f"Symbol master is missing columns: {missing}")
+        start = _days(intervals['start'])
+        end = _days(intervals['end'])
+        end = np.where(np.isnat(end), OPEN_END, end)
+        if np.isnat(start).any():
+            raise ValueError("Every symbol master row needs a start date")
+        if (end < start).any():
+            raise ValueError("Symbol master has rows ending before they start")
+
+        order = np.lexsort((end, start))
+        self.symbol = intervals['symbol'].astype(str).to_numpy()[order]
+        self.start = start[order]
+        self.end = end[order]
+        # Interval index: intervals i < k with max_end[k-1] < date are all closed
+        self.max_end = np.maximum.accumulate(self.end) if len(self.end) else self.end
+        self.symbols = list(dict.fromkeys(self.symbol))
+        self._listed = set(self.symbols)
+
+    def __len__(self):
+        return len(self.symbol)
+
+    def __contains__(self, sym):
+        return sym in self._listed
+
+    @classmethod
+    def from_symbols(cls, symbols, start='1900-01-01'):
+        """A master where every symbol is listed throughout (today's behaviour)."""
+        return cls(pd.DataFrame({'symbol': list(symbols), 'start': start, 'end': None}))
+
+    def to_frame(self):
+        end = np.where(self.end == OPEN_END, np.datetime64('NaT'), self.end)
+        return pd.DataFrame({'symbol': self.symbol, 'start': self.start.astype('datetime64[ns]'),
+                             'end': end.astype('datetime64[ns]')})
+
+    def save(self, path):
+        """Write the master as CSV or Parquet (by file extension)."""
+        frame = self.to_frame()
+        if path.endswith('.parquet'):
+            frame.to_parquet(path, index=False)
+        else:
+            frame.to_csv(path, index=False, date_format='%Y-%m-%d')
+
+    def members(self, date):
+        """Symbols in the universe on `date`, in master order."""
+        key = _days([date])[0]
+        # Only intervals starting on or before date can contain it, and
+        # none before the first whose running max end reaches date
+        hi = int(np.searchsorted(self.start, key, side='right'))
+        lo = int(np.searchsorted(self.max_end[:hi], key, side='left'))
+        live = self.end[lo:hi] >= key
+        return list(dict.fromkeys(self.symbol[lo:hi][live]))
+
+    def is_member(self, sym, date):
+        return sym in self.members(date)
+
+    def membership(self, dates, symbols):
+        """
+        Boolean (len(dates) × len(symbols)) mask: symbol s was in the
+        universe on date d. Each interval marks its run of (sorted) date
+        rows through a difference array, so the cost is one searchsorted
+        per interval plus one cumulative sum over the mask.
+        """
+        days = _days(dates)
+        order = np.argsort(days, kind='stable')
+        days = days[order]
+        column = {sym: i for i, sym in enumerate(symbols)}
+        cols = np.array([column.get(sym, -1) for sym in self.symbol], dtype=np.int64)
+        known = cols >= 0
+        first = np.searchsorted(days, self.start[known], side='left')
+        stop = np.searchsorted(days, self.end[known], side='right')
+
+        marks = np.zeros((len(days) + 1, len(symbols)), dtype=np.int32)
+        np.add.at(marks, (first, cols[known]), 1)
+        np.add.at(marks, (stop, cols[known]), -1)
+        mask = np.empty((len(days), len(symbols)), dtype=bool)
+        mask[order] = np.cumsum(marks[:-1], axis=0) > 0
+        return mask
+
+
+def load_symbol_master(path):
+    """Load a SymbolMaster snapshot from a .csv or .parquet file."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No symbol master at {path}")
+    if path.endswith('.parquet'):
+        frame = pd.read_parquet(path)
+    else:
+        frame = pd.read_csv(path, dtype={'symbol': str})
+    return SymbolMaster(frame)
@@ -0,0 +1,512 @@
+"""
+Vectorized ORB engine: the simulate_backtest day loop over flat arrays.
+
+Everything that doesn't depend on account equity is computed for all
+(day, rank) candidates at once:
+
+  1. day regimes (SPY vs its SMAs, VIX) for every trading day
+  2. each candidate's day of bars gathered into a (candidates × bars)
+     matrix, one fancy-index per symbol
+  3. opening range, gap cool-off, first breakout bar, ATR fallback, tier,
+     exit (the simulate_trades kernel) and execution-cost fills
+     (backtest_costs) as array expressions
+
+Steps 2-3 are independent per symbol, so with workers they run split
+by symbol over a process pool and are merged back into the serial order.
+What remains sequential — share sizing from start-of-day equity and the
+volume cap, the MAX_TRADES_PER_DAY cap, the daily loss stop and
+compounding — is a scan over at most five precomputed candidates per day. Arithmetic follows
+the reference loop operation for operation, so trades, equity and every
+count match simulate_backtest exactly.
+
+    sim = simulate_vectorized(store)          # same result as simulate_backtest(store)
+"""
+
+import multiprocessing as mp
+
+import numpy as np
+import pandas as pd
+
+import backtest_orb as orb
+from backtest_costs import ExecutionModel
+
+# Picks per day the ORB strategy looks at
+MAX_RANK = 5
+
+BAR_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+# Symbol shards per worker in parallel candidate generation (evens out
+# symbols with many more picks than others)
+SHARDS_PER_WORKER = 4
+
+# (store, days, selections, regime, config, execution) for forked workers
+_SHARED = None
+
+
+def day_regimes(store, days):
+    """
+    Regime-calendar row of each day (-1 before SPY's first bar) and the
+    SPY close, SMA200, SMA50 and VIX as of it (arrays). SPY close is NaN
+    and the SMAs 0 where SPY has no bar yet.
+    """
+    calendar = store.regimes()
+    rows = calendar.rows(days)
+    known = rows >= 0
+    row = np.maximum(rows, 0)
+    spy_price = np.where(known, calendar.spy_close[row], np.nan)
+    sma200 = np.where(known, calendar.sma200[row], 0)
+    sma50 = np.where(known, calendar.sma50[row], 0)
+    return rows, spy_price, sma200, sma50, calendar.vix[row]
+
+
+def gather_candidates(store, days, selections, only=None):
+    """
+    Every (day, rank, symbol) pick with a tradable day, as parallel arrays:
+    day index, rank, symbol, bar start/end in store.arrays and the previous
+    daily close. Picks the loop would skip before looking at bars (symbol
+    not loaded, under 2 bars, no prior daily bar) are left out. With
+    `only` (a set of symbols) just their picks are gathered.
+    """
+    day_idx, ranks, symbols, starts, ends = [], [], [], [], []
+    for i, date in enumerate(days):
+        for rank, info in enumerate(selections.get(date, [])[:MAX_RANK], 1):
+            sym = info['symbol']
+            if sym not in store or (only is not None and sym not in only):
+                continue
+            start, end = store.day_slices[sym].get(date, (0, 0))
+            if end - start < 2:
+                continue
+            day_idx.append(i)
+            ranks.append(rank)
+            symbols.append(sym)
+            starts.append(start)
+            ends.append(end)
+
+    cand = {
+        'day': np.array(day_idx, dtype=np.int64),
+        'rank': np.array(ranks, dtype=np.int64),
+        'symbol': np.array(symbols, dtype=object),
+        'start': np.array(starts, dtype=np.int64),
+        'end': np.array(ends, dtype=np.int64),
+    }
+    prev_close = np.full(len(symbols), np.nan)
+    keys = np.array([np.datetime64(pd.Timestamp(days[i]).date(), 'D') for i in day_idx],
+                    dtype='datetime64[D]')
+    for sym in set(symbols):
+        rows = np.flatnonzero(cand['symbol'] == sym)
+        n_prior = np.searchsorted(store.daily_dates[sym], keys[rows], side='left')
+        closes = store.daily[sym]['Close'].to_numpy(dtype=float)
+        prev_close[rows] = np.where(n_prior > 0, closes[np.maximum(n_prior - 1, 0)], np.nan)
+    cand['prev_close'] = prev_close
+    return cand
+
+
+def day_matrices(store, cand):
+    """
+    Each candidate's day of bars as (candidates × widest day) matrices of
+    OHLCV and minute-of-day, plus the valid-bar mask.
+    """
+    lengths = cand['end'] - cand['start']
+    width = int(lengths.max()) if len(lengths) else 1
+    offsets = np.arange(width)
+    valid = offsets < lengths[:, None]
+    mats = {col: np.zeros((len(lengths), width)) for col in BAR_COLUMNS}
+    mats['minute'] = np.zeros((len(lengths), width), dtype=np.int64)
+    for sym in set(cand['symbol']):
+        rows = np.flatnonzero(cand['symbol'] == sym)
+        idx = np.minimum(cand['start'][rows, None] + offsets, cand['end'][rows, None] - 1)
+        bars = store.arrays[sym]
+        for col in BAR_COLUMNS:
+            mats[col][rows] = bars[col][idx]
+        mats['minute'][rows] = store.minute_of_day[sym][idx]
+    return mats, valid, lengths
+
+
+def opening_ranges(store, mats, valid, lengths, config):
+    """
+    ORB high/low/range and the breakout window [lo, hi) in columns for
+    every candidate, as opening_range computes them; ok is False where
+    opening_range would return None.
+    """
+    n, width = valid.shape
+    cols = np.arange(width)
+    if store.resolution == '1h':
+        # estimate_orb_range's heuristic on the first bar; only bar 2 can break out
+        first_high, first_low = mats['High'][:, 0], mats['Low'][:, 0]
+        orb_range = (first_high - first_low) * 0.45
+        mid = (first_high + first_low) / 2
+        orb_high = mid + orb_range / 2
+        orb_low = mid - orb_range / 2
+        return orb_high, orb_low, orb_range, np.full(n, 1), np.full(n, 2), np.ones(n, bool)
+
+    minutes = mats['minute']
+    orb_end = ((minutes < minutes[:, :1] + config['ORB_MINUTES']) & valid).sum(axis=1)
+    cutoff = ((minutes <= config['ENTRY_CUTOFF_MINUTE']) & valid).sum(axis=1)
+    in_orb = cols < orb_end[:, None]
+    orb_high = np.where(in_orb, mats['High'], -np.inf).max(axis=1, initial=-np.inf)
+    orb_low = np.where(in_orb, mats['Low'], np.inf).min(axis=1, initial=np.inf)
+    ok = orb_end < lengths
+    return orb_high, orb_low, orb_high - orb_low, orb_end, np.maximum(orb_end, cutoff), ok
+
+
+def regime_stage(store, days, config):
+    """Regime flags for every day, from the store's regime calendar."""
+    rows, spy_price, _, _, vix = day_regimes(store, days)
+    regime = {'spy_price': spy_price, 'vix': vix}
+    for name, values in store.regimes().flags(config).items():
+        regime[name] = (rows >= 0) & values[np.maximum(rows, 0)]
+    return regime
+
+
+def range_stage(store, days, selections, config, only=None):
+    """
+    Every candidate's opening range and breakout window (in day-matrix
+    columns); 'ok' is False where the range is empty or the gap from the
+    previous close exceeds the cool-off.
+    """
+    cand = gather_candidates(store, days, selections, only)
+    mats, valid, lengths = day_matrices(store, cand)
+    orb_high, orb_low, orb_range, lo, hi, ok = opening_ranges(store, mats, valid, lengths, config)
+    prev_close = cand['prev_close']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gap_pct = np.where(prev_close > 0,
+                           np.abs((mats['Open'][:, 0] - prev_close) / prev_close * 100), 0)
+    ok &= (orb_range > 0) & ~np.isnan(prev_close) & (gap_pct <= config['PREMARKET_COOLOFF_PCT'])
+    cand.update(orb_high=orb_high, orb_low=orb_low, orb_range=orb_range,
+                window_lo=lo, window_hi=hi, ok=ok)
+    return cand
+
+
+def signal_stage(store, cand, regime, config):
+    """
+    First breakout bar (long wins a two-way bar), entry, ATR-fallback stop
+    distance and tiered risk for the candidates that trade. 'row' indexes
+    the candidate arrays; 'first' is the entry column in the day matrix.
+    """
+    mats, valid, _ = day_matrices(store, cand)
+    day = cand['day']
+    cols = np.arange(valid.shape[1])
+    in_window = (cols >= cand['window_lo'][:, None]) & (cols < cand['window_hi'][:, None]) & valid
+    long_hits = (in_window & (mats['High'] > cand['orb_high'][:, None]) &
+                 regime['longs_allowed'][day][:, None])
+    short_hits = (in_window & (mats['Low'] < cand['orb_low'][:, None]) &
+                  ~regime['strong_uptrend'][day][:, None])
+    hits = long_hits | short_hits
+    ok = cand['ok'] & hits.any(axis=1)
+    first = hits.argmax(axis=1)
+    is_long = long_hits[np.arange(len(first)), first]
+    entry = np.where(is_long, cand['orb_high'], cand['orb_low'])
+
+    # ATR fallback for tight ranges, tiered risk
+    orb_range = cand['orb_range']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        orb_range_pct = np.where(entry > 0, orb_range / entry * 100, 0)
+    stop_distance = np.where(orb_range_pct < 0.3, entry * 0.015, orb_range)
+    tier1 = np.where(regime['aggressive_bull'][day],
+                     config['TIER1_AGGRESSIVE_RISK'], config['TIER1_RISK'])
+    risk_pct = np.where(cand['rank'] == 1, tier1, config['TIER2_RISK'])
+    ok &= stop_distance > 0
+
+    rows = np.flatnonzero(ok)
+    return {
+        'row': rows,
+        'first': first[rows],
+        'is_long': is_long[rows],
+        'entry': entry[rows],
+        'stop_distance': stop_distance[rows],
+        'risk_pct': risk_pct[rows],
+    }
+
+
+def outcome_stage(store, cand, signals, config, execution):
+    """
+    Exit and fills for every signal at once, on the flattened day matrices
+    of the signalled candidates: entry fill, P&L per share, exit reason and
+    the volume-participation share cap (None if uncapped).
+    """
+    rows = signals['row']
+    traded = {key: cand[key][rows] for key in ('symbol', 'start', 'end')}
+    mats, valid, lengths = day_matrices(store, traded)
+    width = valid.shape[1]
+    flat = {col: mats[col].ravel() for col in BAR_COLUMNS}
+    base = np.arange(len(rows)) * width
+    entry_idx = base + signals['first']
+    is_long, entry = signals['is_long'], signals['entry']
+    stop, target = orb.trade_levels(is_long, entry, signals['stop_distance'], config)
+    exit_idx, exit_price, exit_reason = orb.simulate_trades(
+        flat['High'], flat['Low'], flat['Close'], entry_idx, base + lengths,
+        is_long, entry, stop, target)
+    entry_fill, exit_fill = execution.fills(
+        flat, entry_idx, exit_idx, exit_reason, is_long, entry, exit_price)
+    return {
+        'entry_fill': entry_fill,
+        'pnl_per_share': orb.trade_pnl_per_share(is_long, entry_fill, exit_fill),
+        'exit_reason': exit_reason,
+        'share_cap': execution.share_cap(flat['Volume'][entry_idx]),
+    }
+
+
+def candidate_shard(store, days, selections, regime, config, execution, only=None):
+    """ORB ranges, signals and outcomes for the picks of the symbols in `only` (all if None)."""
+    cand = range_stage(store, days, selections, config, only)
+    signals = signal_stage(store, cand, regime, config)
+    return cand, signals, outcome_stage(store, cand, signals, config, execution)
+
+
+def symbol_shards(days, selections, n_shards):
+    """
+    The picked symbols split into at most n_shards sets with similar pick
+    counts (largest first onto the lightest shard; ties by name).
+    """
+    counts = {}
+    for date in days:
+        for info in selections.get(date, [])[:MAX_RANK]:
+            counts[info['symbol']] = counts.get(info['symbol'], 0) + 1
+    shards = [set() for _ in range(max(1, min(n_shards, len(counts))))]
+    loads = [0] * len(shards)
+    for sym in sorted(counts, key=lambda s: (-counts[s], s)):
+        lightest = loads.index(min(loads))
+        shards[lightest].add(sym)
+        loads[lightest] += counts[sym]
+    return shards
+
+
+def merge_shards(shards):
+    """
+    One (cand, signals, outcomes) from candidate_shard results, in the
+    serial order: candidates by (day, rank), signals by candidate row.
+    Every value is computed row by row, so the merge is exactly the
+    single-pass result however the symbols were split.
+    """
+    cands, signal_parts, outcome_parts = zip(*shards)
+    cand = {key: np.concatenate([part[key] for part in cands]) for key in cands[0]}
+    order = np.lexsort((cand['rank'], cand['day']))
+    position = np.empty(len(order), dtype=np.int64)
+    position[order] = np.arange(len(order))
+
+    offsets = np.cumsum([0] + [len(part['day']) for part in cands[:-1]])
+    rows = position[np.concatenate([part['row'] + offset
+                                    for part, offset in zip(signal_parts, offsets)])]
+    by_row = np.argsort(rows, kind='stable')
+    signals = {key: np.concatenate([part[key] for part in signal_parts])[by_row]
+               for key in signal_parts[0]}
+    signals['row'] = rows[by_row]
+    outcomes = {}
+    for key in outcome_parts[0]:
+        values = [part[key] for part in outcome_parts]
+        outcomes[key] = None if values[0] is None else np.concatenate(values)[by_row]
+    return {key: values[order] for key, values in cand.items()}, signals, outcomes
+
+
+def _generate_shard(only):
+    return candidate_shard(*_SHARED, only=only)
+
+
+def generate_candidates(store, days, selections, regime, config, execution, workers=None):
+    """
+    ORB ranges, gap filter, signals and per-share outcomes for every
+    (day, symbol) pick: in-process, or split by symbol over `workers`
+    forked processes that share the store copy-on-write. The merged result
+    is identical to the in-process one. Without fork() it runs in-process.
+    """
+    global _SHARED
+    if not workers or workers == 1 or 'fork' not in mp.get_all_start_methods():
+        return candidate_shard(store, days, selections, regime, config, execution)
+
+    shards = symbol_shards(days, selections, workers * SHARDS_PER_WORKER)
+    _SHARED = (store, days, selections, regime, config, execution)
+    try:
+        with mp.get_context('fork').Pool(workers) as pool:
+            results = pool.map(_generate_shard, shards)
+    finally:
+        _SHARED = None
+    return merge_shards(results)
+
+
+def _stage(stages, name, config, compute, inputs=(), extra=()):
+    """compute() through the stage cache when there is one: (value, key)."""
+    if stages is None:
+        return compute(), None
+    return stages.get(name, config, compute, inputs, extra)
+
+
+def simulate_vectorized(store, config=None, days=None, execution=None, stages=None,
+                        progress=None, workers=None):
+    """
+    simulate_backtest(store, config, verbose=False, days=days, execution=execution)
+    computed with array operations; returns the identical results dict.
+
+    With a backtest_stages.StageCache as `stages`, selection, regime, ORB
+    ranges, signals and outcomes are loaded from disk when an earlier run
+    had the same inputs and CONFIG subset, so only the stages downstream
+    of a changed parameter are recomputed.
+
+    With `workers` > 1 the candidate phase (ORB ranges, signals and
+    outcomes) runs split by symbol over that many processes (see
+    generate_candidates); only the account scan is sequential. Results
+    are the same for any number of workers.
+
+    `progress(stage, fraction)`, if given, is called as each stage
+    finishes and every 50 days of the account scan.
+    """
+    def report(stage, fraction=1.0):
+        if progress is not None:
+            progress(stage, fraction)
+
+    config = orb.CONFIG if config is None else config
+    execution = ExecutionModel.from_config(config) if execution is None else execution
+    trading_days = store.trading_days if days is None else list(days)
+    if stages is None:
+        data_key = None
+        selections, selection_key = orb.store_selections(store, config), None
+    else:
+        data_key = stages.store_key(store)
+        selections, selection_key = stages.selections(store, config)
+    report('selection')
+
+    regime, regime_key = _stage(stages, 'regime', config,
+                                lambda: regime_stage(store, trading_days, config),
+                                inputs=(data_key,),
+                                extra=(trading_days, store.regimes().fingerprint()))
+    report('regime')
+
+    if workers and workers > 1:
+        # One parallel pass yields all three stages; the stage cache still
+        # skips it when every stage is already on disk
+        generated = []
+
+        def generated_stage(i):
+            if not generated:
+                generated.extend(generate_candidates(
+                    store, trading_days, selections, regime, config, execution, workers))
+            return generated[i]
+
+        compute_ranges, compute_signals, compute_outcomes = (
+            lambda: generated_stage(0), lambda: generated_stage(1), lambda: generated_stage(2))
+    else:
+        def compute_ranges():
+            return range_stage(store, trading_days, selections, config)
+
+        def compute_signals():
+            return signal_stage(store, cand, regime, config)
+
+        def compute_outcomes():
+            return outcome_stage(store, cand, signals, config, execution)
+
+    cand, range_key = _stage(stages, 'orb_ranges', config, compute_ranges,
+                             inputs=(selection_key,), extra=trading_days)
+    report('orb_ranges')
+    signals, signal_key = _stage(stages, 'signals', config, compute_signals,
+                                 inputs=(range_key, regime_key))
+    report('signals')
+    outcomes, _ = _stage(stages, 'outcomes', config, compute_outcomes,
+                         inputs=(signal_key,), extra=(type(execution).__name__, vars(execution)))
+    report('outcomes')
+    sim = account_scan(trading_days, selections, regime, cand, signals, outcomes, config,
+                       lambda fraction: report('account', fraction))
+    report('account')
+    return sim
+
+
+def account_scan(trading_days, selections, regime, cand, signals, outcomes, config,
+                 progress=None):
+    """
+    The sequential part: share sizing from equity, the volume cap,
+    MAX_TRADES_PER_DAY, the daily loss stop and compounding, over the
+    precomputed signals in rank order. Returns simulate_backtest's dict.
+    `progress(fraction)` is called every 50 days.
+    """
+    spy_price, vix = regime['spy_price'], regime['vix']
+    is_bullish, aggressive_bull = regime['is_bullish'], regime['aggressive_bull']
+    day = cand['day']
+    sel = signals['row']
+    is_long, stop_distance, risk_pct = signals['is_long'], signals['stop_distance'], signals['risk_pct']
+    entry_fill, pnl_per_share = outcomes['entry_fill'], outcomes['pnl_per_share']
+    share_cap, exit_reason = outcomes['share_cap'], outcomes['exit_reason']
+
+    by_day = {}
+    for k, c in enumerate(sel):
+        by_day.setdefault(day[c], []).append((k, c))
+
+    equity = config['STARTING_EQUITY']
+    equity_curve = [equity]
+    daily_returns = []
+    all_trades = []
+    monthly_pnl = {}
+    winning_days = losing_days = flat_days = no_trade_days = total_trading_days = 0
+
+    for i, date in enumerate(trading_days):
+        if progress is not None and i % 50 == 0:
+            progress(i / len(trading_days))
+        if np.isnan(spy_price[i]):
+            continue
+        if len(selections.get(date, [])) == 0:
+            no_trade_days += 1
+            equity_curve.append(equity)
+            daily_returns.append(0)
+            continue
+
+        total_trading_days += 1
+        day_pnl = 0
+        day_trades = 0
+        daily_loss_limit = equity * config['MAX_DAILY_LOSS_PCT']
+        date_dt = pd.Timestamp(date)
+        day_str = date_dt.strftime('%Y-%m-%d')
+        regime_label = 'aggressive_bull' if aggressive_bull[i] else ('bull' if is_bullish[i] else 'bear')
+
+        for k, c in by_day.get(i, []):
+            if day_trades >= config['MAX_TRADES_PER_DAY'] or abs(day_pnl) >= daily_loss_limit:
+                break
+            shares = int(equity * risk_pct[k] / stop_distance[k])
+            if share_cap is not None:
+                shares = min(shares, int(share_cap[k]))
+            if shares <= 0:
+                continue
+            trade_pnl = pnl_per_share[k] * shares
+            day_pnl += trade_pnl
+            day_trades += 1
+            all_trades.append(orb.TradeRecord(
+                date=day_str,
+                symbol=cand['symbol'][c],
+                signal='long' if is_long[k] else 'short',
+                entry=round(entry_fill[k], 2),
+                shares=shares,
+                pnl=round(trade_pnl, 2),
+                r_multiple=round(pnl_per_share[k] / stop_distance[k], 2),
+                risk_pct=float(risk_pct[k]),
+                regime=regime_label,
+                vix=round(vix[i], 1),
+                rank=int(cand['rank'][c]),
+                exit_reason=str(orb.EXIT_REASONS[exit_reason[k]]),
+            ))
+
+        equity += day_pnl
+        equity_curve.append(equity)
+        daily_returns.append(day_pnl / (equity - day_pnl) * 100 if equity - day_pnl > 0 else 0)
+        month_key = date_dt.strftime('%Y-%m')
+        monthly_pnl[month_key] = monthly_pnl.get(month_key, 0) + day_pnl
+
+        if day_trades == 0:
+            no_trade_days += 1
+        elif day_pnl > 0:
+            winning_days += 1
+        elif day_pnl < 0:
+            losing_days += 1
+        else:
+            flat_days += 1
+
+    return {
+        'config': dict(config),
+        'strategies': [orb.ORBStrategy.name],
+        'trading_days': trading_days,
+        'equity': equity,
+        'equity_curve': equity_curve,
+        'daily_returns': daily_returns,
+        'trades': all_trades,
+        'monthly_pnl': monthly_pnl,
+        'winning_days': winning_days,
+        'losing_days': losing_days,
+        'flat_days': flat_days,
+        'no_trade_days': no_trade_days,
+        'total_trading_days': total_trading_days,
+    }
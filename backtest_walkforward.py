@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+ORB walk-forward backtest with out-of-sample reporting.
+
+The trading calendar is cut into rolling windows: each one optimizes the
+swept CONFIG keys on `train_days` days, then trades the following
+`test_days` days with the winning parameters. Only the test windows count:
+their daily returns are compounded into one out-of-sample equity curve.
+
+Windows run in parallel on the sweep's shared-store process pool. Selector
+tables and SPY SMAs are computed once for every parameter set before the
+pool starts, so overlapping windows reuse them instead of recomputing.
+
+    python backtest_walkforward.py --grid TARGET_R_MULTIPLE=2,3 --grid MIN_RVOL=1.5,2
+    python backtest_walkforward.py --grid MIN_RVOL=1.5,2 --train-days 90 --test-days 21
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+import backtest_orb as orb
+import backtest_sweep as sweep
+
+
+def make_windows(trading_days, train_days, test_days, step=None):
+    """
+    [(train_days_list, test_days_list), ...] rolling forward by `step` days.
+    `step` may leave gaps between test windows but not overlap them (a
+    shared day would be compounded into the stitched curve twice).
+    """
+    step = step or test_days
+    if step < test_days:
+        raise ValueError(f"step ({step}) must be at least test_days ({test_days}): "
+                         f"overlapping test windows would count shared days twice")
+    windows = []
+    for i in range(train_days, len(trading_days), step):
+        test = trading_days[i:i + test_days]
+        if len(test) == 0:
+            break
+        windows.append((trading_days[i - train_days:i], test))
+    return windows
+
+
+def _run_window(task):
+    i, train, test, param_sets, objective = task
+    store = sweep._STORE
+
+    best_params, best_score = None, -np.inf
+    for params in param_sets:
+        config = dict(orb.CONFIG, **params)
+        sim = orb.simulate_backtest(store, config, verbose=False, days=train)
+        score = orb.summarize_backtest(sim)[objective]
+        if best_params is None or score > best_score:
+            best_params, best_score = params, score
+
+    config = dict(orb.CONFIG, **best_params)
+    sim = orb.simulate_backtest(store, config, verbose=False, days=test)
+    summary = orb.summarize_backtest(sim)
+    return i, {
+        'train_start': str(train[0]),
+        'train_end': str(train[-1]),
+        'test_start': str(test[0]),
+        'test_end': str(test[-1]),
+        'params': best_params,
+        'train_' + objective: float(best_score),
+        'test_return_pct': float(summary['total_return_pct']),
+        'test_sharpe_ratio': float(summary['sharpe_ratio']),
+        'test_trades': summary['total_trades'],
+    }, sim
+
+
+def stitch(window_sims, starting_equity):
+    """
+    Chain test-window results into one out-of-sample run. Each window was
+    simulated from STARTING_EQUITY, so the stitched curve compounds their
+    daily returns rather than adding dollar P&L. Trade P&L and shares are
+    rescaled to the stitched equity at the window's start (positions are
+    sized off equity, so this is the run the stitched curve describes, up
+    to whole-share rounding), and monthly P&L is rebuilt from those trades.
+    """
+    daily_returns = []
+    trades = []
+    monthly_pnl = {}
+    counts = {'winning_days': 0, 'losing_days': 0, 'flat_days': 0, 'no_trade_days': 0,
+              'total_trading_days': 0}
+    window_growth = 1.0
+    for sim in window_sims:
+        scale = window_growth * starting_equity / sim['config']['STARTING_EQUITY']
+        for trade in sim['trades']:
+            pnl = round(trade['pnl'] * scale, 2)
+            trades.append(orb.TradeRecord(**dict(trade.to_dict(), pnl=pnl,
+                                                 shares=int(round(trade['shares'] * scale)))))
+            month = trade['date'][:7]
+            monthly_pnl[month] = monthly_pnl.get(month, 0) + pnl
+        daily_returns.extend(sim['daily_returns'])
+        window_growth *= sim['equity'] / sim['config']['STARTING_EQUITY']
+        for key in counts:
+            counts[key] += sim[key]
+
+    daily_growth = np.cumprod(1 + np.array(daily_returns, dtype=float) / 100)
+    equity_curve = [starting_equity] + list(starting_equity * daily_growth)
+    return dict(counts, **{
+        'config': dict(orb.CONFIG, STARTING_EQUITY=starting_equity),
+        'trading_days': [d for sim in window_sims for d in sim['trading_days']],
+        'equity': equity_curve[-1],
+        'equity_curve': equity_curve,
+        'daily_returns': daily_returns,
+        'trades': trades,
+        'monthly_pnl': monthly_pnl,
+    })
+
+
+def run_walkforward(store, grid, train_days=120, test_days=20, step=None,
+                    objective='sharpe_ratio', workers=None, download_options=None):
+    """Run every window and return (window rows, stitched out-of-sample sim)."""
+    param_sets = sweep.expand_grid(grid)
+    windows = make_windows(store.trading_days, train_days, test_days, step)
+    if not windows:
+        raise ValueError(f"Need more than {train_days} trading days for one window")
+    print(f"Walk-forward: {len(windows)} windows × {len(param_sets)} parameter sets")
+
+    orb.warm_caches(store, [dict(orb.CONFIG, **params) for params in param_sets])
+    tasks = [(i, train, test, param_sets, objective)
+             for i, (train, test) in enumerate(windows)]
+    rows = [None] * len(tasks)
+    sims = [None] * len(tasks)
+    for i, row, sim in sweep.shared_map(_run_window, tasks, store, workers,
+                                        download_options, label='windows'):
+        rows[i] = row
+        sims[i] = sim
+    return rows, stitch(sims, orb.CONFIG['STARTING_EQUITY'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ORB walk-forward backtest')
+    parser.add_argument('--grid', action='append', default=[], metavar='KEY=V1,V2,...',
+                        help='CONFIG key and values to optimize per window (repeatable)')
+    parser.add_argument('--train-days', type=int, default=120)
+    parser.add_argument('--test-days', type=int, default=20)
+    parser.add_argument('--step', type=int, default=None,
+                        help='days between window starts (default: --test-days)')
+    parser.add_argument('--objective', default='sharpe_ratio',
+                        help='summarize_backtest metric to maximize (default: sharpe_ratio)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: all cores)')
+    parser.add_argument('--output', default='walkforward_results.json')
+    parser.add_argument('--resolution', choices=orb.RESOLUTIONS, default='1h')
+    parser.add_argument('--offline', action='store_true',
+                        help='run entirely from the local bar cache (no network)')
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        grid = sweep.parse_grid(args.grid)
+    except ValueError as e:
+        parser.error(str(e))
+    if not grid:
+        parser.error('at least one --grid KEY=V1,V2 is required')
+    if args.step is not None and args.step < args.test_days:
+        parser.error('--step must be at least --test-days (test windows may not overlap)')
+
+    download_options = {'resolution': args.resolution, 'offline': args.offline,
+                        'cache_dir': args.cache_dir}
+    store = orb.prepare_market_data(**download_options)
+    if store is None:
+        return None
+
+    rows, oos = run_walkforward(store, grid, args.train_days, args.test_days, args.step,
+                                args.objective, args.workers, download_options)
+    summary = orb.summarize_backtest(oos)
+
+    print(f"\n{'TEST WINDOW':<25} {'PARAMS':<40} {'RETURN':>8} {'TRADES':>7}")
+    for row in rows:
+        params = ', '.join(f"{k}={v}" for k, v in row['params'].items())
+        print(f"{row['test_start']} → {row['test_end']}  {params:<40} "
+              f"{row['test_return_pct']:>7.1f}% {row['test_trades']:>7}")
+
+    print(f"\nOUT-OF-SAMPLE ({len(oos['daily_returns'])} days)")
+    print(f"  Total Return:       {summary['total_return_pct']:>11.1f}%")
+    print(f"  Sharpe Ratio:       {summary['sharpe_ratio']:>11.2f}")
+    print(f"  Max Drawdown:       {summary['max_drawdown_pct']:>11.1f}%")
+    print(f"  Total Trades:       {summary['total_trades']:>8}")
+
+    results = {
+        'train_days': args.train_days,
+        'test_days': args.test_days,
+        'objective': args.objective,
+        'windows': rows,
+        'oos_total_return_pct': round(summary['total_return_pct'], 2),
+        'oos_sharpe_ratio': round(summary['sharpe_ratio'], 2),
+        'oos_max_drawdown_pct': round(summary['max_drawdown_pct'], 2),
+        'oos_total_trades': summary['total_trades'],
+        'oos_equity_curve': [round(eq, 2) for eq in oos['equity_curve']],
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Shared fixtures for the backtest tests: a small synthetic market and the
+loop engine's results on it, the reference every other engine must match.
+Market fixtures are parametrized over RESOLUTIONS, so every test built on
+them runs on hourly and on 5-minute bars.
+"""
+
+import pytest
+
+import backtest_orb as orb
+import backtest_synthetic as synthetic
+from backtest_costs import REALISTIC_COSTS
+
+N_SYMBOLS = 40
+
+# Looser selector thresholds, so a small synthetic universe trades most days
+CONFIG = dict(orb.CONFIG, MIN_RVOL=1.0, MIN_CHANGE_PCT=0.5)
+CONFIGS = {'default': CONFIG, 'costs': dict(CONFIG, **REALISTIC_COSTS)}
+
+RESOLUTIONS = ('1h', '5m')
+
+
+@pytest.fixture(scope='session')
+def universe():
+    return synthetic.synthetic_symbols(N_SYMBOLS)
+
+
+@pytest.fixture(scope='session', params=RESOLUTIONS)
+def resolution(request):
+    return request.param
+
+
+@pytest.fixture(scope='session')
+def frames(resolution):
+    return synthetic.synthetic_market(N_SYMBOLS, years=1, interval=resolution, end='2026-01-01')
+
+
+@pytest.fixture(scope='session')
+def store(frames, universe, resolution):
+    return orb.MarketData(frames, resolution, universe)
+
+
+@pytest.fixture(scope='session')
+def reference(store):
+    """Loop-engine results per CONFIGS name."""
+    return {name: orb.simulate_backtest(store, config, verbose=False)
+            for name, config in CONFIGS.items()}
+
+
+def outcome(sim):
+    """Everything an engine must reproduce: trades, equity, returns and day counts."""
+    return {
+        'trades': [t.to_dict() for t in sim['trades']],
+        'equity': sim['equity'],
+        'equity_curve': list(sim['equity_curve']),
+        'daily_returns': list(sim['daily_returns']),
+        'monthly_pnl': sim['monthly_pnl'],
+        'days': [sim[k] for k in ('winning_days', 'losing_days', 'flat_days',
+                                  'no_trade_days', 'total_trading_days')],
+    }
+
+
+def assert_same_run(sim, ref):
+    got, expected = outcome(sim), outcome(ref)
+    assert len(expected['trades']) > 0
+    for key in expected:
+        assert got[key] == expected[key], key
@@ -0,0 +1,16 @@
+"""Tests for partitioned runs in backtest_chunked."""
+
+import pytest
+
+import backtest_chunked as chunked
+from conftest import CONFIG, assert_same_run
+
+
+@pytest.mark.parametrize('freq', ['M', 'Q'])
+@pytest.mark.parametrize('engine', ['vector', 'loop'])
+def test_chunked_run_matches_full_history(frames, universe, resolution, reference, tmp_path,
+                                          freq, engine):
+    root = str(tmp_path / 'parts')
+    chunked.write_partitions(frames.items(), root, resolution, freq, batch_size=15)
+    sim = chunked.run_chunked(root, CONFIG, universe, engine=engine, verbose=False)
+    assert_same_run(sim, reference['default'])
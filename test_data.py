@@ -0,0 +1,110 @@
+"""Tests for the bar loader in backtest_data."""
+
+import pandas as pd
+import pytest
+
+import backtest_data
+import backtest_orb as orb
+import backtest_synthetic as synthetic
+
+
+class FlakyProvider(backtest_data.FrameProvider):
+    """FrameProvider whose first `failures` requests per symbol raise."""
+
+    def __init__(self, frames, failures):
+        super().__init__(frames)
+        self.failures = failures
+        self.calls = {}
+
+    def history(self, symbol, interval='1h', period=None, start=None):
+        self.calls[symbol] = self.calls.get(symbol, 0) + 1
+        if self.calls[symbol] <= self.failures:
+            raise ConnectionError(f"transient failure for {symbol}")
+        return super().history(symbol, interval, period, start)
+
+
+@pytest.fixture
+def recent_frames():
+    return synthetic.synthetic_market(5, years=0.5, interval='1h')
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(backtest_data.time, 'sleep', lambda seconds: None)
+
+
+def test_download_retries_failing_provider(recent_frames, tmp_path, no_backoff):
+    symbols = synthetic.synthetic_symbols(5)
+    provider = FlakyProvider(recent_frames, failures=2)
+    data = orb.download_data(symbols, period='1y', provider=provider,
+                             cache_dir=str(tmp_path), retries=3)
+
+    assert sorted(data) == sorted(recent_frames)
+    assert set(provider.calls.values()) == {3}
+    for sym, df in data.items():
+        pd.testing.assert_frame_equal(df, recent_frames[sym], check_freq=False)
+
+    # Served from the cache offline, without the provider
+    offline = orb.download_data(symbols, period='1y', offline=True, cache_dir=str(tmp_path))
+    assert sorted(offline) == sorted(recent_frames)
+
+
+def test_download_gives_up_after_retries(recent_frames, tmp_path, no_backoff):
+    symbols = synthetic.synthetic_symbols(5)
+    provider = FlakyProvider(recent_frames, failures=5)
+    frames, report = backtest_data.load_many(symbols, period='1y', provider=provider,
+                                             cache_dir=str(tmp_path), retries=2)
+
+    assert frames == {}
+    assert all(r['attempts'] == 3 and 'transient failure' in r['error'] for r in report.values())
+    assert set(provider.calls.values()) == {3}
+
+
+def test_download_does_not_retry_permanent_errors(recent_frames, tmp_path, no_backoff):
+    provider = FlakyProvider(recent_frames, failures=0)
+    frames, report = backtest_data.load_many(['NOSUCH'], period='1y', provider=provider,
+                                             cache_dir=str(tmp_path), retries=3)
+
+    assert frames == {}
+    assert report['NOSUCH']['attempts'] == 1 and 'KeyError' in report['NOSUCH']['error']
+    assert provider.calls == {'NOSUCH': 1}
+
+
+class FailingBatchProvider(FlakyProvider):
+    """FlakyProvider whose batch endpoint always raises `batch_error`."""
+
+    supports_batch = True
+
+    def __init__(self, frames, failures, batch_error):
+        super().__init__(frames, failures)
+        self.batch_error = batch_error
+        self.batch_calls = 0
+
+    def history_batch(self, symbols, interval='1h', period=None, start=None):
+        self.batch_calls += 1
+        raise self.batch_error
+
+
+def test_batch_fallback_shares_retry_budget(recent_frames, tmp_path, no_backoff):
+    """A batch that spends every attempt leaves nothing for the per-symbol fallback."""
+    symbols = synthetic.synthetic_symbols(5)
+    provider = FailingBatchProvider(recent_frames, failures=0,
+                                    batch_error=ConnectionError("batch down"))
+    frames, report = backtest_data.load_many(symbols, period='1y', provider=provider,
+                                             cache_dir=str(tmp_path), retries=2, batch_size=5)
+
+    assert frames == {}
+    assert provider.batch_calls == 3 and provider.calls == {}
+    assert all(r['attempts'] == 3 and 'batch down' in r['error'] for r in report.values())
+
+
+def test_batch_fallback_uses_remaining_attempts(recent_frames, tmp_path, no_backoff):
+    symbols = synthetic.synthetic_symbols(5)
+    provider = FailingBatchProvider(recent_frames, failures=1,
+                                    batch_error=ValueError("batch not supported"))
+    frames, report = backtest_data.load_many(symbols, period='1y', provider=provider,
+                                             cache_dir=str(tmp_path), retries=2, batch_size=5)
+
+    assert sorted(frames) == sorted(symbols)
+    assert provider.batch_calls == 1 and set(provider.calls.values()) == {2}
+    assert all(r['attempts'] == 3 and r['error'] is None for r in report.values())
@@ -0,0 +1,62 @@
+"""Seeded tests for the bootstrap paths in backtest_montecarlo."""
+
+import numpy as np
+import pytest
+
+import backtest_montecarlo as montecarlo
+import backtest_orb as orb
+
+
+def test_day_unit_full_block_replays_backtest(reference):
+    """One block spanning every day can only start at day 0: the backtest's own order."""
+    sim = reference['default']
+    summary = orb.summarize_backtest(sim)
+    returns, drawdowns = montecarlo.monte_carlo(sim, 4, unit='day', block=len(sim['trading_days']))
+
+    # Sizing is re-derived from rounded R-multiples, so only close
+    assert returns == pytest.approx(np.full(4, summary['total_return_pct']), abs=0.1)
+    assert drawdowns == pytest.approx(np.full(4, summary['max_drawdown_pct']), abs=0.1)
+
+
+def test_returns_mode_full_block_replays_backtest(reference):
+    sim = reference['default']
+    summary = orb.summarize_backtest(sim)
+    returns, drawdowns = montecarlo.monte_carlo(sim, 4, mode='returns',
+                                                block=len(sim['daily_returns']))
+
+    assert returns == pytest.approx(np.full(4, summary['total_return_pct']), rel=1e-9)
+    assert drawdowns == pytest.approx(np.full(4, summary['max_drawdown_pct']), rel=1e-9)
+
+
+def test_trade_unit_with_one_r_multiple_matches_day_unit(reference):
+    """Both units draw the days first, so with a single R-multiple they agree path by path."""
+    sim = dict(reference['default'], trades=[
+        orb.TradeRecord(**dict(t.to_dict(), r_multiple=1.5)) for t in reference['default']['trades']])
+    by_day = montecarlo.monte_carlo(sim, 500, unit='day', seed=7, chunk=200)
+    by_trade = montecarlo.monte_carlo(sim, 500, unit='trade', seed=7, chunk=200)
+
+    for a, b in zip(by_day, by_trade):
+        np.testing.assert_array_equal(a, b)
+    assert np.unique(by_day[0]).size > 1
+
+
+@pytest.mark.parametrize('mode, unit', [('trades', 'day'), ('trades', 'trade'), ('returns', 'day')])
+def test_paths_are_seeded(reference, mode, unit):
+    sim = reference['default']
+    first = montecarlo.monte_carlo(sim, 300, mode, unit, block=3, seed=1, chunk=100)
+    again = montecarlo.monte_carlo(sim, 300, mode, unit, block=3, seed=1, chunk=100)
+    other = montecarlo.monte_carlo(sim, 300, mode, unit, block=3, seed=2, chunk=100)
+
+    for a, b in zip(first, again):
+        np.testing.assert_array_equal(a, b)
+    assert not np.array_equal(first[0], other[0])
+
+
+@pytest.mark.parametrize('mode, unit', [('trades', 'day'), ('trades', 'trade'), ('returns', 'day')])
+def test_paths_without_trades_stay_flat(reference, mode, unit):
+    sim = reference['default']
+    flat = dict(sim, trades=[], daily_returns=[0] * len(sim['daily_returns']))
+    returns, drawdowns = montecarlo.monte_carlo(flat, 50, mode, unit, seed=3)
+
+    np.testing.assert_array_equal(returns, np.zeros(50))
+    np.testing.assert_array_equal(drawdowns, np.zeros(50))
@@ -0,0 +1,60 @@
+"""Tests for backtest_orb's store, selector and trade kernel."""
+
+import numpy as np
+
+import backtest_orb as orb
+from conftest import CONFIG
+
+
+def test_day_selection_matches_table(store):
+    table = orb.store_selections(store, CONFIG)
+    for day in store.trading_days[::25]:
+        assert orb.select_stocks_for_day(store, day, config=CONFIG) == table.get(day, [])
+
+
+def walk_trade(high, low, close, is_long, stop, target):
+    """The original bar-by-bar exit walk: (exit price, reason)."""
+    for h, l in zip(high, low):
+        if (l <= stop) if is_long else (h >= stop):
+            return stop, orb.EXIT_STOP
+        if (h >= target) if is_long else (l <= target):
+            return target, orb.EXIT_TARGET
+    return close[-1], orb.EXIT_EOD
+
+
+def test_trade_kernel_matches_bar_walk(store):
+    """Trades from random bars to the end of their day, on the store's own bars."""
+    rng = np.random.default_rng(0)
+    sym = store.universe[0]
+    bars = store.arrays[sym]
+    high, low, close = bars['High'], bars['Low'], bars['Close']
+    days = list(store.day_slices[sym].values())
+    n_trades = 300
+    starts, ends = [], []
+    for k in rng.integers(0, len(days), n_trades):
+        start, end = days[k]
+        starts.append(rng.integers(start, end))
+        ends.append(end)
+    starts, ends = np.array(starts), np.array(ends)
+    is_long = rng.random(n_trades) < 0.5
+    entry = close[starts]
+    stop_distance = entry * rng.uniform(0.002, 0.02, n_trades)
+    stop, target = orb.trade_levels(is_long, entry, stop_distance, CONFIG)
+
+    _, exit_price, exit_reason = orb.simulate_trades(high, low, close, starts, ends, is_long,
+                                                     entry, stop, target)
+    assert {orb.EXIT_STOP, orb.EXIT_TARGET, orb.EXIT_EOD} <= set(exit_reason.tolist())
+    for i in range(n_trades):
+        s, e = starts[i], ends[i]
+        assert (exit_price[i], exit_reason[i]) == walk_trade(
+            high[s:e], low[s:e], close[s:e], is_long[i], stop[i], target[i])
+
+
+def test_report_uses_run_config(store, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = dict(CONFIG, STARTING_EQUITY=orb.CONFIG['STARTING_EQUITY'] * 3)
+    sim = orb.simulate_backtest(store, config, verbose=False)
+    results = orb.report_backtest(sim)
+
+    assert results['starting_equity'] == config['STARTING_EQUITY']
+    assert results['net_pnl'] == round(sim['equity'] - config['STARTING_EQUITY'], 2)
@@ -0,0 +1,47 @@
+"""Tests for the gap strategy and multi-strategy runs in backtest_portfolio."""
+
+import pandas as pd
+
+import backtest_orb as orb
+import backtest_portfolio as portfolio
+from backtest_universe import SymbolMaster
+from conftest import CONFIG
+
+# Looser gap thresholds, so the synthetic market gaps most days
+GAP_CONFIG = dict(CONFIG, **dict(portfolio.GAP_CONFIG, MIN_GAP_PCT=0.5, MIN_GAP_RVOL=0.5))
+
+
+def test_gap_signals_are_ranked_and_listed(frames, universe, resolution):
+    days = sorted(set(frames['SPY'].index.date))
+    delisted = days[len(days) // 2]
+    # Every other gap symbol leaves the universe mid-year
+    master = SymbolMaster(pd.DataFrame({
+        'symbol': universe,
+        'start': '2000-01-01',
+        'end': [delisted if i % 2 else None for i in range(len(universe))],
+    }))
+    store = orb.MarketData(frames, resolution, universe, master)
+    gap = portfolio.GapStrategy(GAP_CONFIG)
+    gap.prepare(store)
+
+    n_signals = 0
+    for date in store.trading_days[40:]:
+        watchlist = gap.watchlist(store, date)
+        assert all(master.is_member(pick['symbol'], date) for pick in watchlist)
+        regime = orb.day_regime(store, date)
+        position = {pick['symbol']: rank for rank, pick in enumerate(watchlist, 1)}
+        for candidate in gap.signals(store, date, regime, watchlist):
+            assert candidate['rank'] == position[candidate['symbol']]
+            n_signals += 1
+    assert n_signals > 0
+
+
+def test_portfolio_trades_each_symbol_once_a_day(store):
+    strategies = [orb.ORBStrategy(CONFIG, store.universe), portfolio.GapStrategy(GAP_CONFIG)]
+    sim = orb.simulate_portfolio(store, strategies, dict(CONFIG, MAX_TRADES_PER_DAY=8),
+                                 verbose=False)
+
+    slots = [(t['date'], t['symbol']) for t in sim['trades']]
+    assert len(slots) == len(set(slots))
+    assert {t['strategy'] for t in sim['trades']} == {'orb', 'gap'}
+    assert all(t['rank'] > 0 for t in sim['trades'])
@@ -0,0 +1,47 @@
+"""Tests for the regime calendar in backtest_regime."""
+
+import numpy as np
+import pytest
+
+from backtest_regime import VALUE_COLUMNS, RegimeCalendar
+from conftest import CONFIG
+
+
+@pytest.fixture
+def closes(store):
+    spy, vix = store.daily['SPY'], store.daily['^VIX']
+    return (store.daily_dates['SPY'], spy['Close'].to_numpy(dtype=float),
+            store.daily_dates['^VIX'], vix['Close'].to_numpy(dtype=float))
+
+
+def assert_same_calendar(got, expected):
+    np.testing.assert_array_equal(got.date, expected.date)
+    for col in VALUE_COLUMNS:
+        np.testing.assert_array_equal(getattr(got, col), getattr(expected, col), err_msg=col)
+
+
+@pytest.mark.parametrize('split', [1, 30, 199, 200, 230])
+def test_append_matches_full_build(closes, split):
+    days, spy, vix_days, vix = closes
+    full = RegimeCalendar.from_closes(days, spy, vix_days, vix, CONFIG)
+
+    calendar = RegimeCalendar.from_closes(days[:split], spy[:split], vix_days, vix, CONFIG)
+    assert calendar.append(days, spy, vix_days, vix) == len(days) - split + 1
+    assert_same_calendar(calendar, full)
+
+
+def test_append_replaces_partial_last_day(closes):
+    """A calendar saved mid-session gets the day's final close on the next append."""
+    days, spy, vix_days, vix = closes
+    full = RegimeCalendar.from_closes(days, spy, vix_days, vix, CONFIG)
+
+    split = 120
+    partial = spy[:split].copy()
+    partial[-1] *= 1.02
+    calendar = RegimeCalendar.from_closes(days[:split], partial, vix_days, vix, CONFIG)
+    calendar.append(days[split - 1:], spy[split - 1:], vix_days, vix)
+    assert_same_calendar(calendar, full)
+
+    # Nothing new: the last day is rebuilt from the same close
+    assert calendar.append(days[-1:], spy[-1:]) == 1
+    assert_same_calendar(calendar, full)
@@ -0,0 +1,65 @@
+"""Tests for the HTTP backtest service in backtest_service."""
+
+import json
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import backtest_orb as orb
+import backtest_service as service_module
+from conftest import CONFIGS
+
+
+@pytest.fixture
+def server(frames, universe, resolution):
+    """The service on a free port, over a fresh store whose caches two workers fill at once."""
+    store = orb.MarketData(frames, resolution, universe)
+    service = service_module.BacktestService(store, workers=2)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), service_module.make_handler(service))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(url, body):
+    request = urllib.request.Request(url, json.dumps(body).encode(),
+                                     {'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        return response.status, json.loads(response.read())
+
+
+def events(url):
+    with urllib.request.urlopen(url) as response:
+        assert response.headers['Content-Type'] == 'application/x-ndjson'
+        return [json.loads(line) for line in response if line.strip()]
+
+
+def test_jobs_match_simulate_backtest(server, reference):
+    jobs = {}
+    for name, config in CONFIGS.items():
+        overrides = {k: v for k, v in config.items() if orb.CONFIG[k] != v}
+        for engine in service_module.ENGINES:
+            status, state = post(f"{server}/backtests", {'config': overrides, 'engine': engine})
+            assert status == 202 and state['status'] == 'queued'
+            jobs[name, engine] = state['id']
+
+    for (name, engine), job_id in jobs.items():
+        states = events(f"{server}/backtests/{job_id}/events")
+        progress = [state['progress'] for state in states]
+        assert progress == sorted(progress)
+        assert all('result' not in state for state in states[:-1])
+        last = states[-1]
+        assert last['status'] == 'done', last.get('error')
+        expected = json.loads(json.dumps(service_module.build_result(reference[name]),
+                                         default=service_module._json_default))
+        assert last['result'] == expected, (name, engine)
+
+    # A repeated request is answered from the result cache
+    overrides = {k: v for k, v in CONFIGS['costs'].items() if orb.CONFIG[k] != v}
+    status, state = post(f"{server}/backtests", {'config': overrides, 'engine': 'loop'})
+    assert status == 200 and state['result']['trades'] == [
+        t.to_dict() for t in reference['costs']['trades']]
@@ -0,0 +1,17 @@
+"""Tests for the on-disk stage cache in backtest_stages."""
+
+import pytest
+
+import backtest_vector as vector
+from backtest_stages import StageCache
+from conftest import CONFIGS, assert_same_run
+
+
+@pytest.mark.parametrize('name', CONFIGS)
+def test_stage_cache_rerun_matches_loop(store, reference, name, tmp_path):
+    stages = StageCache(str(tmp_path))
+    for _ in range(2):
+        # First run fills the cache, the second is served from it
+        assert_same_run(vector.simulate_vectorized(store, CONFIGS[name], stages=stages),
+                        reference[name])
+    assert len(list(tmp_path.iterdir())) > 0
@@ -0,0 +1,45 @@
+"""Tests for the event-driven engine in backtest_stream."""
+
+import pandas as pd
+import pytest
+
+import backtest_orb as orb
+import backtest_stream as stream
+from backtest_universe import SymbolMaster
+from conftest import CONFIGS, outcome
+
+
+def by_slot(trades):
+    """Trades in (date, rank) order: the stream records them as they close."""
+    return sorted(trades, key=lambda t: (t['date'], t['rank']))
+
+
+@pytest.mark.parametrize('name', CONFIGS)
+def test_replay_matches_loop(frames, universe, resolution, name):
+    """
+    With the store's regime calendar, a daily loss stop out of reach and a
+    trade slot for every pick, the stream's two documented divergences
+    (live regime, time-ordered loss stop) are gone and it must reproduce
+    simulate_backtest, listing and costs included.
+    """
+    config = dict(CONFIGS[name], MAX_DAILY_LOSS_PCT=10.0, MAX_TRADES_PER_DAY=5)
+    days = sorted(set(frames['SPY'].index.date))
+    # Half the universe leaves mid-year, so the selector must drop it
+    master = SymbolMaster(pd.DataFrame({
+        'symbol': universe,
+        'start': '2000-01-01',
+        'end': [days[len(days) // 2] if i % 2 else None for i in range(len(universe))],
+    }))
+    store = orb.MarketData(frames, resolution, universe, master)
+    ref = orb.simulate_backtest(store, config, verbose=False)
+    engine = stream.StreamingEngine(config, universe, resolution,
+                                    regime_calendar=store.regimes(), symbol_master=master)
+    sim = engine.run(stream.replay_frames(frames))
+
+    got, expected = outcome(sim), outcome(ref)
+    assert len(expected['trades']) > 0
+    assert by_slot(got.pop('trades')) == by_slot(expected.pop('trades'))
+    assert sim['trading_days'] == list(ref['trading_days'])
+    assert got['days'] == expected['days']
+    for key in ('equity_curve', 'daily_returns'):
+        assert got[key] == pytest.approx(expected[key], rel=1e-12)
@@ -0,0 +1,35 @@
+"""Tests for the vector engine in backtest_vector."""
+
+import numpy as np
+import pytest
+
+import backtest_orb as orb
+import backtest_vector as vector
+from backtest_costs import ExecutionModel
+from conftest import CONFIG, CONFIGS, assert_same_run
+
+
+@pytest.mark.parametrize('name', CONFIGS)
+def test_vector_engine_matches_loop(store, reference, name):
+    assert_same_run(vector.simulate_vectorized(store, CONFIGS[name]), reference[name])
+
+
+@pytest.mark.parametrize('n_shards', [1, 3, 17, 1000])
+def test_symbol_shards_merge_to_serial_candidates(store, n_shards):
+    days = store.trading_days
+    selections = orb.store_selections(store, CONFIG)
+    regime = vector.regime_stage(store, days, CONFIG)
+    execution = ExecutionModel.from_config(CONFIG)
+    serial = vector.candidate_shard(store, days, selections, regime, CONFIG, execution)
+    merged = vector.merge_shards([
+        vector.candidate_shard(store, days, selections, regime, CONFIG, execution, only=shard)
+        for shard in vector.symbol_shards(days, selections, n_shards)])
+    for got, expected in zip(merged, serial):
+        assert got.keys() == expected.keys()
+        for key in expected:
+            np.testing.assert_array_equal(got[key], expected[key])
+
+
+@pytest.mark.parametrize('name', CONFIGS)
+def test_parallel_candidates_match_loop(store, reference, name):
+    assert_same_run(vector.simulate_vectorized(store, CONFIGS[name], workers=2), reference[name])
@@ -0,0 +1,38 @@
+"""Tests for the walk-forward windows and their stitched out-of-sample run."""
+
+import pytest
+
+import backtest_orb as orb
+import backtest_walkforward as walkforward
+from conftest import CONFIG
+
+
+def test_make_windows_rejects_overlapping_tests(store):
+    with pytest.raises(ValueError, match='step'):
+        walkforward.make_windows(store.trading_days, 60, 20, step=10)
+
+    windows = walkforward.make_windows(store.trading_days, 60, 20, step=30)
+    tests = [day for _, test in windows for day in test]
+    assert len(tests) == len(set(tests))
+    assert all(train[-1] < test[0] for train, test in windows)
+
+
+def test_stitched_run_matches_continuous_run(store):
+    """
+    With one parameter set, the stitched test windows are one run over the
+    test days. A large account keeps whole-share rounding, the only
+    difference, negligible.
+    """
+    equity = 1e9
+    grid = {key: [CONFIG[key]] for key in ('MIN_RVOL', 'MIN_CHANGE_PCT')}
+    grid['STARTING_EQUITY'] = [equity]
+    rows, oos = walkforward.run_walkforward(store, grid, 60, 20, workers=1)
+    full = orb.simulate_backtest(store, dict(CONFIG, STARTING_EQUITY=equity), verbose=False,
+                                 days=oos['trading_days'])
+
+    assert len(rows) > 1 and len(full['trades']) > 0
+    key = lambda t: (t['date'], t['symbol'], t['signal'], t['exit_reason'])
+    assert [key(t) for t in oos['trades']] == [key(t) for t in full['trades']]
+    assert oos['daily_returns'] == pytest.approx(full['daily_returns'], abs=1e-4)
+    start = orb.CONFIG['STARTING_EQUITY']
+    assert oos['equity'] == pytest.approx(full['equity'] * start / equity, rel=1e-6)